@@ -1,84 +1,70 @@
-import streamlit as st
-import pandas as pd
-import random
-from datetime import datetime
+import os
 import time
+from datetime import datetime
+
+import streamlit as st
+
+# Core Modules (heavier panels are imported lazily, where they render)
+from core.config_manager import ConfigError, UnknownSiteError
+from core.service_client import connect
+from utils.metrics import metrics
+
+THEME_CSS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ui", "theme.css")
+AUTO_RELOAD_SECONDS = 10
+
+
+@st.cache_resource
+def _global_css():
+    """Static theme, read from disk once per process instead of on every rerun."""
+    with open(THEME_CSS_PATH, encoding="utf-8") as handle:
+        return f"<style>\n{handle.read()}</style>"
 
-# Core Modules
-from core.live_data import get_live_data, log_live_data, get_historical_data
-from core.simulator import SimulationCore 
-from utils.InsightEngine import generate_insights 
 
+@st.cache_resource
+def _auto_reload_html():
+    return f"<script>setTimeout(function(){{ window.parent.location.reload(); }}, {AUTO_RELOAD_SECONDS * 1000});</script>"
+
+
+@metrics.timed("ui.rerun")
 def main_dashboard():
     # --- 1. ENTERPRISE GLOBAL STYLING ---
     st.set_page_config(page_title="Skyline Aether - Enterprise DT", layout="wide", initial_sidebar_state="collapsed")
 
-    st.markdown("""
-        <style>
-            .stApp {
-                background: radial-gradient(circle at 20% 20%, #0e1525 0%, #05080d 100%);
-                color: #e2e8f0;
-            }
-            [data-testid="stMetric"] {
-                background: rgba(255, 255, 255, 0.03) !important;
-                border: 1px solid rgba(255, 255, 255, 0.1) !important;
-                border-radius: 12px !important;
-                padding: 20px !important;
-                box-shadow: 0 4px 20px rgba(0,0,0,0.4) !important;
-            }
-            .hero-value {
-                font-size: 85px !important;
-                font-weight: 800 !important;
-                background: linear-gradient(180deg, #00f2ff 0%, #0072ff 100%);
-                -webkit-background-clip: text;
-                -webkit-text-fill-color: transparent;
-                margin-bottom: 0px;
-            }
-            .label-text {
-                color: #64748b;
-                text-transform: uppercase;
-                letter-spacing: 1.5px;
-                font-size: 0.75rem;
-                font-weight: 700;
-            }
-            .led-green { height: 10px; width: 10px; background-color: #00ff00; border-radius: 50%; display: inline-block; box-shadow: 0 0 10px #00ff00; }
-        </style>
-    """, unsafe_allow_html=True)
+    st.markdown(_global_css(), unsafe_allow_html=True)
 
-    # --- 2. INITIALIZE DT STATE ---
-    if 'simulator_core' not in st.session_state: 
-        st.session_state.simulator_core = SimulationCore("KIG-001", 85, 28)
+    # --- 2. ATTACH TO THE SHARED DT SERVICE ---
+    # ?view=fleet opens the fleet overview; ?site=<id> drills into one twin.
+    if st.query_params.get("view") == "fleet":
+        from ui.fleet_page import render_fleet_page
+        render_fleet_page()
+        return
+
+    # One twin per site runs in the background (in the headless service when
+    # one is live, else in this process); sessions only read its snapshot.
+    current_site_id = st.query_params.get("site", "KIG-001")
+    try:
+        service = connect(current_site_id)
+    except UnknownSiteError:
+        st.error(f"Unknown site '{current_site_id}': no config in config/sites/.")
+        return
+    except ConfigError as exc:
+        st.error(f"Site '{current_site_id}' has an invalid config: {exc}")
+        return
 
     # --- 3. DATA & PHYSICS SYNC ---
-    current_site_id = "KIG-001"
-    
-    # Get environmental context first
-    current_hour = datetime.now().hour
-    irradiance = max(0, 1000 * (1 - abs(current_hour - 13) / 4) + random.uniform(-50, 50)) if 9 <= current_hour <= 17 else 0.0
-    
-    # We pull live data with the "odometer" logic
-    # Note: sim_net_kw from last step is used here
-    prev_net_kw = st.session_state.get('last_net_kw', 0.0)
-    live_data = get_live_data(current_site_id, sim_net_kw=prev_net_kw)
-
-    # Run the Physics Step with Causal Separators
-    sim_state = st.session_state.simulator_core.run_step(
-        time_step_seconds=10, 
-        irradiance=irradiance, 
-        ambient_temp=live_data['ambient_temp'],
-        current_load_kw=live_data['load_kw']
-    )
-    
-    # Update Session State
-    st.session_state.last_net_kw = sim_state['sim_net_kw']
-    live_data.update(sim_state)
-    system_insight = generate_insights(sim_state, live_data)
+    live_data = service.snapshot()
+    system_insight = live_data['insight']
 
     # --- 4. MAIN UI LAYOUT ---
     h_left, h_right = st.columns([3, 1])
     with h_left:
         st.markdown(f"<h1><span class='led-green'></span> {current_site_id} Digital Twin</h1>", unsafe_allow_html=True)
         st.markdown(f"<p style='color:#00f2ff; margin-top:-15px;'>MODE: {live_data['system_state']}</p>", unsafe_allow_html=True)
+    with h_right:
+        if st.button("Fleet overview", width="stretch"):
+            st.query_params.clear()
+            st.query_params["view"] = "fleet"
+            st.rerun()
 
     # Hero Section
     st.markdown("---")
@@ -120,9 +106,22 @@ def main_dashboard():
 
     # Intelligence Panel
     st.info(f"🧠 {system_insight}")
+    if live_data['trend_insight_active']:
+        st.warning(f"📈 {live_data['trend_insight']}")
+    low_soc_at = live_data.get('forecast_low_soc_at')
+    if low_soc_at is not None:
+        hours_left = max(0.0, (low_soc_at - time.time()) / 3600)
+        st.caption(f"🔋 Forecast: SOC reaches 20% at {datetime.fromtimestamp(low_soc_at):%H:%M} (in {hours_left:.1f} h)")
+    elif 'forecast_min_soc' in live_data:
+        st.caption(f"🔋 Forecast: SOC stays above 20% for the next 24 h (min {live_data['forecast_min_soc']:.0f}%)")
+
+    # Trend Panel (server-side downsampled history)
+    st.markdown("---")
+    from ui.trend_panel import render_trend_panel
+    render_trend_panel(current_site_id)
 
     # Auto-Reload Script
-    st.components.v1.html("<script>setTimeout(function(){ window.parent.location.reload(); }, 10000);</script>", height=0)
+    st.components.v1.html(_auto_reload_html(), height=0)
 
 if __name__ == "__main__":
     main_dashboard()
@@ -0,0 +1,84 @@
+# benchmarks/bench_insight_gate.py
+"""
+Fleet replay through InsightGate vs calling generate_insights directly.
+
+Each site follows a slow random walk (like 10 s twin output), so consecutive
+states repeat often once quantized. Reports cache hit rate, suppressed events
+and how many transitions would actually reach the EventBus.
+
+Usage:
+    python benchmarks/bench_insight_gate.py --sites 1000 --steps 360
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.event_bus import EventBus  # noqa: E402
+from utils.InsightEngine import generate_insights  # noqa: E402
+from utils.insight_gate import INSIGHT_CHANGED_EVENT, InsightGate  # noqa: E402
+
+
+def fleet_replay(n_sites, n_steps, seed=0):
+    """Yields (step, site_index, sim_state, context) in tick order."""
+    rng = np.random.default_rng(seed)
+    soc = rng.uniform(10, 95, n_sites)
+    temp = rng.normal(30, 3, n_sites)
+    net = rng.normal(0, 4, n_sites)
+    ambient = rng.normal(25, 2, n_sites)
+    irradiance = rng.uniform(0, 1000, n_sites)
+    for step in range(n_steps):
+        net = np.clip(net + rng.normal(0, 0.05, n_sites), -15, 15)
+        soc = np.clip(soc + net * 10 / 3600 / 40 * 100, 0, 100)
+        temp += rng.normal(0, 0.02, n_sites)
+        irradiance = np.clip(irradiance + rng.normal(0, 1.0, n_sites), 0, 1100)
+        rows = zip(net.round(2).tolist(), soc.round(1).tolist(), temp.round(1).tolist(),
+                   ambient.round(1).tolist(), irradiance.round(0).tolist())
+        for i, (n, s, t, a, g) in enumerate(rows):
+            yield step, i, {"sim_net_kw": n, "sim_soc": s, "sim_temp": t}, {"ambient_temp": a, "irradiance": g}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", type=int, default=1000)
+    parser.add_argument("--steps", type=int, default=360, help="10 s ticks (360 = 1 hour)")
+    args = parser.parse_args()
+
+    samples = list(fleet_replay(args.sites, args.steps))
+
+    t0 = time.perf_counter()
+    raw_changes, last = 0, {}
+    for _, site, sim_state, context in samples:
+        message = generate_insights(sim_state, context)
+        raw_changes += last.get(site) != message
+        last[site] = message
+    direct_s = time.perf_counter() - t0
+
+    bus = EventBus()
+    received = []
+    bus.subscribe(INSIGHT_CHANGED_EVENT, received.append)
+    gate = InsightGate(event_bus=bus)
+    t0 = time.perf_counter()
+    for step, site, sim_state, context in samples:
+        gate.update(site, step * 10.0, sim_state, context)
+    gate_s = time.perf_counter() - t0
+
+    n = len(samples)
+    stats = gate.stats()
+    print(f"{n:,} samples ({args.sites} sites x {args.steps} ticks)")
+    print(f"direct generate_insights : {direct_s:6.2f} s  ({n / direct_s / 1e3:7.1f} k/s), {raw_changes:,} raw changes")
+    print(f"InsightGate              : {gate_s:6.2f} s  ({n / gate_s / 1e3:7.1f} k/s)")
+    print(f"cache hit rate {stats['cache_hit_rate']:.1%}  entries {stats['cache_entries']:,}  "
+          f"evictions {stats['cache_evictions']:,}")
+    print(f"suppressed: hysteresis {stats['suppressed_hysteresis']:,}  cool-down {stats['suppressed_cooldown']:,}")
+    print(f"published {len(received):,} events vs {raw_changes:,} raw changes "
+          f"({1 - len(received) / max(1, raw_changes):.1%} fewer)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
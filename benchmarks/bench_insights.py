@@ -0,0 +1,75 @@
+# benchmarks/bench_insights.py
+"""
+Scalar generate_insights vs vectorized generate_insight_codes.
+
+Usage:
+    python benchmarks/bench_insights.py                 # 10M rows batch, 1M-row scalar sample
+    python benchmarks/bench_insights.py --scalar-rows 10000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.InsightEngine import INSIGHT_MESSAGES, generate_insight_codes, generate_insights  # noqa: E402
+
+
+def synthetic_states(n_rows, seed=0):
+    """Columnar states covering every rule branch."""
+    rng = np.random.default_rng(seed)
+    return {
+        "sim_soc": rng.uniform(0, 100, n_rows).round(1),
+        "sim_temp": rng.normal(30, 6, n_rows).round(1),
+        "sim_net_kw": rng.normal(0, 5, n_rows).round(2),
+        "ambient_temp": rng.normal(25, 3, n_rows).round(1),
+        "irradiance": rng.uniform(0, 1000, n_rows).round(1),
+    }
+
+
+def run_scalar(columns, n_rows):
+    sim_keys = ("sim_soc", "sim_temp", "sim_net_kw")
+    ctx_keys = ("ambient_temp", "irradiance")
+    lists = {k: columns[k][:n_rows].tolist() for k in sim_keys + ctx_keys}
+    out = [None] * n_rows
+    t0 = time.perf_counter()
+    for i in range(n_rows):
+        out[i] = generate_insights(
+            {k: lists[k][i] for k in sim_keys},
+            {k: lists[k][i] for k in ctx_keys},
+        )
+    return time.perf_counter() - t0, out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--scalar-rows", type=int, default=1_000_000,
+                        help="rows run through the scalar function (throughput is extrapolated)")
+    args = parser.parse_args()
+
+    columns = synthetic_states(args.rows)
+
+    t0 = time.perf_counter()
+    codes = generate_insight_codes(columns)
+    batch_s = time.perf_counter() - t0
+
+    scalar_rows = min(args.scalar_rows, args.rows)
+    scalar_s, scalar_out = run_scalar(columns, scalar_rows)
+
+    mismatches = sum(msg != INSIGHT_MESSAGES[code] for msg, code in zip(scalar_out, codes[:scalar_rows]))
+    batch_rate = args.rows / batch_s
+    scalar_rate = scalar_rows / scalar_s
+
+    print(f"batch : {args.rows:>12,} rows in {batch_s:8.3f} s  -> {batch_rate / 1e6:8.2f} M rows/s")
+    print(f"scalar: {scalar_rows:>12,} rows in {scalar_s:8.3f} s  -> {scalar_rate / 1e6:8.2f} M rows/s "
+          f"(~{args.rows / scalar_rate:.1f} s for {args.rows:,})")
+    print(f"speed-up: {batch_rate / scalar_rate:.0f}x   mismatches: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
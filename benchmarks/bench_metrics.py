@@ -0,0 +1,113 @@
+# benchmarks/bench_metrics.py
+"""
+Instrumentation overhead: the same workloads with metrics disabled and enabled.
+
+Workloads are the instrumented hot paths: SimulationCore.run_step,
+SimulationService.step (which also times itself, per phase on sampled
+steps), generate_insights and EventBus.publish to two subscribers.
+
+Exits non-zero when enabling the instrumentation adds more than --budget
+(default 2 %) to the cost of one service step.
+
+Usage:
+    python benchmarks/bench_metrics.py --repeat 3
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.event_bus import EventBus  # noqa: E402
+from core.forecast import soc_forecaster  # noqa: E402
+from core.sim_service import STEP_PHASES, SimulationService  # noqa: E402
+from core.simulator import SimulationCore  # noqa: E402
+from utils.InsightEngine import generate_insights  # noqa: E402
+from utils.metrics import metrics  # noqa: E402
+
+
+def compare(fn, n, repeat, batch=100):
+    """
+    Median per-call time (s) with metrics disabled vs enabled. Batches of
+    `batch` calls alternate between the two modes so machine noise hits both
+    equally, and the median ignores rare expensive calls (e.g. a forecast
+    recompute inside SimulationService.step).
+    """
+    timings = ([], [])
+    for i in range(2 * repeat * max(1, n // batch)):
+        enabled = i % 2
+        metrics.enabled = bool(enabled)
+        t0 = time.perf_counter()
+        for _ in range(batch):
+            fn()
+        timings[enabled].append((time.perf_counter() - t0) / batch)
+    metrics.disable()
+    return statistics.median(timings[0]), statistics.median(timings[1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget", type=float, default=0.02, help="max enabled cost per step (fraction)")
+    args = parser.parse_args()
+
+    core = SimulationCore("KIG-001", initial_soc=50, initial_temp=25)
+    service = SimulationService("KIG-001")
+    # Steps here run back to back, so live SOC races ahead of the wall-clock
+    # forecast and would trigger a 24 h re-forecast every few steps; pin it.
+    soc_forecaster.deviation_soc = float("inf")
+    bus = EventBus()
+    bus.subscribe("tick", lambda data: None)
+    bus.subscribe("tick", lambda data: None)
+    sim_state = {"sim_net_kw": 1.2, "sim_soc": 55.0, "sim_temp": 31.0}
+    context = {"ambient_temp": 26.0, "irradiance": 640.0}
+
+    workloads = (
+        ("SimulationCore.run_step", lambda: core.run_step(10, 600.0, 26.0, 3.0), 20000),
+        ("SimulationService.step", service.step, 1000),
+        ("generate_insights", lambda: generate_insights(sim_state, context), 50000),
+        ("EventBus.publish (2 subs)", lambda: bus.publish("tick", None), 50000),
+    )
+
+    print(f"{'workload':<28} {'disabled':>12} {'enabled':>12} {'overhead':>10}")
+    for name, fn, n in workloads:
+        off, on = compare(fn, n, args.repeat)
+        print(f"{name:<28} {off * 1e6:9.2f} us {on * 1e6:9.2f} us {(on - off) / off:9.1%}")
+
+    snap = metrics.snapshot()
+    for name, summary in snap["histograms"].items():
+        print(f"  {name:<20} n={summary['count']:>8,}  p50 {summary['p50_s'] * 1e6:8.2f} us  "
+              f"p99 {summary['p99_s'] * 1e6:8.2f} us")
+    # The step-level A/B above is within machine noise on a busy box; this is
+    # the exact instrumentation work one SimulationService.step adds (the
+    # step timer, with phase marks on the sampled steps, plus run_step's
+    # sampled span), and what the 2 % budget is checked against.
+    step_index = [0]
+
+    def instrumentation_only():
+        step_index[0] += 1
+        t0, marks = metrics.step_start("bench", step_index[0])
+        t_run = metrics.start_sampled()
+        metrics.stop("bench.run_step", t_run)
+        for _ in STEP_PHASES[:-1]:
+            if marks:
+                marks.append(time.perf_counter_ns())
+        if t0:
+            metrics.observe_step("bench", t0, marks, STEP_PHASES)
+
+    off, on = compare(instrumentation_only, 50000, args.repeat)
+    step_cost, _ = compare(service.step, 1000, args.repeat)
+    share = (on - off) / step_cost
+    print(f"instrumentation per service step: {off * 1e6:.2f} us disabled, {on * 1e6:.2f} us enabled "
+          f"(incl. this harness); enabling adds {(on - off) * 1e6:.2f} us = {share:.1%} "
+          f"of a {step_cost * 1e6:.1f} us step")
+    if share > args.budget:
+        print(f"FAIL: enabled instrumentation adds {share:.1%} to a step (budget {args.budget:.0%})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+# benchmarks/compare.py
+"""
+Regression gate: compares a suite.py result file against a stored baseline.
+
+Every metric is lower-is-better. A metric regresses when
+current > baseline * (1 + threshold). Exits 1 if any tracked metric
+regresses, so it can gate CI.
+
+Usage:
+    python benchmarks/compare.py baseline.json results.json
+    python benchmarks/compare.py baseline.json results.json --threshold 0.15 \\
+        --metric-threshold storage.load_csv=0.30 --metric-threshold physics.run_step=0.05
+    python benchmarks/compare.py baseline.json results.json --only physics,storage
+"""
+import argparse
+import json
+import sys
+
+DEFAULT_THRESHOLD = 0.10
+
+# Environment fields that make timings incomparable when they differ
+_ENVIRONMENT_KEYS = ("python", "implementation", "numpy", "machine", "processor", "cpu_count")
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def parse_overrides(pairs):
+    overrides = {}
+    for pair in pairs:
+        name, _, value = pair.partition("=")
+        if not value:
+            raise SystemExit(f"--metric-threshold expects NAME=FRACTION, got {pair!r}")
+        overrides[name] = float(value)
+    return overrides
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD, overrides=None, groups=None):
+    """
+    Returns:
+        list[dict]: One row per baseline metric with name, baseline, current,
+                    change (fraction), limit and status
+                    ("ok" | "improved" | "REGRESSED" | "missing").
+    """
+    overrides = overrides or {}
+    rows = []
+    for name, base in sorted(baseline["results"].items()):
+        if groups and base.get("group") not in groups:
+            continue
+        limit = overrides.get(name, threshold)
+        result = current["results"].get(name)
+        if result is None:
+            rows.append({"name": name, "baseline": base["value"], "current": None,
+                         "change": None, "limit": limit, "status": "missing"})
+            continue
+        change = result["value"] / base["value"] - 1.0
+        if change > limit:
+            status = "REGRESSED"
+        elif change < -limit:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append({"name": name, "baseline": base["value"], "current": result["value"],
+                     "change": change, "limit": limit, "status": status, "unit": result.get("unit", "")})
+    return rows
+
+
+def environment_differences(baseline, current):
+    a, b = baseline.get("environment", {}), current.get("environment", {})
+    diffs = [(key, a.get(key), b.get(key)) for key in _ENVIRONMENT_KEYS if a.get(key) != b.get(key)]
+    # Workload sizes change per-op costs (cache effects), so --scale must match too
+    old_scale = baseline.get("settings", {}).get("scale")
+    new_scale = current.get("settings", {}).get("scale")
+    if old_scale != new_scale:
+        diffs.append(("scale", old_scale, new_scale))
+    return diffs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown as a fraction (default 0.10)")
+    parser.add_argument("--metric-threshold", action="append", default=[], metavar="NAME=FRACTION")
+    parser.add_argument("--only", default="", help="comma-separated groups to gate on")
+    parser.add_argument("--allow-missing", action="store_true", help="do not fail on metrics absent from current")
+    args = parser.parse_args()
+
+    baseline, current = load(args.baseline), load(args.current)
+    for key, old, new in environment_differences(baseline, current):
+        print(f"warning: environment differs: {key}: {old} -> {new}")
+
+    groups = {g for g in args.only.split(",") if g}
+    rows = compare(baseline, current, args.threshold, parse_overrides(args.metric_threshold), groups)
+
+    print(f"{'metric':<40} {'baseline':>12} {'current':>12} {'change':>8} {'limit':>7}  status")
+    for row in rows:
+        if row["current"] is None:
+            print(f"{row['name']:<40} {row['baseline']:12.1f} {'-':>12} {'-':>8} {row['limit']:6.0%}  missing")
+            continue
+        print(f"{row['name']:<40} {row['baseline']:12.1f} {row['current']:12.1f} "
+              f"{row['change']:+7.1%} {row['limit']:6.0%}  {row['status']}")
+
+    regressed = [row["name"] for row in rows if row["status"] == "REGRESSED"]
+    missing = [row["name"] for row in rows if row["status"] == "missing"]
+    if regressed:
+        print(f"FAIL: {len(regressed)} metric(s) regressed: {', '.join(regressed)}")
+    if missing and not args.allow_missing:
+        print(f"FAIL: {len(missing)} metric(s) missing from {args.current}: {', '.join(missing)}")
+    return 1 if regressed or (missing and not args.allow_missing) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,424 @@
+# benchmarks/suite.py
+"""
+Reproducible offline benchmark suite. Writes machine-readable JSON.
+
+Covers the physics models (scalar and batched), the EventBus and
+DeviceRegistry, insight generation, day-ahead dispatch planning, and
+history ingestion of KIG-001_historical_data.csv-shaped files scaled to
+millions of rows.
+Every metric is "lower is better" (ns per op / per row / per twin-step),
+taken as the best of --repeat runs.
+
+Usage:
+    python benchmarks/suite.py --out results.json
+    python benchmarks/suite.py --quick --only physics,bus
+    python benchmarks/compare.py baseline.json results.json   # regression gate
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.alarms import AlarmEngine, AlarmRule  # noqa: E402
+from core.batch_sim import BatchSimulation  # noqa: E402
+from core.device_registry.registry_manager import DeviceRegistry  # noqa: E402
+from core.dispatch import DEFAULT_STEP_HOURS, DispatchPlanner, plan_fleet  # noqa: E402
+from core.event_bus import EventBus  # noqa: E402
+from core.history_cache import HistoryQueryCache  # noqa: E402
+from core.history_store import HISTORY_COLUMNS, PROJECT_ROOT, HistoryStore  # noqa: E402
+from core.noise import NoiseSource  # noqa: E402
+from core.simulator import SimulationCore  # noqa: E402
+from core.tariff import TariffEngine, load_tariffs  # noqa: E402
+from physics.battery import Battery  # noqa: E402
+from physics.inverter import Inverter, InverterBank  # noqa: E402
+from physics.SOHModel import SOHModel  # noqa: E402
+from physics.stress import StressCounters  # noqa: E402
+from physics.solar import SolarPanel, expected_irradiance  # noqa: E402
+from utils.InsightEngine import generate_insight_codes, generate_insights  # noqa: E402
+
+SCHEMA_VERSION = 1
+CASES = []
+
+
+def case(name, group):
+    """Registers a benchmark. The function takes (scale, repeat) and returns a result dict."""
+    def decorator(fn):
+        CASES.append((name, group, fn))
+        return fn
+    return decorator
+
+
+def measure(fn, ops, repeat, ops_per_call=1):
+    """
+    Calls fn() `ops` times per run, `repeat` runs.
+
+    Returns:
+        dict: value (best ns per op), median_ns, ops, unit.
+    """
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter_ns()
+        for _ in range(ops):
+            fn()
+        runs.append((time.perf_counter_ns() - t0) / (ops * ops_per_call))
+    return {"value": min(runs), "median_ns": statistics.median(runs), "ops": ops * ops_per_call, "unit": "ns/op"}
+
+
+def measure_once(fn, n_items, repeat, unit="ns/row"):
+    """Times a bulk call that processes n_items, best of `repeat`."""
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter_ns()
+        fn()
+        runs.append((time.perf_counter_ns() - t0) / n_items)
+    return {"value": min(runs), "median_ns": statistics.median(runs), "ops": n_items, "unit": unit}
+
+
+# --- 1. Physics ---
+@case("physics.solar.power_output", "physics")
+def bench_solar(scale, repeat):
+    panel = SolarPanel(area=50, efficiency=0.21, temp_coeff=0.003)
+    return measure(lambda: panel.power_output(650.0, 31.0), int(200_000 * scale), repeat)
+
+
+@case("physics.battery.step", "physics")
+def bench_battery(scale, repeat):
+    battery = Battery(capacity_kwh=40, efficiency_charge=0.95, thermal_coeff=0.005)
+    return measure(lambda: battery.step(2.0, 0.0, 10 / 3600, 26.0), int(200_000 * scale), repeat)
+
+
+@case("physics.soh.update_soh", "physics")
+def bench_soh(scale, repeat):
+    model = SOHModel()
+    return measure(lambda: model.update_soh(0.4, 42.0, 10 / 3600), int(200_000 * scale), repeat)
+
+
+@case("physics.stress.update", "physics")
+def bench_stress(scale, repeat):
+    counters = StressCounters(capacity_kwh=40)
+    return measure(lambda: counters.update(31.0, 55.0, -6.0, 10 / 3600), int(200_000 * scale), repeat)
+
+
+@case("physics.inverter.step", "physics")
+def bench_inverter(scale, repeat):
+    inverter = Inverter(rated_kw=20.0)
+    return measure(lambda: inverter.step(6.8, 3.0, 12.0, 160.0, 10 / 3600, 26.0), int(200_000 * scale), repeat)
+
+
+@case("physics.inverter_bank_10k", "physics")
+def bench_inverter_bank(scale, repeat):
+    """InverterBank.step over 10k inverters; value is ns per inverter-step."""
+    n = 10_000
+    rng = np.random.default_rng(0)
+    bank = InverterBank(rng.uniform(10, 40, n))
+    pv, load = rng.uniform(0, 12, n), rng.uniform(1, 8, n)
+    charge, discharge = rng.uniform(0, 20, n), rng.uniform(0, 20, n)
+    return measure(lambda: bank.step(pv, load, charge, discharge, 10 / 3600, 26.0), int(200 * scale), repeat,
+                   ops_per_call=n)
+
+
+@case("physics.run_step", "physics")
+def bench_run_step(scale, repeat):
+    core = SimulationCore("KIG-001", initial_soc=50, initial_temp=25)
+    return measure(lambda: core.run_step(10, 650.0, 26.0, 3.0), int(50_000 * scale), repeat)
+
+
+@case("physics.batch_step_10k", "physics")
+def bench_batch_step(scale, repeat):
+    """BatchSimulation.step over 10k twins; value is ns per twin-step."""
+    n = 10_000
+    rng = np.random.default_rng(0)
+    sim = BatchSimulation(50, 0.21, 0.003, rng.uniform(10, 80, n), 0.95, 0.005, initial_soc=rng.uniform(10, 90, n))
+    load = rng.uniform(1, 8, n)
+    return measure(lambda: sim.step(10, 650.0, 26.0, load), int(200 * scale), repeat, ops_per_call=n)
+
+
+@case("physics.noise.uniform", "physics")
+def bench_noise_uniform(scale, repeat):
+    """Cursor draw from a pre-drawn block (the per-step path)."""
+    stream = NoiseSource(0).stream("BENCH-001", "load")
+    return measure(lambda: stream.uniform(-2.0, 4.0), int(500_000 * scale), repeat)
+
+
+@case("physics.noise.block_1m", "physics")
+def bench_noise_block(scale, repeat):
+    """Bulk draws for batched/sharded runs, starting mid-stream (jump-ahead)."""
+    n = int(1_000_000 * scale)
+    stream = NoiseSource(0).stream("BENCH-001", "load")
+    return measure_once(lambda: stream.block(10**9, n), n, repeat, unit="ns/op")
+
+
+# --- 2. Event bus and registry ---
+def _fanout(subscribers, scale, repeat):
+    bus = EventBus()
+    for _ in range(subscribers):
+        bus.subscribe("telemetry", lambda data: None)
+    payload = {"site_id": "KIG-001", "sim_soc": 55.0}
+    return measure(lambda: bus.publish("telemetry", payload), int(100_000 * scale / max(1, subscribers / 10)), repeat)
+
+
+@case("bus.publish_fanout_1", "bus")
+def bench_fanout_1(scale, repeat):
+    return _fanout(1, scale, repeat)
+
+
+@case("bus.publish_fanout_10", "bus")
+def bench_fanout_10(scale, repeat):
+    return _fanout(10, scale, repeat)
+
+
+@case("bus.publish_fanout_100", "bus")
+def bench_fanout_100(scale, repeat):
+    return _fanout(100, scale, repeat)
+
+
+@case("registry.register_device", "bus")
+def bench_register(scale, repeat):
+    n = int(100_000 * scale)
+    info = {"type": "battery", "brand": "Victron", "model": "Lithium Smart", "capacity_kwh": 10}
+
+    def run():
+        bus = EventBus()
+        bus.subscribe("device_registered", lambda data: None)
+        registry = DeviceRegistry(event_bus=bus)
+        for i in range(n):
+            registry.register_device(f"battery_{i:07d}", info)
+    return measure_once(run, n, repeat, unit="ns/op")
+
+
+@case("registry.get_device", "bus")
+def bench_lookup(scale, repeat):
+    n = int(100_000 * scale)
+    registry = DeviceRegistry(event_bus=EventBus())
+    ids = [f"battery_{i:07d}" for i in range(n)]
+    for device_id in ids:
+        registry.register_device(device_id, {"type": "battery"})
+
+    def run():
+        get = registry.get_device
+        for device_id in ids:
+            get(device_id)
+    return measure_once(run, n, repeat, unit="ns/op")
+
+
+# --- 3. Insights ---
+@case("insights.alarms_100x10k", "insights")
+def bench_alarms(scale, repeat):
+    """One AlarmEngine tick of 100 rules over 10k sites; value is ns per (rule, site) cell."""
+    n, signals = 10_000, ("sim_soc", "sim_temp", "sim_net_kw", "sim_soh")
+    rules = [AlarmRule(f"R{i:03d}", signals[i % 4], "above" if i % 2 else "below", 10.0 + i, 1.0, 30.0,
+                       rate=i % 10 == 0) for i in range(100)]
+    engine = AlarmEngine(rules)
+    rng = np.random.default_rng(0)
+    site_ids = [f"S{i:05d}" for i in range(n)]
+    columns = {signal: rng.uniform(0, 100, n) for signal in signals}
+    columns["updated_at"] = np.zeros(n)
+    clock = iter(range(1, 1 << 30))
+
+    def tick():
+        now = float(next(clock))
+        columns["updated_at"][:] = now
+        engine.evaluate(site_ids, columns, now)
+    tick()
+    return measure(tick, int(50 * scale), repeat, ops_per_call=n * len(rules))
+
+
+@case("insights.generate_insights", "insights")
+def bench_insights(scale, repeat):
+    sim_state = {"sim_net_kw": 1.2, "sim_soc": 55.0, "sim_temp": 31.0}
+    context = {"ambient_temp": 26.0, "irradiance": 640.0}
+    return measure(lambda: generate_insights(sim_state, context), int(200_000 * scale), repeat)
+
+
+@case("insights.generate_insight_codes_1m", "insights")
+def bench_insight_codes(scale, repeat):
+    n = int(1_000_000 * scale)
+    rng = np.random.default_rng(0)
+    columns = {
+        "sim_soc": rng.uniform(0, 100, n).round(1),
+        "sim_temp": rng.normal(30, 6, n).round(1),
+        "sim_net_kw": rng.normal(0, 5, n).round(2),
+        "ambient_temp": rng.normal(25, 3, n).round(1),
+        "irradiance": rng.uniform(0, 1000, n).round(1),
+    }
+    return measure_once(lambda: generate_insight_codes(columns), n, repeat)
+
+
+# --- 4. Dispatch ---
+def _dispatch_job(site_id="KIG-001", seed=0):
+    """(planner_kwargs, plan_kwargs) for one 5-minute site-day of the twin's profile models."""
+    core = SimulationCore(site_id, initial_soc=50, initial_temp=25)
+    battery, solar = core.battery_model, core.solar_model
+    hours = np.arange(int(round(24 / DEFAULT_STEP_HOURS))) * DEFAULT_STEP_HOURS
+    rng = np.random.default_rng(seed)
+    solar_kw = solar.area * solar.efficiency * expected_irradiance(hours) / 1000.0 * rng.uniform(0.6, 1.0)
+    load_kw = core.load_model.expected_demand(hours) * rng.uniform(0.8, 1.2, len(hours))
+    import_price = np.where((hours >= 17) & (hours < 21), 0.30, 0.12)  # Evening peak TOU
+    planner_kwargs = {
+        "capacity_kwh": battery.capacity_kwh,
+        "efficiency_charge": battery.efficiency_charge,
+        "max_power_kw": battery.max_power_kw,
+        "cycle_loss_factor": core.soh_model.cycle_loss_factor,
+    }
+    plan_kwargs = {"solar_kw": solar_kw, "load_kw": load_kw, "import_price": import_price,
+                   "export_price": 0.05, "initial_soc": 50.0}
+    return planner_kwargs, plan_kwargs
+
+
+@case("dispatch.plan_site_day", "dispatch")
+def bench_dispatch_plan(scale, repeat):
+    """DispatchPlanner.plan over one 288-step day on the 101-level SOC grid; value is ns per site-day."""
+    planner_kwargs, plan_kwargs = _dispatch_job()
+    planner = DispatchPlanner(**planner_kwargs)
+    return measure(lambda: planner.plan(**plan_kwargs), max(1, int(10 * scale)), repeat)
+
+
+@case("dispatch.plan_fleet_16", "dispatch")
+def bench_dispatch_fleet(scale, repeat):
+    """plan_fleet over 16 site-days on the process pool (all cores); value is ns per site-day."""
+    jobs = [_dispatch_job(seed=i) for i in range(16)]
+    return measure_once(lambda: plan_fleet(jobs), len(jobs), repeat, unit="ns/op")
+
+
+# --- 5. Storage ---
+def write_history_csv(path, n_rows, seed=0):
+    """A KIG-001_historical_data.csv-shaped file with n_rows 10 s samples."""
+    rng = np.random.default_rng(seed)
+    start = datetime(2025, 1, 1)
+    values = rng.uniform(0, 100, (n_rows, len(HISTORY_COLUMNS)))
+    with open(path, "w", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(("timestamp",) + HISTORY_COLUMNS)
+        for i in range(n_rows):
+            stamp = (start + timedelta(seconds=10 * i)).isoformat(sep=" ")
+            writer.writerow([stamp] + values[i].round(4).tolist())
+
+
+@case("storage.load_csv", "storage")
+def bench_load_csv(scale, repeat):
+    n = int(1_000_000 * scale)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "BENCH-001_historical_data.csv")
+        write_history_csv(path, n)
+        return measure_once(lambda: HistoryStore().load_csv(path, "BENCH-001"), n, repeat)
+
+
+@case("storage.append", "storage")
+def bench_append(scale, repeat):
+    n = int(200_000 * scale)
+    sample = {col: 1.0 for col in HISTORY_COLUMNS}
+    sample["timestamp"] = 1_700_000_000.0
+
+    def run():
+        store = HistoryStore()
+        for _ in range(n):
+            store.append("BENCH-001", sample)
+    return measure_once(run, n, repeat, unit="ns/op")
+
+
+@case("storage.history_cache_extend_7d", "storage")
+def bench_history_cache_extend(scale, repeat):
+    """Append one sample, then read a cached 7-day / 5-minute window (extended, not recomputed)."""
+    store = HistoryStore()
+    ts = np.arange(0.0, 7 * 86400, 10.0)
+    store.extend("BENCH-001", ts, {col: np.ones(len(ts)) for col in HISTORY_COLUMNS})
+    cache = HistoryQueryCache(store)
+    sample = {col: 1.0 for col in HISTORY_COLUMNS}
+    clock = iter(range(1, 1 << 30))
+
+    def step():
+        sample["timestamp"] = ts[-1] + 10.0 * next(clock)
+        store.append("BENCH-001", sample)
+        cache.query("BENCH-001", window=7 * 86400, resolution=300)
+    step()
+    return measure(step, int(2_000 * scale), repeat)
+
+
+@case("storage.tariff_bill_30d", "storage")
+def bench_tariff_bill(scale, repeat):
+    """Bill 30 days of 10 s history under the default TOU + demand tariff; value is ns per sample."""
+    store = HistoryStore()
+    ts = 1_735_689_600.0 + np.arange(0.0, 30 * 86400, 10.0)
+    rng = np.random.default_rng(0)
+    store.extend("BENCH-001", ts, {"sim_grid_kw": rng.normal(2, 5, len(ts)).round(2),
+                                   "sim_battery_kw": rng.normal(0, 3, len(ts)).round(2)})
+    engine = TariffEngine(load_tariffs())
+    return measure(lambda: engine.bill("BENCH-001", store=store), int(20 * scale), repeat, ops_per_call=len(ts))
+
+
+# --- Driver ---
+def environment():
+    """Metadata needed to judge whether two result files are comparable."""
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=PROJECT_ROOT, capture_output=True,
+                                  text=True, timeout=10).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "git_commit": git("rev-parse", "HEAD"),
+        "git_dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+    }
+
+
+def run_suite(groups=None, scale=1.0, repeat=5, log=print):
+    results = {}
+    for name, group, fn in CASES:
+        if groups and group not in groups:
+            continue
+        t0 = time.perf_counter()
+        result = fn(scale, repeat)
+        results[name] = {"group": group, **result}
+        log(f"{name:<40} {result['value']:12.1f} {result['unit']:<7} ({time.perf_counter() - t0:5.1f} s)")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default=None, help="JSON output path (default: stdout only)")
+    parser.add_argument("--only", default="", help="comma-separated groups: physics,bus,insights,dispatch,storage")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies every workload size")
+    parser.add_argument("--quick", action="store_true", help="shorthand for --scale 0.1 --repeat 3")
+    args = parser.parse_args()
+    if args.quick:
+        args.scale, args.repeat = 0.1, 3
+
+    groups = {g for g in args.only.split(",") if g}
+    report = {
+        "schema": SCHEMA_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": environment(),
+        "settings": {"scale": args.scale, "repeat": args.repeat, "groups": sorted(groups)},
+    }
+    report["results"] = run_suite(groups, args.scale, args.repeat,
+                                  log=lambda line: print(line, file=sys.stderr))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,335 @@
+# core/alarms.py
+
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+ALARMS_CHANGED_EVENT = "alarms_changed"
+
+_INITIAL_CAPACITY = 256
+_SECONDS_PER_HOUR = 3600.0
+
+# --- 1. THE RULE TABLE ---
+# signal: a FleetState column, or "data_age_s" (seconds since the site last reported).
+# op: "above" raises when the value exceeds threshold, "below" when it falls under it.
+# deadband: the value must come back past threshold -/+ deadband to clear (no chatter).
+# min_duration_s: the condition must hold this long before the alarm is raised.
+# rate: compare the signal's rate of change (units per hour) instead of its value.
+AlarmRule = namedtuple("AlarmRule", ["code", "signal", "op", "threshold", "deadband", "min_duration_s", "rate",
+                                     "message"], defaults=(0.0, 0.0, False, ""))
+
+DEFAULT_ALARM_RULES = (
+    # Same limits as the DEEP_DISCHARGE / HIGH_DISCHARGE insights, now with hysteresis
+    AlarmRule("LOW_SOC", "sim_soc", "below", 20.0, 2.0, 0.0,
+              message="Battery SOC below 20%."),
+    AlarmRule("HIGH_DISCHARGE", "sim_net_kw", "below", -5.0, 0.5, 30.0,
+              message="Net discharge above 5 kW for 30 s."),
+    AlarmRule("HIGH_TEMP", "sim_temp", "above", 45.0, 2.0, 60.0,
+              message="Battery temperature above 45 C for a minute."),
+    AlarmRule("LOW_SOH", "sim_soh", "below", 80.0, 0.5, 0.0,
+              message="Battery state of health below 80%."),
+    AlarmRule("SOC_FALLING_FAST", "sim_soc", "below", -60.0, 10.0, 60.0, rate=True,
+              message="SOC falling faster than 60%/h."),
+    AlarmRule("TEMP_RISING_FAST", "sim_temp", "above", 20.0, 5.0, 60.0, rate=True,
+              message="Battery temperature rising faster than 20 C/h."),
+    AlarmRule("STALE_DATA", "data_age_s", "above", 120.0, 0.0, 0.0,
+              message="No update from the site for 2 minutes."),
+)
+
+
+class AlarmEngine:
+    """
+    Threshold alarms for every (rule, site) pair, evaluated in one vectorized
+    pass over the latest fleet state per tick.
+
+    1. Limits live in (rules, sites) float32 arrays, pre-signed so "above"
+       and "below" rules share one comparison: raise when the signed value
+       exceeds raise_at, clear when it drops to clear_at (threshold minus
+       the deadband). Per-site overrides just write into those arrays.
+       Rules are stored grouped by input, so each group is compared against
+       one broadcast input row instead of a gathered (rules, sites) copy.
+    2. Rate-of-change rules use per-site differences between successive
+       updates (updated_at), so sites reporting at different cadences get
+       their true slope.
+    3. State is three compact arrays: whether each raise condition held at
+       the last tick (bool), for how long (float32 seconds) and the latched
+       alarm (bool). A missing (NaN) value neither raises nor clears.
+       Every step is a branch-free ufunc into a preallocated buffer; masked
+       writes (np.where / copyto(where=)) are an order of magnitude slower
+       on scattered masks.
+    4. All raise/clear transitions of a tick go out as one ALARMS_CHANGED_EVENT
+       on the EventBus, as parallel arrays.
+    """
+    def __init__(self, rules=DEFAULT_ALARM_RULES, event_bus=None):
+        rules = tuple(rules)
+        self.event_bus = event_bus
+        codes = [rule.code for rule in rules]
+        if len(set(codes)) != len(codes):
+            raise ValueError("alarm rule codes must be unique")
+        for rule in rules:
+            if rule.op not in ("above", "below"):
+                raise ValueError(f"{rule.code}: op must be 'above' or 'below', got {rule.op!r}")
+
+        # Input rows: signal values, then rates, then both again negated for "below" rules
+        self.signals = tuple(dict.fromkeys(rule.signal for rule in rules))
+        self.rate_signals = tuple(dict.fromkeys(rule.signal for rule in rules if rule.rate))
+        n_inputs = len(self.signals) + len(self.rate_signals)
+        self._n_inputs = n_inputs
+
+        def input_row(rule):
+            row = len(self.signals) + self.rate_signals.index(rule.signal) if rule.rate else self.signals.index(rule.signal)
+            return row + (n_inputs if rule.op == "below" else 0)
+
+        self.rules = tuple(sorted(rules, key=input_row))
+        self._input_row = np.array([input_row(rule) for rule in self.rules], dtype=np.int64)
+        bounds = np.flatnonzero(np.diff(self._input_row)) + 1
+        self._groups = [(int(self._input_row[a]), int(a), int(b))
+                        for a, b in zip(np.r_[0, bounds], np.r_[bounds, len(self.rules)])]
+        self.codes = np.array([rule.code for rule in self.rules], dtype=object)
+        self.messages = np.array([rule.message for rule in self.rules], dtype=object)
+        self._rule_index = {code: i for i, code in enumerate(self.codes)}
+        self._sign = np.array([1.0 if rule.op == "above" else -1.0 for rule in self.rules], dtype=np.float32)
+        self._default_raise = self._sign * np.array([rule.threshold for rule in self.rules], dtype=np.float32)
+        self._default_clear = self._default_raise - np.array([rule.deadband for rule in self.rules], dtype=np.float32)
+        self._default_min_duration = np.array([rule.min_duration_s for rule in self.rules], dtype=np.float32)
+
+        self._lock = threading.Lock()
+        self._index = {}
+        self._overrides = {}
+        self.size = 0
+        self.site_id = np.empty(_INITIAL_CAPACITY, dtype=object)
+        self._allocate(_INITIAL_CAPACITY)
+        self._last_time = None
+        self.evaluations = 0
+        self.raised = 0
+        self.cleared = 0
+
+    # --- Site axis ---
+    def _allocate(self, capacity):
+        n_rules, size = len(self.rules), self.size
+        old = getattr(self, "raise_at", None)
+
+        def grown(name, fill, dtype, rows=n_rules):
+            new = np.full((rows, capacity), fill, dtype=dtype)
+            if old is not None:
+                new[:, :size] = getattr(self, name)[:, :size]
+            setattr(self, name, new)
+
+        grown("raise_at", np.inf, np.float32)
+        grown("clear_at", np.inf, np.float32)
+        grown("min_duration", 0.0, np.float32)
+        grown("over", False, bool)
+        grown("held", 0.0, np.float32)
+        grown("active", False, bool)
+        n_rate = len(self.rate_signals)
+        grown("_prev_value", np.nan, np.float64, n_rate)
+        grown("_prev_time", np.nan, np.float64, n_rate)
+        grown("_rate", np.nan, np.float32, n_rate)
+        # Scratch buffers reused every tick (no per-tick allocation of the big arrays)
+        self._over_next = np.empty((n_rules, capacity), dtype=bool)
+        self._armed = np.empty((n_rules, capacity), dtype=bool)
+        self._changed = np.empty((n_rules, capacity), dtype=bool)
+
+    def _grow(self, needed):
+        capacity = len(self.site_id)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        site_id = np.empty(capacity, dtype=object)
+        site_id[:self.size] = self.site_id[:self.size]
+        self.site_id = site_id
+        self._allocate(capacity)
+
+    def _add_site(self, site_id):
+        self._grow(self.size + 1)
+        row = self.size
+        self.site_id[row] = site_id
+        self._index[site_id] = row
+        self.size += 1
+        self.raise_at[:, row] = self._default_raise
+        self.clear_at[:, row] = self._default_clear
+        self.min_duration[:, row] = self._default_min_duration
+        overrides = self._overrides.get(site_id)
+        if overrides:
+            self._write_limits(row, overrides)
+        return row
+
+    def _write_limits(self, row, rule_indices):
+        overrides = self._overrides.get(self.site_id[row], {})
+        for k in rule_indices:
+            rule = self.rules[k]
+            limits = overrides.get(k, {})
+            threshold = limits.get("threshold", rule.threshold)
+            deadband = limits.get("deadband", rule.deadband)
+            signed = self._sign[k] * threshold
+            self.raise_at[k, row] = signed
+            self.clear_at[k, row] = signed - deadband
+            self.min_duration[k, row] = limits.get("min_duration_s", rule.min_duration_s)
+
+    def set_site_limits(self, site_id, code, threshold=None, deadband=None, min_duration_s=None):
+        """
+        Overrides one rule's limits for one site (None keeps the current value).
+        Sites not seen yet get the override when they first appear.
+
+        Raises:
+            KeyError: Unknown rule code.
+        """
+        k = self._rule_index[code]
+        with self._lock:
+            limits = self._overrides.setdefault(site_id, {}).setdefault(k, {})
+            for name, value in (("threshold", threshold), ("deadband", deadband), ("min_duration_s", min_duration_s)):
+                if value is not None:
+                    limits[name] = float(value)
+            row = self._index.get(site_id)
+            if row is not None:
+                self._write_limits(row, (k,))
+
+    def load_overrides(self, overrides):
+        """Bulk set_site_limits from {site_id: {code: {"threshold": ..., "deadband": ..., "min_duration_s": ...}}}."""
+        for site_id, rules in overrides.items():
+            for code, limits in rules.items():
+                self.set_site_limits(site_id, code, **limits)
+
+    # --- 2. Evaluation ---
+    def _inputs(self, columns, n, now):
+        inputs = np.empty((2 * self._n_inputs, n), dtype=np.float32)
+        for i, signal in enumerate(self.signals):
+            if signal == "data_age_s" and "data_age_s" not in columns:
+                updated_at = columns.get("updated_at")
+                inputs[i] = np.nan if updated_at is None else now - np.asarray(updated_at[:n])
+            else:
+                values = columns.get(signal)
+                inputs[i] = np.nan if values is None else values[:n]
+
+        updated_at = columns.get("updated_at")
+        sample_time = np.full(n, now) if updated_at is None else np.asarray(updated_at[:n], dtype=np.float64)
+        for j, signal in enumerate(self.rate_signals):
+            value = columns.get(signal)
+            value = np.full(n, np.nan) if value is None else np.asarray(value[:n], dtype=np.float64)
+            prev_value, prev_time = self._prev_value[j, :n], self._prev_time[j, :n]
+            # Only sites with a new sample get a new slope; the others keep theirs
+            fresh = sample_time > prev_time
+            hours = (sample_time - prev_time) / _SECONDS_PER_HOUR
+            self._rate[j, :n] = np.where(fresh, (value - prev_value) / np.where(fresh, hours, 1.0),
+                                         self._rate[j, :n])
+            advance = ~(sample_time <= prev_time)
+            prev_value[advance] = value[advance]
+            prev_time[advance] = sample_time[advance]
+            inputs[len(self.signals) + j] = self._rate[j, :n]
+
+        np.negative(inputs[:self._n_inputs], out=inputs[self._n_inputs:])
+        return inputs
+
+    def evaluate(self, site_ids, columns, now=None):
+        """
+        Evaluates every rule for every site and publishes the transitions.
+
+        Args:
+            site_ids (sequence): Sites the columns describe. The engine's site
+                                 axis is append-only: the first `size` entries
+                                 must be the sites it already knows, in order
+                                 (FleetState rows satisfy this).
+            columns (dict): Signal arrays aligned with site_ids (any of the rule
+                            signals, plus "updated_at" for rates and data age).
+            now (float): Tick time (epoch seconds), default time.time().
+
+        Returns:
+            dict: "raised" / "cleared" transitions of this tick, each
+                  {"code", "site_id", "value", "message"} arrays.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            for site_id in site_ids[self.size:]:
+                self._add_site(site_id)
+            n = self.size
+            dt = 0.0 if self._last_time is None else max(now - self._last_time, 0.0)
+            self._last_time = now
+
+            # 1. Signed inputs; each rule group compares against its row
+            inputs = self._inputs(columns, n, now)
+            over, armed, changed = self._over_next[:, :n], self._armed[:, :n], self._changed[:, :n]
+            for row, a, b in self._groups:
+                np.greater(inputs[row], self.raise_at[a:b, :n], out=over[a:b])
+                np.less_equal(inputs[row], self.clear_at[a:b, :n], out=changed[a:b])
+
+            # 2. Duration: held grows while the raise condition stays true and
+            #    restarts from 0 when it becomes true (NaN counts as not true)
+            held, still_over = self.held[:, :n], self.over[:, :n]
+            np.add(held, dt, out=held)
+            np.logical_and(still_over, over, out=still_over)
+            np.multiply(held, still_over, out=held)
+            self.over, self._over_next = self._over_next, self.over
+
+            # 3. Transitions: inactive cells flip once held long enough, active
+            #    ones once back past the deadband (changed holds "clearing"):
+            #    changed = active ? clearing : armed, then toggle in place
+            active = self.active[:, :n]
+            np.greater_equal(held, self.min_duration[:, :n], out=armed)
+            np.logical_and(armed, over, out=armed)
+            np.logical_xor(changed, armed, out=changed)
+            np.logical_and(changed, active, out=changed)
+            np.logical_xor(changed, armed, out=changed)
+            self.evaluations += 1
+            if not changed.any():
+                return self._publish(now, None, None, None, None)
+            np.logical_xor(active, changed, out=active)
+            rule_idx, rows = np.nonzero(changed)
+            raised = active[rule_idx, rows]
+            value = inputs[self._input_row[rule_idx], rows] * self._sign[rule_idx]
+            self.raised += int(raised.sum())
+            self.cleared += int(len(raised) - raised.sum())
+        return self._publish(now, rule_idx, rows, value, raised)
+
+    def _publish(self, now, rule_idx, rows, value, raised):
+        def transitions(mask):
+            if rule_idx is None:
+                empty = np.array([], dtype=object)
+                return {"code": empty, "site_id": empty, "value": np.array([], dtype=np.float32), "message": empty}
+            return {
+                "code": self.codes[rule_idx[mask]],
+                "site_id": self.site_id[rows[mask]],
+                "value": value[mask],
+                "message": self.messages[rule_idx[mask]],
+            }
+
+        event = {"timestamp": now, "raised": transitions(raised),
+                 "cleared": transitions(None if raised is None else ~raised)}
+        if rule_idx is not None and self.event_bus is not None:
+            self.event_bus.publish(ALARMS_CHANGED_EVENT, event)
+        return event
+
+    def evaluate_fleet(self, fleet_state, now=None):
+        """evaluate() over a FleetState's latest columns."""
+        site_ids, columns = fleet_state.columns(("updated_at",) + self.signals + self.rate_signals)
+        return self.evaluate(site_ids, columns, now)
+
+    # --- Readers ---
+    def active_alarms(self, site_id=None):
+        """Currently latched alarms (of one site, or all) as {"code", "site_id", "message"} arrays."""
+        with self._lock:
+            if site_id is None:
+                rule_idx, rows = np.nonzero(self.active[:, :self.size])
+            else:
+                row = self._index.get(site_id)
+                rule_idx = np.array([], dtype=np.int64) if row is None else np.flatnonzero(self.active[:, row])
+                rows = np.full(len(rule_idx), 0 if row is None else row)
+            return {"code": self.codes[rule_idx], "site_id": self.site_id[rows], "message": self.messages[rule_idx]}
+
+    def stats(self):
+        with self._lock:
+            active = self.active[:, :self.size].sum(axis=1)
+        return {
+            "sites": self.size,
+            "rules": len(self.rules),
+            "evaluations": self.evaluations,
+            "raised": self.raised,
+            "cleared": self.cleared,
+            "active": {code: int(count) for code, count in zip(self.codes, active)},
+        }
+
+
+# Process-wide alarm engine (the headless service ticks it over the fleet table).
+alarm_engine = AlarmEngine()
@@ -0,0 +1,162 @@
+# core/batch_sim.py
+
+import numpy as np
+
+from physics.inverter import InverterBank, default_inverter_rating, inverter_settings
+from physics.SOHModel import SOHModel
+
+# Same hard-coded physics constants as physics/battery.py and physics/SOHModel.py
+_MAX_TEMP_C = 55.0
+_HEAT_TRANSFER_ALPHA = 0.1
+_C_RATE_LIMIT = 4.0
+_SOH_DEFAULTS = SOHModel()
+
+
+class BatchSimulation:
+    """
+    N independent Digital Twins stepped together with NumPy.
+
+    Reproduces SimulationCore.run_step (SolarPanel -> Inverter -> Battery ->
+    SOHModel) element-wise, so one call advances a whole fleet, a forecast
+    ensemble or a sizing grid instead of looping over SimulationCore objects.
+    Every parameter broadcasts to shape (N,).
+
+    Besides the twin state it accumulates, per configuration, the load energy
+    neither battery nor grid could serve (unmet), the PV energy nothing could
+    absorb (curtailed) and the charge / discharge throughput used for cycle
+    counting.
+    """
+    def __init__(self, panel_area_m2, panel_efficiency, panel_temp_coeff,
+                 battery_capacity_kwh, battery_charge_eff, battery_thermal_coeff,
+                 initial_soc=50.0, initial_temp=25.0, initial_soh=100.0,
+                 inverter_rated_kw=None, grid_import_limit_kw=0.0, grid_export_limit_kw=0.0,
+                 initial_inverter_temp=None):
+        arrays = np.broadcast_arrays(
+            *(np.asarray(v, dtype=np.float64) for v in (
+                panel_area_m2, panel_efficiency, panel_temp_coeff,
+                battery_capacity_kwh, battery_charge_eff, battery_thermal_coeff,
+                initial_soc, initial_temp, initial_soh,
+            ))
+        )
+        (self.panel_area, self.panel_efficiency, self.panel_temp_coeff,
+         self.capacity_kwh, self.charge_eff, self.thermal_coeff,
+         initial_soc, initial_temp, initial_soh) = (np.array(a, ndmin=1) for a in arrays)
+        self.size = self.capacity_kwh.shape[0]
+
+        self.max_power_kw = self.capacity_kwh * _C_RATE_LIMIT
+        self.energy = self.capacity_kwh * initial_soc / 100.0
+        self.temperature = initial_temp.copy()
+        self.soh = initial_soh.copy()
+
+        # Power flow (physics/inverter.py); defaults as in inverter_settings
+        if inverter_rated_kw is None:
+            inverter_rated_kw = default_inverter_rating(self.panel_area, self.panel_efficiency, self.capacity_kwh)
+        self.inverter = InverterBank(
+            np.broadcast_to(inverter_rated_kw, (self.size,)), grid_import_limit_kw, grid_export_limit_kw,
+            initial_temp=initial_temp if initial_inverter_temp is None else initial_inverter_temp,
+        )
+
+        self.cycle_loss_factor = _SOH_DEFAULTS.cycle_loss_factor
+        self.thermal_accelerator = _SOH_DEFAULTS.thermal_accelerator
+        self.thermal_threshold_c = _SOH_DEFAULTS.thermal_threshold_c
+
+        self.reset_counters()
+
+    @classmethod
+    def from_site_params(cls, params, **state):
+        """Builds from site config mappings (a single one or a list of them)."""
+        if not isinstance(params, (list, tuple)):
+            params = [params]
+        keys = ("panel_area_m2", "panel_efficiency", "panel_temp_coeff",
+                "battery_capacity_kwh", "battery_charge_eff", "battery_thermal_coeff")
+        settings = [inverter_settings(p) for p in params]
+        return cls(
+            *(np.array([p[k] for p in params], dtype=np.float64) for k in keys),
+            inverter_rated_kw=np.array([s["rated_kw"] for s in settings], dtype=np.float64),
+            grid_import_limit_kw=np.array([s["grid_import_limit_kw"] for s in settings], dtype=np.float64),
+            grid_export_limit_kw=np.array([s["grid_export_limit_kw"] for s in settings], dtype=np.float64),
+            **state,
+        )
+
+    def reset_counters(self):
+        self.unmet_kwh = np.zeros(self.size)
+        self.curtailed_kwh = np.zeros(self.size)
+        self.charge_kwh = np.zeros(self.size)
+        self.discharge_kwh = np.zeros(self.size)
+
+    def get_soc(self):
+        return np.clip(self.energy / self.capacity_kwh * 100.0, 0.0, 100.0)
+
+    def set_state(self, soc=None, temp=None, soh=None, inverter_temp=None):
+        """Re-anchors the twins (e.g. from SimulationCore or an estimator)."""
+        if soc is not None:
+            self.energy = self.capacity_kwh * np.broadcast_to(np.asarray(soc, dtype=np.float64), (self.size,)) / 100.0
+        if temp is not None:
+            self.temperature = np.broadcast_to(np.asarray(temp, dtype=np.float64), (self.size,)).copy()
+        if soh is not None:
+            self.soh = np.broadcast_to(np.asarray(soh, dtype=np.float64), (self.size,)).copy()
+        if inverter_temp is not None:
+            self.inverter.temperature = np.broadcast_to(np.asarray(inverter_temp, dtype=np.float64), (self.size,)).copy()
+
+    def step(self, time_step_seconds, irradiance, ambient_temp, load_kw):
+        """
+        One run_step for every twin. Inputs are scalars or arrays of shape (N,).
+
+        Returns:
+            dict: Unrounded arrays for sim_soc, sim_temp, sim_soh, sim_solar_kw,
+                  sim_load_kw, sim_net_kw, sim_battery_kw, sim_grid_kw, inverter_temp.
+        """
+        dt_hours = time_step_seconds / 3600.0
+
+        # 1. Solar (SolarPanel.power_output)
+        temp_loss = 1 - self.panel_temp_coeff * np.maximum(0.0, ambient_temp - 25)
+        solar_kw = irradiance * self.panel_area * self.panel_efficiency * temp_loss / 1000.0
+        net_power = solar_kw - load_kw
+
+        # 2. Power flow (Inverter.step) against the battery's limits this step
+        charge_limit = np.maximum(0.0, self.capacity_kwh - self.energy) / (dt_hours * self.charge_eff)
+        discharge_limit = np.minimum(self.max_power_kw, np.maximum(0.0, self.energy) / dt_hours)
+        flow = self.inverter.step(solar_kw, load_kw, charge_limit, discharge_limit, dt_hours, ambient_temp)
+        battery_kw = flow["battery_kw"]
+
+        # 3. Battery energy balance (Battery.step)
+        power_in = np.maximum(0.0, battery_kw)
+        power_out = np.minimum(np.maximum(0.0, -battery_kw), self.max_power_kw)
+        prev_soc = self.get_soc()
+        prev_energy = self.energy
+        target = self.energy + (power_in * self.charge_eff - power_out) * dt_hours
+        self.energy = np.clip(target, 0.0, self.capacity_kwh)
+        soc = self.get_soc()
+
+        # Load neither the battery nor the grid could serve, PV clipped, and throughput
+        self.unmet_kwh += flow["unmet_kw"] * dt_hours
+        self.curtailed_kwh += flow["curtailed_kw"] * dt_hours
+        delta_energy = self.energy - prev_energy
+        self.charge_kwh += np.maximum(0.0, delta_energy)
+        self.discharge_kwh += np.maximum(0.0, -delta_energy)
+
+        # 4. Thermal (lumped model)
+        heat = (power_in + power_out) * self.thermal_coeff * dt_hours
+        cooling = _HEAT_TRANSFER_ALPHA * (ambient_temp - self.temperature) * dt_hours
+        self.temperature = np.minimum(_MAX_TEMP_C, self.temperature + cooling + heat)
+
+        # 5. SOH (SOHModel.update_soh)
+        multiplier = np.where(self.temperature > self.thermal_threshold_c, self.thermal_accelerator, 1.0)
+        loss = np.abs(soc - prev_soc) * self.cycle_loss_factor * dt_hours * multiplier
+        self.soh = np.maximum(0.0, self.soh - loss)
+
+        return {
+            "sim_soc": soc,
+            "sim_temp": self.temperature,
+            "sim_soh": self.soh,
+            "sim_solar_kw": solar_kw,
+            "sim_load_kw": np.broadcast_to(load_kw, (self.size,)),
+            "sim_net_kw": net_power,
+            "sim_battery_kw": battery_kw,
+            "sim_grid_kw": flow["grid_kw"],
+            "inverter_temp": self.inverter.temperature,
+        }
+
+    def equivalent_full_cycles(self):
+        """Discharge throughput divided by nominal capacity."""
+        return self.discharge_kwh / self.capacity_kwh
@@ -0,0 +1,142 @@
+# core/battery_health.py
+
+import threading
+
+import numpy as np
+
+from physics.stress import C_RATE_BINS, C_RATE_EDGES, SOC_BINS, SOC_STEP, TEMP_BINS, TEMP_STEP_C, temp_bin_edges
+
+_INITIAL_CAPACITY = 256
+_HISTOGRAMS = {"temp_hours": TEMP_BINS, "soc_hours": SOC_BINS, "c_rate_hours": C_RATE_BINS}
+_SCALARS = ("hours", "charge_kwh", "discharge_kwh", "capacity_kwh")
+
+# Bin lower edges, for thresholds and percentiles over the histograms
+TEMP_LOWER_C = np.array(temp_bin_edges())
+SOC_LOWER = np.arange(SOC_BINS) * SOC_STEP
+C_RATE_LOWER = np.array((0.0,) + C_RATE_EDGES)
+# Bin midpoints for mean temperature (the open end bins use their inner edge)
+TEMP_MID_C = np.concatenate(([TEMP_LOWER_C[1]], TEMP_LOWER_C[1:-1] + TEMP_STEP_C / 2, [TEMP_LOWER_C[-1]]))
+
+
+class FleetStress:
+    """
+    Lifetime stress counters (physics.stress.StressCounters) of every
+    battery in the fleet, one row per site in fixed-size arrays:
+    (N, bins) float64 histograms plus throughput columns.
+
+    Writers replace one row in O(bins); health reports over the whole fleet
+    are a handful of vectorized reductions, so thousands of batteries take
+    milliseconds, with no history rescans.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = {}
+        self.size = 0
+        self.site_id = np.empty(_INITIAL_CAPACITY, dtype=object)
+        self.scalars = {name: np.zeros(_INITIAL_CAPACITY) for name in _SCALARS}
+        self.histograms = {name: np.zeros((_INITIAL_CAPACITY, bins)) for name, bins in _HISTOGRAMS.items()}
+
+    # --- Writers ---
+    def _grow(self, needed):
+        capacity = len(self.site_id)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+
+        def grown(array):
+            new = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            new[:self.size] = array[:self.size]
+            return new
+
+        self.site_id = grown(self.site_id)
+        self.scalars = {name: grown(arr) for name, arr in self.scalars.items()}
+        self.histograms = {name: grown(arr) for name, arr in self.histograms.items()}
+
+    def _row(self, site_id):
+        row = self._index.get(site_id)
+        if row is None:
+            self._grow(self.size + 1)
+            row = self.size
+            self.site_id[row] = site_id
+            self._index[site_id] = row
+            self.size += 1
+        return row
+
+    def update(self, site_id, counters):
+        """Writes one battery's counters (StressCounters.to_dict() or an equal mapping)."""
+        with self._lock:
+            row = self._row(site_id)
+            for name in _SCALARS:
+                self.scalars[name][row] = counters.get(name, 0.0)
+            for name, bins in _HISTOGRAMS.items():
+                values = counters.get(name)
+                if values is not None and len(values) == bins:
+                    self.histograms[name][row] = values
+
+    def update_batch(self, site_ids, columns):
+        """
+        Bulk write for many batteries.
+
+        Args:
+            site_ids (sequence): Batteries being written.
+            columns (dict): Any of the scalar fields (arrays aligned with
+                            site_ids) and histograms (arrays of shape (n, bins)).
+        """
+        with self._lock:
+            rows = np.fromiter((self._row(s) for s in site_ids), dtype=np.int64, count=len(site_ids))
+            for name, values in columns.items():
+                if name in self.scalars:
+                    self.scalars[name][rows] = values
+                elif name in self.histograms:
+                    self.histograms[name][rows] = values
+
+    # --- Readers ---
+    def report(self, site_ids=None, hot_c=40.0, high_soc=90.0, low_soc=10.0, c_rate_percentile=0.95):
+        """
+        Health indicators for the fleet (or the given sites) in one pass.
+        Thresholds snap to bin edges: hours_hot and high_soc_fraction count
+        the bins starting at or above them, low_soc_fraction those below.
+
+        Args:
+            hot_c (float): Temperature for "hours_hot" (SOHModel's thermal threshold by default).
+            high_soc, low_soc (float): SOC bounds for the dwell fractions.
+            c_rate_percentile (float): Fraction of operating time for "c_rate_p".
+
+        Returns:
+            dict: Arrays aligned with "site_id": hours, charge_kwh, discharge_kwh,
+                  equivalent_full_cycles, hours_hot, high_soc_fraction,
+                  low_soc_fraction, mean_temp_c, c_rate_p (lower bin edge).
+        """
+        with self._lock:
+            n = self.size
+            if site_ids is None:
+                rows = np.arange(n)
+            else:
+                rows = np.array([self._index[s] for s in site_ids if s in self._index], dtype=np.int64)
+            site_id = self.site_id[rows]
+            scalars = {name: arr[rows] for name, arr in self.scalars.items()}
+            temp, soc, c_rate = (self.histograms[name][rows] for name in ("temp_hours", "soc_hours", "c_rate_hours"))
+
+        hours = scalars["hours"]
+        safe_hours = np.where(hours > 0, hours, np.nan)
+
+        cumulative = np.cumsum(c_rate, axis=1)
+        reached = cumulative >= c_rate_percentile * cumulative[:, -1:]
+        return {
+            "site_id": site_id,
+            "hours": hours,
+            "charge_kwh": scalars["charge_kwh"],
+            "discharge_kwh": scalars["discharge_kwh"],
+            "equivalent_full_cycles": scalars["discharge_kwh"] / np.where(
+                scalars["capacity_kwh"] > 0, scalars["capacity_kwh"], np.nan),
+            "hours_hot": temp[:, TEMP_LOWER_C >= hot_c].sum(axis=1),
+            "high_soc_fraction": soc[:, SOC_LOWER >= high_soc].sum(axis=1) / safe_hours,
+            "low_soc_fraction": soc[:, SOC_LOWER < low_soc].sum(axis=1) / safe_hours,
+            "mean_temp_c": temp @ TEMP_MID_C / safe_hours,
+            "c_rate_p": np.where(hours > 0, C_RATE_LOWER[reached.argmax(axis=1)], np.nan),
+        }
+
+
+# Process-wide stress table shared by every session.
+fleet_stress = FleetStress()
@@ -0,0 +1,237 @@
+# core/config_manager.py
+
+import json
+import os
+import threading
+from types import MappingProxyType
+
+from core.history_store import PROJECT_ROOT
+
+DEFAULT_CONFIG_DIR = os.environ.get("SKYLINE_CONFIG_DIR", os.path.join(PROJECT_ROOT, "config", "sites"))
+CONFIG_SUFFIX = ".json"
+CONFIG_CHANGED_EVENT = "config_changed"
+_RELOAD_EVENTS = ("created", "modified", "deleted", "moved", "closed")
+
+# field: (type, minimum, maximum, required)
+SITE_SCHEMA = {
+    "panel_area_m2":         (float, 0.0, None, True),
+    "panel_efficiency":      (float, 0.0, 1.0, True),
+    "panel_temp_coeff":      (float, 0.0, 0.05, True),
+    "battery_capacity_kwh":  (float, 0.0, None, True),
+    "battery_charge_eff":    (float, 0.0, 1.0, True),
+    "battery_thermal_coeff": (float, 0.0, None, True),
+    "base_load_kw":          (float, 0.0, None, True),
+    "inverter_rated_kw":     (float, 0.0, None, False),
+    "grid_import_limit_kw":  (float, 0.0, None, False),
+    "grid_export_limit_kw":  (float, 0.0, None, False),
+    "latitude":              (float, -90.0, 90.0, False),
+    "longitude":             (float, -180.0, 180.0, False),
+    "tariff":                (str, None, None, False),    # Name in config/tariffs.json (core.tariff)
+    "name":                  (str, None, None, False),
+}
+
+
+class ConfigError(ValueError):
+    """A site config file is malformed or violates SITE_SCHEMA."""
+
+
+class UnknownSiteError(KeyError):
+    """No config file exists for the requested site."""
+
+
+def short_site_id(site_id):
+    """'KIG-001 (Kigali Hub)' -> 'KIG-001', the convention SimulationCore uses."""
+    return site_id.split(' ')[0]
+
+
+def validate_site_config(site_id, raw):
+    """
+    Checks a parsed config against SITE_SCHEMA.
+
+    Returns:
+        MappingProxyType: Immutable params (numbers coerced to float, plus 'site_id').
+
+    Raises:
+        ConfigError: On unknown fields, missing required fields, wrong types or
+                     out-of-range values.
+    """
+    if not isinstance(raw, dict):
+        raise ConfigError(f"{site_id}: config must be a JSON object")
+    unknown = set(raw) - set(SITE_SCHEMA) - {"site_id"}
+    if unknown:
+        raise ConfigError(f"{site_id}: unknown field(s) {', '.join(sorted(unknown))}")
+    if raw.get("site_id", site_id) != site_id:
+        raise ConfigError(f"{site_id}: file declares site_id {raw['site_id']!r}")
+
+    params = {"site_id": site_id}
+    for field, (kind, minimum, maximum, required) in SITE_SCHEMA.items():
+        if field not in raw:
+            if required:
+                raise ConfigError(f"{site_id}: missing required field {field!r}")
+            continue
+        value = raw[field]
+        if kind is float:
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise ConfigError(f"{site_id}: {field} must be a number, got {value!r}")
+            value = float(value)
+            if minimum is not None and value < minimum:
+                raise ConfigError(f"{site_id}: {field}={value} is below the minimum {minimum}")
+            if maximum is not None and value > maximum:
+                raise ConfigError(f"{site_id}: {field}={value} is above the maximum {maximum}")
+        elif not isinstance(value, kind):
+            raise ConfigError(f"{site_id}: {field} must be {kind.__name__}, got {value!r}")
+        params[field] = value
+    return MappingProxyType(params)
+
+
+def load_site_config(path):
+    site_id = os.path.basename(path)[:-len(CONFIG_SUFFIX)]
+    try:
+        with open(path, encoding="utf-8") as f:
+            raw = json.load(f)
+    except json.JSONDecodeError as exc:
+        raise ConfigError(f"{site_id}: invalid JSON ({exc})") from exc
+    return validate_site_config(site_id, raw)
+
+
+class ConfigManager:
+    """
+    Site parameters from a directory of <SITE_ID>.json files.
+
+    1. Startup only lists the directory; each file is parsed and validated the
+       first time its site is requested, then cached as an immutable mapping.
+    2. get() is a dict lookup once cached and never falls back to another
+       site: a missing file raises UnknownSiteError.
+    3. start_watching() hot-reloads edits via watchdog. Changed files are
+       re-parsed on the watcher thread and swapped in with a single dict
+       assignment, so readers (the simulation loops) never wait on a reload.
+       Only the touched site is invalidated; an invalid edit keeps the last
+       good config and is recorded in `errors`.
+    """
+    def __init__(self, config_dir=DEFAULT_CONFIG_DIR, event_bus=None):
+        self.config_dir = config_dir
+        self.event_bus = event_bus
+        self._paths = {}
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._observer = None
+        self.errors = {}
+        self.reloads = 0
+        self.rescan()
+
+    def rescan(self):
+        """Rebuilds the site index from the directory listing (no files are parsed)."""
+        paths = {}
+        if os.path.isdir(self.config_dir):
+            with os.scandir(self.config_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(CONFIG_SUFFIX) and entry.is_file():
+                        paths[entry.name[:-len(CONFIG_SUFFIX)]] = entry.path
+        self._paths = paths
+
+    def site_ids(self):
+        return sorted(self._paths)
+
+    def __contains__(self, site_id):
+        return short_site_id(site_id) in self._paths
+
+    def get(self, site_id):
+        """
+        Returns the immutable params for a site (full or short site ID).
+
+        Raises:
+            UnknownSiteError: No config file for the site.
+            ConfigError: The file exists but is invalid.
+        """
+        site_id = short_site_id(site_id)
+        params = self._cache.get(site_id)
+        if params is not None:
+            return params
+        path = self._paths.get(site_id)
+        if path is None:
+            raise UnknownSiteError(site_id)
+        params = load_site_config(path)
+        with self._lock:
+            # Keep a config the watcher swapped in meanwhile
+            return self._cache.setdefault(site_id, params)
+
+    def cached(self, site_id):
+        """Cached params or None; never touches the disk (for per-step checks)."""
+        return self._cache.get(short_site_id(site_id))
+
+    # --- Hot reload ---
+    def _reload(self, path):
+        name = os.path.basename(path)
+        if not name.endswith(CONFIG_SUFFIX):
+            return
+        site_id = name[:-len(CONFIG_SUFFIX)]
+
+        if not os.path.isfile(path):
+            with self._lock:
+                paths = dict(self._paths)
+                paths.pop(site_id, None)
+                self._paths = paths
+                removed = self._cache.pop(site_id, None)
+            self.errors.pop(site_id, None)
+            self._publish(site_id, removed, None)
+            return
+
+        try:
+            params = load_site_config(path)
+        except (OSError, ConfigError) as exc:
+            self.errors[site_id] = str(exc)
+            return
+        self.errors.pop(site_id, None)
+        with self._lock:
+            if site_id not in self._paths:
+                self._paths = {**self._paths, site_id: path}
+            previous = self._cache.get(site_id)
+            if previous == params:
+                return
+            self._cache[site_id] = params
+            self.reloads += 1
+        self._publish(site_id, previous, params)
+
+    def _publish(self, site_id, previous, current):
+        if self.event_bus is not None:
+            self.event_bus.publish(CONFIG_CHANGED_EVENT, {
+                "site_id": site_id,
+                "previous": previous,
+                "current": current,
+            })
+
+    def start_watching(self):
+        """Starts the watchdog observer (idempotent)."""
+        if self._observer is not None:
+            return
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        manager = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory or event.event_type not in _RELOAD_EVENTS:
+                    return
+                for path in (event.src_path, getattr(event, "dest_path", "")):
+                    if path:
+                        manager._reload(os.fsdecode(path))
+
+        with self._lock:
+            if self._observer is not None or not os.path.isdir(self.config_dir):
+                return
+            observer = Observer()
+            observer.schedule(_Handler(), self.config_dir, recursive=False)
+            observer.daemon = True
+            observer.start()
+            self._observer = observer
+
+    def stop_watching(self):
+        observer, self._observer = self._observer, None
+        if observer is not None:
+            observer.stop()
+            observer.join()
+
+
+# Process-wide site configuration.
+site_configs = ConfigManager()
@@ -0,0 +1,164 @@
+# core/dispatch.py
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+DEFAULT_SOC_LEVELS = 101          # 1% SOC grid
+DEFAULT_STEP_HOURS = 5 / 60.0     # 5-minute resolution (288 steps per day)
+DEFAULT_SOH_COST_PER_PERCENT = 50.0  # Currency per 1% SOH lost (replacement cost / usable SOH range)
+
+
+class DispatchPlanner:
+    """
+    Day-ahead charge/discharge schedule by dynamic programming over a
+    discretized SOC grid.
+
+    The battery follows the same physics as physics/battery.py: charge power is
+    scaled by efficiency_charge, discharge is limited by max_power_kw, and
+    cycling wears the battery by SOHModel's cycle_loss_factor. Each stage of
+    the backward recursion evaluates every (SOC now, SOC next) transition as
+    one NumPy matrix, so a 288-step day is a few hundred small array ops.
+    """
+    def __init__(self, capacity_kwh, efficiency_charge, max_power_kw,
+                 cycle_loss_factor=0.000001, soh_cost_per_percent=DEFAULT_SOH_COST_PER_PERCENT,
+                 soc_levels=DEFAULT_SOC_LEVELS, soc_min=0.0, soc_max=100.0,
+                 grid_import_limit_kw=np.inf, grid_export_limit_kw=np.inf):
+        self.capacity_kwh = capacity_kwh
+        self.efficiency_charge = efficiency_charge
+        self.max_power_kw = max_power_kw
+        self.cycle_loss_factor = cycle_loss_factor
+        self.soh_cost_per_percent = soh_cost_per_percent
+        self.grid_import_limit_kw = grid_import_limit_kw
+        self.grid_export_limit_kw = grid_export_limit_kw
+
+        # SOC grid (percent) and the matching stored energy (kWh)
+        self.soc_grid = np.linspace(soc_min, soc_max, soc_levels)
+        self.energy_grid = capacity_kwh * self.soc_grid / 100.0
+
+    @classmethod
+    def from_models(cls, battery, soh_model, **kwargs):
+        """Builds a planner from the twin's Battery and SOHModel instances."""
+        return cls(
+            capacity_kwh=battery.capacity_kwh,
+            efficiency_charge=battery.efficiency_charge,
+            max_power_kw=battery.max_power_kw,
+            cycle_loss_factor=soh_model.cycle_loss_factor,
+            **kwargs,
+        )
+
+    def _transition_power(self, dt_hours):
+        """
+        Battery-side terminal power for every (i -> j) grid transition.
+
+        Returns:
+            tuple: (power_kw, feasible, degradation_cost)
+                   power_kw > 0 is drawn from the site bus to charge,
+                   power_kw < 0 is delivered to the site bus.
+        """
+        delta_e = self.energy_grid[None, :] - self.energy_grid[:, None]
+        power = np.where(delta_e > 0,
+                         delta_e / (self.efficiency_charge * dt_hours),
+                         delta_e / dt_hours)
+        feasible = np.abs(power) <= self.max_power_kw + 1e-9
+
+        # SOHModel.calculate_degradation: |dSOC%| * cycle_loss_factor * dt_hours
+        delta_soc = np.abs(self.soc_grid[None, :] - self.soc_grid[:, None])
+        degradation_cost = delta_soc * self.cycle_loss_factor * dt_hours * self.soh_cost_per_percent
+        return power, feasible, degradation_cost
+
+    def plan(self, solar_kw, load_kw, import_price, export_price=0.0,
+             dt_hours=DEFAULT_STEP_HOURS, initial_soc=50.0, terminal_energy_value=None):
+        """
+        Solves for the cost-minimizing schedule.
+
+        Args:
+            solar_kw, load_kw (array-like): Forecast profiles, one value per step.
+            import_price, export_price (float | array-like): Price per kWh per step.
+            dt_hours (float): Step length.
+            initial_soc (float): Starting SOC (%), snapped to the grid.
+            terminal_energy_value (float): Value per kWh left in the battery at the
+                end of the horizon. Defaults to the median import price, so the plan
+                does not simply empty the battery at midnight.
+
+        Returns:
+            dict: soc (%, T+1), battery_kw (T, + = charging), grid_kw (T, + = import),
+                  cost, baseline_cost (no battery), savings, degradation_cost.
+        """
+        solar_kw = np.asarray(solar_kw, dtype=np.float64)
+        load_kw = np.asarray(load_kw, dtype=np.float64)
+        n_steps = len(solar_kw)
+        import_price = np.broadcast_to(np.asarray(import_price, dtype=np.float64), (n_steps,))
+        export_price = np.broadcast_to(np.asarray(export_price, dtype=np.float64), (n_steps,))
+        if terminal_energy_value is None:
+            terminal_energy_value = float(np.median(import_price))
+
+        power, feasible, degradation_cost = self._transition_power(dt_hours)
+        n_levels = len(self.soc_grid)
+        net_load = load_kw - solar_kw
+
+        # 1. Backward recursion: value[i] = min_j stage_cost[i, j] + value_next[j]
+        value = -terminal_energy_value * self.energy_grid
+        policy = np.empty((n_steps, n_levels), dtype=np.int32)
+        infeasible = np.where(feasible, 0.0, np.inf)
+        for t in range(n_steps - 1, -1, -1):
+            grid_kw = net_load[t] + power
+            energy_cost = np.where(grid_kw > 0, grid_kw * import_price[t], grid_kw * export_price[t]) * dt_hours
+            stage = energy_cost + degradation_cost + infeasible
+            if np.isfinite(self.grid_import_limit_kw) or np.isfinite(self.grid_export_limit_kw):
+                stage = np.where((grid_kw > self.grid_import_limit_kw) | (grid_kw < -self.grid_export_limit_kw),
+                                 np.inf, stage)
+            total = stage + value[None, :]
+            best = np.argmin(total, axis=1)
+            policy[t] = best
+            value = total[np.arange(n_levels), best]
+
+        # 2. Forward pass from the initial state
+        state = int(np.argmin(np.abs(self.soc_grid - initial_soc)))
+        path = np.empty(n_steps + 1, dtype=np.int32)
+        path[0] = state
+        for t in range(n_steps):
+            state = policy[t, state]
+            path[t + 1] = state
+
+        battery_kw = power[path[:-1], path[1:]]
+        grid_kw = net_load + battery_kw
+        energy_cost = np.where(grid_kw > 0, grid_kw * import_price, grid_kw * export_price) * dt_hours
+        baseline = np.where(net_load > 0, net_load * import_price, net_load * export_price) * dt_hours
+        wear = degradation_cost[path[:-1], path[1:]]
+
+        return {
+            "soc": self.soc_grid[path],
+            "battery_kw": battery_kw,
+            "grid_kw": grid_kw,
+            "cost": float(energy_cost.sum() + wear.sum()),
+            "energy_cost": float(energy_cost.sum()),
+            "degradation_cost": float(wear.sum()),
+            "baseline_cost": float(baseline.sum()),
+            "savings": float(baseline.sum() - energy_cost.sum() - wear.sum()),
+        }
+
+
+def _plan_one(job):
+    planner_kwargs, plan_kwargs = job
+    return DispatchPlanner(**planner_kwargs).plan(**plan_kwargs)
+
+
+def plan_fleet(jobs, max_workers=None, chunksize=4):
+    """
+    Solves many site-days in parallel across processes.
+
+    Args:
+        jobs (iterable): (planner_kwargs, plan_kwargs) pairs, one per site-day.
+        max_workers (int): Process count (default: all cores).
+
+    Returns:
+        list[dict]: Plans in the same order as `jobs`.
+    """
+    jobs = list(jobs)
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(jobs) <= 1:
+        return [_plan_one(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(_plan_one, jobs, chunksize=chunksize))
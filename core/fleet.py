@@ -0,0 +1,240 @@
+# core/fleet.py
+
+import threading
+
+import numpy as np
+
+from utils.InsightEngine import ACTIVE_INSIGHT_CODES, INSIGHT_MESSAGES, generate_insight_codes
+
+# system_state strings <-> compact codes stored in the fleet arrays
+SYSTEM_STATES = ("Idle", "Charging", "Discharging")
+_STATE_CODES = {name: code for code, name in enumerate(SYSTEM_STATES)}
+
+SORTABLE_COLUMNS = ("site_id", "sim_soc", "sim_soh", "sim_temp", "sim_net_kw", "system_state", "updated_at")
+
+_INITIAL_CAPACITY = 256
+
+
+class FleetState:
+    """
+    Latest state of every site, kept as parallel NumPy arrays (one row per site).
+
+    Writers update a single row in O(1); the overview page answers sort,
+    filter and pagination with one vectorized pass over the arrays instead of
+    looping over sites in Python.
+    """
+    FLOAT_COLUMNS = ("latitude", "longitude", "sim_soc", "sim_soh", "sim_temp", "sim_net_kw", "updated_at")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = {}
+        self.size = 0
+        self.site_id = np.empty(_INITIAL_CAPACITY, dtype=object)
+        self.state_code = np.zeros(_INITIAL_CAPACITY, dtype=np.int8)
+        self.insight_code = np.full(_INITIAL_CAPACITY, -1, dtype=np.int32)
+        self.floats = {col: np.full(_INITIAL_CAPACITY, np.nan) for col in self.FLOAT_COLUMNS}
+        # Interned insight messages; insight_code indexes this list (-1 = none).
+        # Rule-table messages come first so codes match utils.InsightEngine.
+        self.insight_labels = list(INSIGHT_MESSAGES)
+        self._insight_index = {message: code for code, message in enumerate(INSIGHT_MESSAGES)}
+
+    # --- Writers ---
+    def _grow(self, needed):
+        capacity = len(self.site_id)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+
+        def grown(array, fill):
+            new = np.full(capacity, fill, dtype=array.dtype)
+            new[:self.size] = array[:self.size]
+            return new
+
+        self.site_id = grown(self.site_id, None)
+        self.state_code = grown(self.state_code, 0)
+        self.insight_code = grown(self.insight_code, -1)
+        self.floats = {col: grown(arr, np.nan) for col, arr in self.floats.items()}
+
+    def _row(self, site_id):
+        row = self._index.get(site_id)
+        if row is None:
+            self._grow(self.size + 1)
+            row = self.size
+            self.site_id[row] = site_id
+            self._index[site_id] = row
+            self.size += 1
+        return row
+
+    def _insight(self, message):
+        if not message:
+            return -1
+        code = self._insight_index.get(message)
+        if code is None:
+            code = len(self.insight_labels)
+            self.insight_labels.append(message)
+            self._insight_index[message] = code
+        return code
+
+    def register_site(self, site_id, latitude=np.nan, longitude=np.nan):
+        with self._lock:
+            row = self._row(site_id)
+            self.floats["latitude"][row] = latitude
+            self.floats["longitude"][row] = longitude
+
+    def update(self, site_id, snapshot):
+        """Writes one site's latest evidence package (as published by SimulationService)."""
+        with self._lock:
+            row = self._row(site_id)
+            for col in ("sim_soc", "sim_soh", "sim_temp", "sim_net_kw"):
+                if col in snapshot:
+                    self.floats[col][row] = snapshot[col]
+            self.floats["updated_at"][row] = snapshot.get("updated_at", np.nan)
+            self.state_code[row] = _STATE_CODES.get(snapshot.get("system_state"), 0)
+            self.insight_code[row] = self._insight(snapshot.get("insight"))
+
+    def update_batch(self, site_ids, columns):
+        """
+        Bulk update for many sites at once.
+
+        Args:
+            site_ids (sequence): Sites being written.
+            columns (dict): Any of FLOAT_COLUMNS, "system_state" (codes or names)
+                            and "insight_code", each an array aligned with site_ids.
+        """
+        with self._lock:
+            rows = np.fromiter((self._row(s) for s in site_ids), dtype=np.int64, count=len(site_ids))
+            for col, values in columns.items():
+                if col in self.floats:
+                    self.floats[col][rows] = values
+                elif col == "system_state":
+                    values = np.asarray(values)
+                    if values.dtype.kind in "US":
+                        values = np.array([_STATE_CODES.get(v, 0) for v in values])
+                    self.state_code[rows] = values
+                elif col == "insight_code":
+                    self.insight_code[rows] = values
+
+    # --- Readers ---
+    def query(self, sort_by="site_id", descending=False, states=None, soc_range=None,
+              soh_max=None, with_insight=None, site_prefix=None, page=0, page_size=50):
+        """
+        Filters, sorts and paginates the fleet in one vectorized pass.
+
+        Args:
+            sort_by (str): One of SORTABLE_COLUMNS.
+            states (iterable): Keep only these system_state names.
+            soc_range (tuple): (min, max) inclusive SOC bounds.
+            soh_max (float): Keep sites with SOH at or below this value.
+            with_insight (bool): Keep only sites with (True) / without (False) an active
+                                 (non-nominal) insight.
+            site_prefix (str): Case-insensitive site_id prefix.
+            page, page_size (int): Zero-based page to return.
+
+        Returns:
+            dict: {"total": int, "rows": {column: array}, "row_index": array}
+        """
+        with self._lock:
+            n = self.size
+            site_id = self.site_id[:n]
+            state_code = self.state_code[:n]
+            insight_code = self.insight_code[:n]
+            floats = {col: arr[:n] for col, arr in self.floats.items()}
+
+        # 1. Filter mask
+        mask = np.ones(n, dtype=bool)
+        if states is not None:
+            mask &= np.isin(state_code, [_STATE_CODES[s] for s in states])
+        if soc_range is not None:
+            mask &= (floats["sim_soc"] >= soc_range[0]) & (floats["sim_soc"] <= soc_range[1])
+        if soh_max is not None:
+            mask &= floats["sim_soh"] <= soh_max
+        if with_insight is not None:
+            mask &= np.isin(insight_code, ACTIVE_INSIGHT_CODES) == with_insight
+        if site_prefix:
+            mask &= np.char.startswith(np.char.upper(site_id.astype(str)), site_prefix.upper())
+        candidates = np.flatnonzero(mask)
+
+        # 2. Sort (stable so ties keep registration order; sites without data,
+        #    NaN, stay last in either direction)
+        if sort_by == "site_id":
+            key = site_id[candidates].astype(str)
+            order = np.argsort(key, kind="stable")
+            if descending:
+                order = order[::-1]  # site IDs are unique, so no ties to keep
+        else:
+            key = state_code[candidates] if sort_by == "system_state" else floats[sort_by][candidates]
+            order = np.argsort(-key if descending else key, kind="stable")
+        ordered = candidates[order]
+
+        # 3. Page
+        start = page * page_size
+        rows = ordered[start:start + page_size]
+        labels = np.array(self.insight_labels + [""], dtype=object)
+        page_rows = {
+            "site_id": site_id[rows],
+            "system_state": np.array(SYSTEM_STATES, dtype=object)[state_code[rows]],
+            "insight": labels[insight_code[rows]],
+        }
+        page_rows.update({col: floats[col][rows] for col in floats})
+        return {"total": len(ordered), "rows": page_rows, "row_index": rows, "matched_index": ordered}
+
+    def columns(self, names):
+        """
+        Copies of the given float columns for every site, in row order
+        (rows are append-only, so row i stays the same site).
+
+        Returns:
+            tuple: (site_id array, {name: array}); names that are not
+                   FLOAT_COLUMNS are skipped.
+        """
+        with self._lock:
+            n = self.size
+            return self.site_id[:n].copy(), {name: self.floats[name][:n].copy() for name in names
+                                             if name in self.floats}
+
+    def locations(self, row_index=None):
+        """Latitude, longitude, SOC and site_id for the map layer."""
+        with self._lock:
+            n = self.size
+            rows = np.arange(n) if row_index is None else np.asarray(row_index)
+            return {
+                "site_id": self.site_id[rows],
+                "latitude": self.floats["latitude"][rows],
+                "longitude": self.floats["longitude"][rows],
+                "sim_soc": self.floats["sim_soc"][rows],
+            }
+
+
+def seed_demo_fleet(fleet, n_sites, seed=7):
+    """
+    Fills the fleet with synthetic sites scattered around Rwanda, for demos and
+    load testing of the overview page. Uses one bulk update, no per-site loop
+    over the arrays.
+    """
+    rng = np.random.default_rng(seed)
+    site_ids = [f"DEMO-{i:05d}" for i in range(n_sites)]
+    states = {
+        "sim_soc": rng.uniform(5, 100, n_sites).round(1),
+        "sim_temp": rng.normal(30, 4, n_sites).round(1),
+        "sim_net_kw": rng.normal(0, 6, n_sites).round(2),
+        "ambient_temp": rng.normal(25, 2, n_sites).round(1),
+        "irradiance": rng.uniform(0, 1000, n_sites).round(1),
+    }
+    net_kw = states["sim_net_kw"]
+    fleet.update_batch(site_ids, {
+        "latitude": rng.uniform(-2.8, -1.1, n_sites),
+        "longitude": rng.uniform(28.9, 30.8, n_sites),
+        "sim_soc": states["sim_soc"],
+        "sim_soh": (100 - rng.gamma(2.0, 1.5, n_sites)).round(4),
+        "sim_temp": states["sim_temp"],
+        "sim_net_kw": net_kw,
+        "system_state": np.where(np.abs(net_kw) < 0.1, 0, np.where(net_kw > 0, 1, 2)),
+        "insight_code": generate_insight_codes(states),
+        "updated_at": np.zeros(n_sites),
+    })
+    return site_ids
+
+
+# Process-wide fleet table shared by every session.
+fleet = FleetState()
@@ -0,0 +1,168 @@
+# core/forecast.py
+
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from core.batch_sim import BatchSimulation
+from core.config_manager import site_configs
+from physics.load import LoadModel
+from physics.solar import expected_irradiance
+
+DEFAULT_HORIZON_HOURS = 24
+DEFAULT_STEP_SECONDS = 300          # 5-minute forecast resolution
+DEFAULT_DEVIATION_SOC = 3.0         # Re-forecast if reality drifts this far (SOC %)
+LOW_SOC_THRESHOLD = 20.0
+
+
+def _hours_of_day(start_epoch, n_steps, step_seconds):
+    start = datetime.fromtimestamp(start_epoch)
+    start_hour = start.hour + start.minute / 60.0 + start.second / 3600.0
+    return (start_hour + np.arange(n_steps) * step_seconds / 3600.0) % 24
+
+
+def rollout(site_ids, states, start_epoch, horizon_hours=DEFAULT_HORIZON_HOURS,
+            step_seconds=DEFAULT_STEP_SECONDS):
+    """
+    Batched SOC forecast: one BatchSimulation rollout for every site at once.
+
+    Inputs per step come from the profile models: expected_irradiance for the
+    sun and LoadModel.expected_demand for the load shape, scaled so that the
+    current hour matches each site's latest observed load.
+
+    Args:
+        site_ids (list): Sites to forecast.
+        states (list[dict]): Latest snapshot per site (sim_soc, sim_temp,
+                             sim_soh, load_kw, ambient_temp).
+        start_epoch (float): Forecast start time.
+
+    Returns:
+        dict: {"times": epoch array (T+1,), "soc": array (N, T+1)}
+    """
+    n_steps = int(horizon_hours * 3600 / step_seconds)
+    params = [site_configs.get(site_id) for site_id in site_ids]
+    sim = BatchSimulation.from_site_params(
+        params,
+        initial_soc=np.array([s.get("sim_soc", 50.0) for s in states]),
+        initial_temp=np.array([s.get("sim_temp", 25.0) for s in states]),
+        initial_soh=np.array([s.get("sim_soh", 100.0) for s in states]),
+    )
+
+    hours = _hours_of_day(start_epoch, n_steps, step_seconds)
+    irradiance = expected_irradiance(hours)
+
+    # Load: the LoadModel shape (per kW of base load), anchored per site so the
+    # current hour matches the latest observation
+    shape = LoadModel(base_load_kw=1.0).expected_demand(hours)
+    base = np.array([p["base_load_kw"] for p in params])
+    observed = np.array([s.get("load_kw", s.get("sim_load_kw", np.nan)) for s in states], dtype=np.float64)
+    scale = np.where(np.isfinite(observed), observed / shape[0], base)
+    load = scale[:, None] * shape[None, :]
+    ambient = np.array([s.get("ambient_temp", 25.0) for s in states])
+
+    soc = np.empty((len(site_ids), n_steps + 1))
+    soc[:, 0] = sim.get_soc()
+    for t in range(n_steps):
+        soc[:, t + 1] = sim.step(step_seconds, irradiance[t], ambient, load[:, t])["sim_soc"]
+
+    times = start_epoch + np.arange(n_steps + 1) * step_seconds
+    return {"times": times, "soc": soc}
+
+
+def time_to_soc(forecast, threshold=LOW_SOC_THRESHOLD):
+    """First forecast time (epoch) at which SOC is at or below threshold, or None."""
+    below = np.flatnonzero(forecast["soc"] <= threshold)
+    return None if len(below) == 0 else float(forecast["times"][below[0]])
+
+
+class SocForecaster:
+    """
+    Cache of 24 h SOC forecasts, one per (site, hour bucket).
+
+    update() is called from the simulation loop: it costs a dict lookup and one
+    interpolation unless the hour bucket changed or the live SOC has drifted
+    more than `deviation_soc` from what the cached forecast predicted, in
+    which case that site is re-forecast. latest() is what the dashboard reads.
+
+    With `batched` set (the headless service), update() never rolls out:
+    it only returns the cached forecast, and refresh_fleet() re-forecasts
+    every stale site in one BatchSimulation rollout, so an hour rollover
+    costs one fleet rollout instead of one per site.
+    """
+    def __init__(self, horizon_hours=DEFAULT_HORIZON_HOURS, step_seconds=DEFAULT_STEP_SECONDS,
+                 deviation_soc=DEFAULT_DEVIATION_SOC):
+        self.horizon_hours = horizon_hours
+        self.step_seconds = step_seconds
+        self.deviation_soc = deviation_soc
+        self.batched = False
+        self._forecasts = {}
+        self._lock = threading.Lock()
+        self.recomputes = 0
+
+    def _store(self, site_id, times, soc, now):
+        forecast = {
+            "site_id": site_id,
+            "hour_bucket": int(now // 3600),
+            "created_at": now,
+            "times": times,
+            "soc": soc,
+        }
+        forecast["low_soc_at"] = time_to_soc(forecast)
+        forecast["min_soc"] = float(soc.min())
+        with self._lock:
+            self._forecasts[site_id] = forecast
+        return forecast
+
+    def is_valid(self, forecast, state, now):
+        if forecast is None or forecast["hour_bucket"] != int(now // 3600):
+            return False
+        predicted = np.interp(now, forecast["times"], forecast["soc"])
+        return abs(predicted - state.get("sim_soc", predicted)) <= self.deviation_soc
+
+    def update(self, site_id, state, now=None):
+        """
+        Returns a valid forecast for the site, recomputing only when needed.
+        In batched mode returns the cached forecast (None before the first
+        refresh_fleet()), stale or not.
+        """
+        now = time.time() if now is None else now
+        forecast = self._forecasts.get(site_id)
+        if self.batched or self.is_valid(forecast, state, now):
+            return forecast
+        result = rollout([site_id], [state], now, self.horizon_hours, self.step_seconds)
+        self.recomputes += 1
+        return self._store(site_id, result["times"], result["soc"][0], now)
+
+    def refresh_fleet(self, states, now=None, only_stale=True):
+        """
+        Re-forecasts many sites in one batched rollout.
+
+        Args:
+            states (dict): site_id -> latest snapshot.
+            only_stale (bool): Skip sites whose cached forecast is still valid.
+
+        Returns:
+            int: Number of sites re-forecast.
+        """
+        now = time.time() if now is None else now
+        site_ids = [
+            site_id for site_id, state in states.items()
+            if not (only_stale and self.is_valid(self._forecasts.get(site_id), state, now))
+        ]
+        if not site_ids:
+            return 0
+        result = rollout(site_ids, [states[s] for s in site_ids], now, self.horizon_hours, self.step_seconds)
+        for i, site_id in enumerate(site_ids):
+            self._store(site_id, result["times"], result["soc"][i], now)
+        self.recomputes += len(site_ids)
+        return len(site_ids)
+
+    def latest(self, site_id):
+        """Cached forecast for the dashboard (O(1); None until the first update)."""
+        return self._forecasts.get(site_id)
+
+
+# Process-wide forecaster shared by the simulation services and the dashboard.
+soc_forecaster = SocForecaster()
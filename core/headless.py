@@ -0,0 +1,169 @@
+# core/headless.py
+# Headless simulation service: steps every site's twin on a fixed-cadence
+# scheduler and writes results to a StateStore, with no UI in the process.
+# Must never import streamlit, pandas or plotly; the dashboard reads the
+# state directory through core.service_client.
+
+import os
+import signal
+import time
+
+from core.alarms import alarm_engine
+from core.config_manager import site_configs
+from core.fleet import fleet
+from core.forecast import soc_forecaster
+from core.noise import ROOT_SEED_ENV, noise
+from core.persistence import DEFAULT_STATE_DIR, StateStore
+from core.scheduler import TickScheduler
+from core.sim_service import DEFAULT_STEP_SECONDS, SimulationService
+
+DEFAULT_FLUSH_SECONDS = 30          # History CSV append + twin state checkpoint
+
+
+class HeadlessService:
+    """
+    Owns the per-site SimulationServices of a headless run.
+
+    Unlike get_service(), the services get no threads of their own: one
+    TickScheduler steps them all, which is what lets the process shut down
+    cleanly between two ticks and flush everything it produced.
+
+    With shards > 0 the sites are instead stepped by a ShardedFleet on that
+    many worker processes. Each tick is published into core.fleet (fleet
+    page, alarm rules), and other processes attach to the segment named
+    "fleet_segment" in the heartbeat. There are no per-site snapshots,
+    insights or history in that mode.
+    """
+    def __init__(self, site_ids=None, step_seconds=DEFAULT_STEP_SECONDS, state_dir=DEFAULT_STATE_DIR,
+                 flush_seconds=DEFAULT_FLUSH_SECONDS, event_bus=None, log=print, shards=0):
+        self.site_ids = list(site_ids) if site_ids else site_configs.site_ids()
+        self.step_seconds = step_seconds
+        self.flush_seconds = flush_seconds
+        self.store = StateStore(state_dir)
+        self.event_bus = event_bus
+        self.log = log
+        self.scheduler = TickScheduler(log=log)
+        self.services = {}
+        self.shards = shards
+        self.sharded = None
+        self.started_at = None
+
+    def start(self):
+        """Creates (or resumes) every site's twin and schedules its steps."""
+        self.started_at = time.time()
+        os.makedirs(self.store.state_dir, exist_ok=True)
+        beat = self.store.read_heartbeat() or {}
+        # Keep replays reproducible across restarts unless a seed is pinned
+        seed_pinned = bool(os.environ.get(ROOT_SEED_ENV, "").strip())
+        if beat.get("noise_root_seed") is not None and not seed_pinned:
+            noise.reseed(beat["noise_root_seed"])
+        # Forecasts come from the batched refresh job only; the first steps
+        # below must not each roll out their own site.
+        soc_forecaster.batched = True
+
+        if self.shards:
+            self._start_sharded()
+        for site_id in ([] if self.shards else self.site_ids):
+            service = SimulationService(site_id, step_seconds=self.step_seconds)
+            state = self.store.load_twin(site_id)
+            if state:
+                service.restore_state(state)
+            self.services[site_id] = service
+            step = self._step_job(service)
+            step()  # Clients get a snapshot immediately, not after the first tick
+            self.scheduler.every(self.step_seconds, step, name=f"step:{site_id}", run_now=False)
+        self.scheduler.every(self.step_seconds, self.check_alarms, name="alarms", run_now=False)
+        # First rollout is the scheduler's first job, not part of start-up
+        self.scheduler.every(self.step_seconds, self.refresh_forecasts, name="forecasts")
+        self.scheduler.every(self.flush_seconds, self.flush, name="flush", run_now=False)
+        self.scheduler.every(self.step_seconds, self._heartbeat, name="heartbeat", run_now=False)
+
+        if self.event_bus is not None:
+            site_configs.event_bus = self.event_bus
+            alarm_engine.event_bus = self.event_bus
+        self._heartbeat()
+        return self
+
+    def _start_sharded(self):
+        from core.sharded_fleet import ShardedFleet
+        for site_id in self.site_ids:
+            params = site_configs.get(site_id)
+            fleet.register_site(site_id, params.get("latitude", float("nan")), params.get("longitude", float("nan")))
+        self.sharded = ShardedFleet(self.site_ids, n_workers=self.shards, step_seconds=self.step_seconds)
+        self.sharded.publish_to(fleet)
+        self.scheduler.every(self.step_seconds, self.step_shards, name="shards", run_now=False)
+
+    def step_shards(self):
+        """One barrier-synchronized tick of every shard, then one bulk write into core.fleet."""
+        self.sharded.run(1)
+        return self.sharded.publish_to(fleet)
+
+    def _step_job(self, service):
+        store = self.store
+
+        def step():
+            snapshot = service.step()
+            store.publish_snapshot(service.site_id, snapshot)
+            store.buffer_history(service.site_id, snapshot)
+        return step
+
+    def check_alarms(self):
+        """One vectorized alarm pass over every site's latest state."""
+        return alarm_engine.evaluate_fleet(fleet)
+
+    def refresh_forecasts(self):
+        """
+        One batched rollout for every site whose forecast is stale (new hour
+        or drifted from the live SOC). Between rollovers this is a validity
+        check per site; the services themselves never roll out.
+        """
+        states = {site_id: service.snapshot() for site_id, service in self.services.items()}
+        return soc_forecaster.refresh_fleet(states)
+
+    def _heartbeat(self, status="running"):
+        self.store.write_heartbeat(
+            status=status,
+            started_at=self.started_at,
+            step_seconds=self.step_seconds,
+            site_ids=list(self.services),  # Sites with snapshots; none when sharded
+            fleet_segment=self.sharded.name if self.sharded else None,
+            noise_root_seed=noise.root_seed,
+            ticks=self.scheduler.ticks,
+            skipped_ticks=self.scheduler.skipped,
+            job_failures=self.scheduler.failures,
+            dropped_jobs=self.scheduler.dropped,
+        )
+
+    def flush(self):
+        """Appends buffered history and checkpoints every twin's state."""
+        rows = self.store.flush_history()
+        for site_id, service in self.services.items():
+            self.store.save_twin(site_id, service.export_state())
+        return rows
+
+    def run(self, duration=None):
+        """Blocks until stop() / SIGINT / SIGTERM (or `duration` seconds), then shuts down."""
+        try:
+            site_configs.start_watching()  # Hot reload (watchdog import + inotify) is not start-up work
+            self.scheduler.run(duration)
+        finally:
+            self.shutdown()
+
+    def stop(self, *_signal_args):
+        self.scheduler.stop()
+
+    def install_signal_handlers(self):
+        """SIGINT/SIGTERM end the run between two ticks (main thread only)."""
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+    def shutdown(self):
+        """Final flush: history, twin state, then a "stopped" heartbeat for clients."""
+        site_configs.stop_watching()
+        self.flush()
+        if self.sharded is not None:
+            self.sharded.close()  # Unlinks the segment; attached readers keep their mapping
+            self.sharded = None
+        self._heartbeat(status="stopped")
+        self.log(f"🛑 Headless service stopped: {self.scheduler.ticks} jobs run, "
+                 f"{self.store.rows_written} history rows written")
@@ -0,0 +1,283 @@
+# core/history_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from core.history_store import history, to_epoch_seconds
+from utils.metrics import metrics
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024   # Arrays owned by cached entries (views into the store are free)
+DEFAULT_TTL_SECONDS = 300.0            # Full recompute at least this often, however many extensions
+
+
+def bucket_stats(ts, values, resolution):
+    """
+    NaN-aware per-bucket sums, sample counts, minima and maxima of
+    time-ordered rows, with buckets aligned to multiples of `resolution`
+    seconds.
+
+    Args:
+        ts (array): Sample times, ascending.
+        values (array): (columns, samples) matrix.
+
+    Returns:
+        tuple: (bucket ids, rows per bucket, sums, counts, mins, maxs), the
+               last four (columns, buckets).
+    """
+    bucket = np.floor(ts / resolution).astype(np.int64)
+    if len(bucket) == 0:
+        empty = np.empty((len(values), 0))
+        return bucket, np.empty(0), empty, empty, empty, empty
+    starts = np.r_[0, np.flatnonzero(np.diff(bucket)) + 1]
+    valid = ~np.isnan(values)
+    sums = np.add.reduceat(np.where(valid, values, 0.0), starts, axis=1)
+    counts = np.add.reduceat(valid.astype(np.float64), starts, axis=1)
+    mins = np.fmin.reduceat(values, starts, axis=1)
+    maxs = np.fmax.reduceat(values, starts, axis=1)
+    rows = np.diff(np.r_[starts, len(bucket)]).astype(np.float64)
+    return bucket[starts], rows, sums, counts, mins, maxs
+
+
+class _Entry:
+    """One cached window. Never mutated once published; extending builds a new entry."""
+    __slots__ = ("row_count", "last_ts", "created", "first_row", "buckets", "stats", "result", "nbytes")
+
+    def __init__(self, row_count, last_ts, created, result, first_row=0, buckets=None, stats=None, nbytes=0):
+        self.row_count = row_count      # Series rows seen (the version this entry answers)
+        self.last_ts = last_ts          # Latest sample time seen, to detect out-of-order appends
+        self.created = created          # Time of the last full compute (TTL)
+        self.first_row = first_row      # Raw windows: series row of result[0]
+        self.buckets = buckets          # Resampled windows: bucket ids and (rows, sums, counts, mins, maxs)
+        self.stats = stats
+        self.result = result
+        self.nbytes = nbytes            # Arrays this entry owns (raw windows are views into the store)
+
+
+class HistoryQueryCache:
+    """
+    Shared cache of history windows, keyed by (site, columns, range, resolution).
+
+    1. Ranges are absolute (start / end), trailing (`window` seconds up to
+       the latest sample) or the last `limit` rows; `resolution` turns a
+       window into per-bucket means, minima, maxima and sample counts.
+    2. The store is append-only, so an entry is tagged with the series row
+       count it saw. A lookup with the same count is a hit. When samples were
+       appended, only the new rows are read: raw windows re-slice the store
+       (their data are views), resampled windows fold the new rows into the
+       open bucket and append new buckets, and trailing windows drop whole
+       buckets from the head (their start snaps down to a bucket boundary,
+       so the result equals a full recompute). Appends past a fixed `end`
+       leave the result untouched; an append out of time order triggers a
+       full recompute.
+    3. LRU eviction bounded by entry count and owned bytes, plus a TTL after
+       which an entry is recomputed from scratch.
+    4. One process-wide instance serves every session; hit / miss / extension
+       / eviction counters are in stats() and, when enabled, utils.metrics.
+    """
+    def __init__(self, store=history, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                 ttl_seconds=DEFAULT_TTL_SECONDS, clock=time.monotonic):
+        self.store = store
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.extensions = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _count(self, name):
+        setattr(self, name, getattr(self, name) + 1)
+        metrics.count(f"history_cache.{name}")
+
+    def query(self, site_id, columns=None, start=None, end=None, limit=None, window=None, resolution=None):
+        """
+        Cached HistoryStore read.
+
+        Args:
+            site_id (str): Site to read.
+            columns (iterable): Columns to project (default: all).
+            start, end: Optional absolute bounds (epoch seconds, datetime or ISO string).
+            limit (int): Only the most recent `limit` rows (raw reads only).
+            window (float): Trailing seconds up to the latest sample (instead of start / end).
+            resolution (float): Bucket size in seconds; columns become bucket
+                                means, "timestamp" the bucket starts, with
+                                "<column>_min" / "<column>_max" per bucket and
+                                "samples" (rows per bucket).
+
+        Returns:
+            dict: {"timestamp": array, <column>: array, ...} (read-only, shared
+                  between callers).
+
+        Raises:
+            ValueError: window combined with start / end, or limit with resolution.
+        """
+        if window is not None and (start is not None or end is not None):
+            raise ValueError("window is relative to the latest sample and cannot be combined with start/end")
+        if limit is not None and resolution is not None:
+            raise ValueError("limit applies to raw samples, not to resampled buckets")
+        columns = self.store.columns if columns is None else tuple(columns)
+        start = None if start is None else to_epoch_seconds(start)
+        end = None if end is None else to_epoch_seconds(end)
+        key = (site_id, columns, start, end, limit, window, resolution)
+
+        row_count = self.store.length(site_id)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.created > self.ttl_seconds:
+                self._remove(key)
+                self._count("expirations")
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if entry.row_count == row_count:
+                    self._count("hits")
+                    return entry.result
+                self._count("extensions")
+            else:
+                self._count("misses")
+
+        # Computed outside the lock: entries are immutable, the last writer wins
+        entry = self._compute(key, entry, now)
+        with self._lock:
+            self._put(key, entry)
+        return entry.result
+
+    # --- Computing / extending ---
+    def _compute(self, key, base, now):
+        if key[-1] is None:
+            return self._compute_raw(key, base, now)
+        return self._compute_resampled(key, base, now)
+
+    def _compute_raw(self, key, base, now):
+        site_id, columns, start, end, limit, window, _ = key
+        first_row = 0 if base is None else base.first_row
+        row_count, data = self.store.tail(site_id, first_row, columns)
+        ts = data["timestamp"]
+        if base is not None:
+            k = base.row_count - first_row
+            if k < len(ts) and ts[k] < base.last_ts:
+                self._count("invalidations")
+                return self._compute_raw(key, None, now)
+
+        lo, hi = 0, len(ts)
+        if window is not None and hi:
+            lo = int(np.searchsorted(ts, ts[-1] - window, side="left"))
+        if start is not None:
+            lo = int(np.searchsorted(ts, start, side="left"))
+        if end is not None:
+            hi = int(np.searchsorted(ts, end, side="right"))
+        if limit is not None:
+            lo = max(lo, hi - limit)
+        lo = min(lo, hi)
+
+        result = {name: array[lo:hi] for name, array in data.items()}
+        last_ts = float(ts[-1]) if len(ts) else (-np.inf if base is None else base.last_ts)
+        created = now if base is None else base.created
+        return _Entry(row_count, last_ts, created, result, first_row=first_row + lo)
+
+    def _compute_resampled(self, key, base, now):
+        site_id, columns, start, end, _, window, resolution = key
+        row_count, data = self.store.tail(site_id, 0 if base is None else base.row_count, columns)
+        ts = data["timestamp"]
+        if base is not None and len(ts) and ts[0] < base.last_ts:
+            self._count("invalidations")
+            return self._compute_resampled(key, None, now)
+        last_ts = float(ts[-1]) if len(ts) else (-np.inf if base is None else base.last_ts)
+
+        # 1. Bucket the new rows that fall inside the window
+        first_bucket = None
+        if window is not None and np.isfinite(last_ts):
+            first_bucket = int(np.floor((last_ts - window) / resolution))
+            start = first_bucket * resolution
+        lo = 0 if start is None else int(np.searchsorted(ts, start, side="left"))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, end, side="right"))
+        lo = min(lo, hi)
+        ids, *stats = bucket_stats(ts[lo:hi], np.array([data[col][lo:hi] for col in columns]), resolution)
+
+        # 2. Merge into the cached buckets (the first new one may continue the last cached one)
+        if base is not None:
+            overlap = int(len(base.buckets) > 0 and len(ids) > 0 and ids[0] == base.buckets[-1])
+            at = len(base.buckets) - 1
+            ids = np.concatenate((base.buckets, ids[overlap:]))
+            merged = [np.concatenate((cached, fresh[..., overlap:]), axis=-1)
+                      for cached, fresh in zip(base.stats, stats)]
+            if overlap:
+                rows, sums, counts, mins, maxs = merged
+                rows[at] += stats[0][0]
+                sums[:, at] += stats[1][:, 0]
+                counts[:, at] += stats[2][:, 0]
+                mins[:, at] = np.fmin(mins[:, at], stats[3][:, 0])
+                maxs[:, at] = np.fmax(maxs[:, at], stats[4][:, 0])
+            stats = merged
+
+        # 3. Trailing windows drop whole buckets from the head
+        if first_bucket is not None:
+            keep = int(np.searchsorted(ids, first_bucket, side="left"))
+            if keep:
+                ids, stats = ids[keep:], [array[..., keep:] for array in stats]
+
+        rows, sums, counts, mins, maxs = stats
+        means = np.full(sums.shape, np.nan)
+        np.divide(sums, counts, out=means, where=counts > 0)
+        result = {"timestamp": ids * float(resolution), "samples": rows}
+        result.update(zip(columns, means))
+        result.update(zip((f"{col}_min" for col in columns), mins))
+        result.update(zip((f"{col}_max" for col in columns), maxs))
+        for array in result.values():
+            array.flags.writeable = False
+        created = now if base is None else base.created
+        nbytes = ids.nbytes + means.nbytes + result["timestamp"].nbytes + sum(array.nbytes for array in stats)
+        return _Entry(row_count, last_ts, created, result, buckets=ids, stats=stats, nbytes=nbytes)
+
+    # --- LRU bookkeeping (caller holds the lock) ---
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.nbytes -= entry.nbytes
+
+    def _put(self, key, entry):
+        if key in self._entries:
+            self._remove(key)
+        if entry.nbytes > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self.nbytes += entry.nbytes
+        while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self._count("evictions")
+
+    def invalidate(self, site_id=None):
+        """Drops the entries of one site (or all), e.g. after a history reload."""
+        with self._lock:
+            keys = [key for key in self._entries if site_id is None or key[0] == site_id]
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.extensions
+        return {
+            "entries": len(self._entries),
+            "bytes": self.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "extensions": self.extensions,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Process-wide cache in front of the shared history store (every session reads through it).
+history_cache = HistoryQueryCache()
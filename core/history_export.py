@@ -0,0 +1,329 @@
+# core/history_export.py
+
+import glob
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+from core.history_store import HISTORY_COLUMNS, PROJECT_ROOT, history, to_epoch_seconds
+
+DEFAULT_BATCH_ROWS = 65_536        # Rows per record batch / Parquet row group
+DEFAULT_COMPRESSION = "zstd"
+EXPORT_FORMATS = ("parquet", "arrow")
+ARCHIVE_SUFFIX = "_historical_data.csv"
+_CSV_BLOCK_BYTES = 4 << 20         # CSV read granularity for archive sources
+
+
+def _require_pyarrow():
+    """pyarrow is only needed for exports, so it is imported on first use."""
+    try:
+        import pyarrow
+        import pyarrow.csv  # noqa: F401
+        import pyarrow.ipc  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as exc:
+        raise ImportError("History export needs pyarrow: pip install pyarrow") from exc
+    return pyarrow
+
+
+def export_schema(columns):
+    pa = _require_pyarrow()
+    return pa.schema(
+        [("site_id", pa.dictionary(pa.int32(), pa.string())),
+         ("timestamp", pa.timestamp("us", tz="UTC"))]
+        + [(col, pa.float64()) for col in columns]
+    )
+
+
+def _bounds(start, end):
+    lo = -np.inf if start is None else to_epoch_seconds(start)
+    hi = np.inf if end is None else to_epoch_seconds(end)
+    return lo, hi
+
+
+# --- 1. Sources: chunks() yields (epoch seconds, {column: array}) per site ---
+class StoreSource:
+    """
+    Streams straight from a HistoryStore. Site and time predicates resolve
+    to series lookups and binary searches; chunks are slices of the store's
+    own arrays, so nothing beyond one batch is copied.
+    """
+    def __init__(self, store=history):
+        self.store = store
+
+    def site_ids(self):
+        return sorted(self.store.site_ids())
+
+    def chunks(self, site_id, columns, start=None, end=None, batch_rows=DEFAULT_BATCH_ROWS):
+        data = self.store.query(site_id, columns=columns, start=start, end=end)
+        ts = data["timestamp"]
+        for lo in range(0, len(ts), batch_rows):
+            hi = lo + batch_rows
+            yield ts[lo:hi], {col: data[col][lo:hi] for col in columns}
+
+
+class ArchiveSource:
+    """
+    Streams <SITE>_historical_data.csv archives (hand exports, or the files
+    the headless service appends to) without loading them. Sites map to
+    files; time predicates skip blocks before `start` and stop reading at
+    the first block past `end` (archives are appended in time order).
+    Archive timestamps are naive local time, like HistoryStore.load_csv.
+    """
+    def __init__(self, directories=(PROJECT_ROOT,)):
+        if isinstance(directories, str):
+            directories = (directories,)
+        self.paths = {}
+        for directory in directories:
+            for path in sorted(glob.glob(os.path.join(directory, f"*{ARCHIVE_SUFFIX}"))):
+                self.paths.setdefault(os.path.basename(path)[:-len(ARCHIVE_SUFFIX)], path)
+
+    @classmethod
+    def from_files(cls, paths):
+        """Source over explicit archive files; the site ID comes from each file name."""
+        source = cls(directories=())
+        for path in paths:
+            source.paths.setdefault(os.path.basename(path).split("_historical_data")[0], path)
+        return source
+
+    def read(self, site_id, columns, start=None, end=None):
+        """
+        Reads one site's archive into whole arrays (timestamps sorted ascending),
+        ready for HistoryStore.extend.
+        """
+        parts = list(self.chunks(site_id, columns, start=start, end=end))
+        if not parts:
+            return np.empty(0), {col: np.empty(0) for col in columns}
+        ts = np.concatenate([part[0] for part in parts])
+        arrays = {col: np.concatenate([part[1][col] for part in parts]) for col in columns}
+        if np.any(np.diff(ts) < 0):
+            order = np.argsort(ts, kind="stable")
+            ts = ts[order]
+            arrays = {col: a[order] for col, a in arrays.items()}
+        return ts, arrays
+
+    def site_ids(self):
+        return sorted(self.paths)
+
+    def chunks(self, site_id, columns, start=None, end=None, batch_rows=DEFAULT_BATCH_ROWS):
+        pa = _require_pyarrow()
+        lo, hi = _bounds(start, end)
+        path = self.paths.get(site_id)
+        if path is None:
+            return
+        with open(path, newline="") as handle:
+            header = handle.readline().strip().split(",")
+        present = [col for col in columns if col in header]
+        reader = pa.csv.open_csv(
+            path,
+            read_options=pa.csv.ReadOptions(block_size=_CSV_BLOCK_BYTES),
+            convert_options=pa.csv.ConvertOptions(
+                include_columns=["timestamp"] + present,
+                column_types={"timestamp": pa.timestamp("us"), **{col: pa.float64() for col in present}},
+            ),
+        )
+        for batch in reader:
+            ts = _naive_local_to_epoch(batch.column(0).to_numpy().astype(np.int64) / 1e6)
+            if len(ts) == 0 or ts[-1] < lo:
+                continue
+            if ts[0] > hi:
+                break
+            keep = (ts >= lo) & (ts <= hi)
+            ts = ts[keep]
+            arrays = {}
+            for col in columns:
+                if col in present:
+                    arrays[col] = batch.column(present.index(col) + 1).to_numpy(zero_copy_only=False)[keep]
+                else:
+                    arrays[col] = np.full(len(ts), np.nan)
+            for i in range(0, len(ts), batch_rows):
+                yield ts[i:i + batch_rows], {col: a[i:i + batch_rows] for col, a in arrays.items()}
+
+
+def _naive_local_to_epoch(naive_seconds):
+    """
+    Naive local wall-clock seconds -> epoch seconds, vectorized. The UTC
+    offset is looked up once per distinct hour, which follows DST changes.
+    """
+    if len(naive_seconds) == 0:
+        return naive_seconds
+    hours = np.floor(naive_seconds / 3600.0)
+    unique, inverse = np.unique(hours, return_inverse=True)
+    offsets = np.array([
+        datetime.fromtimestamp(h * 3600.0, timezone.utc).replace(tzinfo=None).timestamp() - h * 3600.0
+        for h in unique
+    ])
+    return naive_seconds + offsets[inverse]
+
+
+class SharedFleetSource:
+    """
+    The latest tick of a running ShardedFleet (`main.py --headless --shards N`),
+    read zero-IPC from its shared-memory segment; the name is in the headless
+    heartbeat as "fleet_segment". The whole fleet is copied once, on first
+    use, so every site's row comes from the same tick and is stamped with the
+    time of that read. Fields the fleet does not simulate are NaN.
+    """
+    def __init__(self, segment_name):
+        self.segment_name = segment_name
+        self._snapshot = None
+
+    def _read(self):
+        if self._snapshot is None:
+            from core.sharded_fleet import attach
+            state = attach(self.segment_name)
+            try:
+                _tick, data = state.read()
+                n = len(next(iter(data.values())))
+                rows = {site_id: i for i, site_id in enumerate(state.site_ids()[:n])}
+            finally:
+                state.close()
+            self._snapshot = (time.time(), rows, data)
+        return self._snapshot
+
+    def site_ids(self):
+        return sorted(self._read()[1])
+
+    def chunks(self, site_id, columns, start=None, end=None, batch_rows=DEFAULT_BATCH_ROWS):
+        read_at, rows, data = self._read()
+        lo, hi = _bounds(start, end)
+        row = rows.get(site_id)
+        if row is None or not lo <= read_at <= hi:
+            return
+        yield np.array([read_at]), {col: data[col][row:row + 1] if col in data else np.full(1, np.nan)
+                                    for col in columns}
+
+
+# --- 2. Record batches ---
+def iter_record_batches(source=None, site_ids=None, columns=None, start=None, end=None,
+                        batch_rows=DEFAULT_BATCH_ROWS):
+    """
+    Streams history as pyarrow.RecordBatch objects of at most batch_rows rows,
+    site by site in time order. Memory use is bounded by one batch.
+
+    Args:
+        source: StoreSource (default, the process-wide history), ArchiveSource
+                or SharedFleetSource.
+        site_ids (iterable): Sites to include (default: all in the source).
+        columns (iterable): HISTORY_COLUMNS to project (default: all).
+        start, end: Optional inclusive time bounds (epoch seconds, datetime or ISO string).
+    """
+    pa = _require_pyarrow()
+    source = StoreSource() if source is None else source
+    columns = HISTORY_COLUMNS if columns is None else tuple(columns)
+    unknown = set(columns) - set(HISTORY_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown history columns: {sorted(unknown)}")
+    schema = export_schema(columns)
+    available = set(source.site_ids())
+    sites = sorted(available) if site_ids is None else [s for s in site_ids if s in available]
+    for site_id in sites:
+        site_dictionary = pa.array([site_id], pa.string())
+        for ts, arrays in source.chunks(site_id, columns, start, end, batch_rows):
+            n = len(ts)
+            if n == 0:
+                continue
+            yield pa.RecordBatch.from_arrays(
+                [pa.DictionaryArray.from_arrays(pa.array(np.zeros(n, np.int32)), site_dictionary),
+                 pa.array(np.round(np.asarray(ts) * 1e6).astype(np.int64), pa.timestamp("us", tz="UTC"))]
+                + [pa.array(np.asarray(arrays[col], dtype=np.float64)) for col in columns],
+                schema=schema,
+            )
+
+
+# --- 3. Writers ---
+def _write_parquet(path, batches, schema, compression, batch_rows):
+    pa = _require_pyarrow()
+    stats = {"rows": 0, "row_groups": 0}
+    pending, pending_rows = [], 0
+    with pa.parquet.ParquetWriter(path, schema, compression=compression) as writer:
+        def flush():
+            nonlocal pending, pending_rows
+            if pending:
+                # Dictionaries differ per site; unify so the row group shares one
+                table = pa.Table.from_batches(pending, schema).unify_dictionaries()
+                writer.write_table(table, row_group_size=batch_rows)
+                stats["rows"] += pending_rows
+                stats["row_groups"] += 1
+                pending, pending_rows = [], 0
+        for batch in batches:
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            if pending_rows >= batch_rows:
+                flush()
+        flush()
+    return stats
+
+
+def _write_arrow(path, batches, schema, compression):
+    pa = _require_pyarrow()
+    stats = {"rows": 0, "batches": 0}
+    # use_threads compresses each batch's column buffers in parallel
+    options = pa.ipc.IpcWriteOptions(compression=compression, use_threads=True)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_stream(sink, schema, options=options) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            stats["rows"] += batch.num_rows
+            stats["batches"] += 1
+    return stats
+
+
+def export_history(path, fmt=None, source=None, site_ids=None, columns=None, start=None, end=None,
+                   batch_rows=DEFAULT_BATCH_ROWS, compression=DEFAULT_COMPRESSION,
+                   partition_by_site=False, workers=None):
+    """
+    Streams filtered, projected history to Parquet or an Arrow IPC stream.
+
+    Args:
+        path (str): Output file, or a directory when partition_by_site.
+        fmt (str): "parquet" or "arrow" (an IPC stream; per-site dictionaries
+                   are replaced between batches, which the file format forbids).
+                   Default: from the file extension.
+        partition_by_site (bool): Write <path>/site_id=<SITE>/part-0.<fmt>,
+                                  one file per site, compressed concurrently by
+                                  `workers` threads (pyarrow releases the GIL).
+        Other arguments as for iter_record_batches.
+
+    Returns:
+        dict: rows, files, bytes written.
+    """
+    _require_pyarrow()
+    if fmt is None:
+        fmt = "arrow" if str(path).endswith((".arrow", ".arrows", ".ipc")) else "parquet"
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}; expected one of {EXPORT_FORMATS}")
+    source = StoreSource() if source is None else source
+    columns = HISTORY_COLUMNS if columns is None else tuple(columns)
+    schema = export_schema(columns)
+
+    def write(out_path, sites):
+        batches = iter_record_batches(source, sites, columns, start, end, batch_rows)
+        if fmt == "parquet":
+            stats = _write_parquet(out_path, batches, schema, compression, batch_rows)
+        else:
+            stats = _write_arrow(out_path, batches, schema, compression)
+        return stats["rows"], out_path
+
+    if not partition_by_site:
+        rows, out_path = write(path, site_ids)
+        results = [(rows, out_path)]
+    else:
+        available = set(source.site_ids())
+        sites = sorted(available) if site_ids is None else [s for s in site_ids if s in available]
+        jobs = []
+        for site_id in sites:
+            directory = os.path.join(path, f"site_id={site_id}")
+            os.makedirs(directory, exist_ok=True)
+            jobs.append((os.path.join(directory, f"part-0.{fmt}"), [site_id]))
+        # Threads, not processes: conversion and compression run in pyarrow's C++
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            results = list(pool.map(lambda job: write(*job), jobs))
+
+    return {
+        "rows": sum(rows for rows, _ in results),
+        "files": len(results),
+        "bytes": sum(os.path.getsize(p) for _, p in results if os.path.exists(p)),
+    }
@@ -0,0 +1,208 @@
+# core/history_store.py
+
+import csv
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+
+# Same column layout as the hand-exported <SITE>_historical_data.csv files.
+HISTORY_COLUMNS = (
+    "solar_kw", "battery_soc", "load_kw", "inverter_temp", "ambient_temp",
+    "irradiance", "uptime_24h", "sim_soc", "sim_temp", "sim_soh",
+    "sim_solar_kw", "sim_load_kw", "sim_net_kw", "sim_battery_kw", "sim_grid_kw",
+)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_INITIAL_CAPACITY = 1024
+
+
+def to_epoch_seconds(timestamp):
+    """Accepts epoch seconds, a datetime or an ISO-8601 string."""
+    if isinstance(timestamp, (int, float, np.floating, np.integer)):
+        return float(timestamp)
+    if isinstance(timestamp, datetime):
+        return timestamp.timestamp()
+    return datetime.fromisoformat(str(timestamp)).timestamp()
+
+
+class _SiteSeries:
+    """Append-only columnar buffers for one site (capacity doubles on demand)."""
+    def __init__(self, columns):
+        self.columns = columns
+        self.length = 0
+        self.timestamp = np.empty(_INITIAL_CAPACITY, dtype=np.float64)
+        self.values = {col: np.full(_INITIAL_CAPACITY, np.nan) for col in columns}
+        self.lock = threading.Lock()
+
+    def _reserve(self, extra):
+        needed = self.length + extra
+        capacity = len(self.timestamp)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        # Old arrays are replaced, never resized in place, so any view a
+        # reader is still holding stays valid.
+        new_ts = np.empty(capacity, dtype=np.float64)
+        new_ts[:self.length] = self.timestamp[:self.length]
+        self.timestamp = new_ts
+        for col in self.columns:
+            new_col = np.full(capacity, np.nan)
+            new_col[:self.length] = self.values[col][:self.length]
+            self.values[col] = new_col
+
+
+class HistoryStore:
+    """
+    In-process time-series store for site telemetry + twin output.
+
+    Samples are appended in time order. Reads are range queries resolved with
+    a binary search on the timestamp column and returned as NumPy arrays, so
+    charting and analytics never loop over rows in Python.
+    """
+    def __init__(self, columns=HISTORY_COLUMNS):
+        self.columns = tuple(columns)
+        self._sites = {}
+        self._sites_lock = threading.Lock()
+
+    def _series(self, site_id):
+        series = self._sites.get(site_id)
+        if series is None:
+            with self._sites_lock:
+                series = self._sites.setdefault(site_id, _SiteSeries(self.columns))
+        return series
+
+    def site_ids(self):
+        return list(self._sites)
+
+    def append(self, site_id, sample):
+        """
+        Appends one sample (dict with a 'timestamp' and any HISTORY_COLUMNS).
+        Missing columns are stored as NaN.
+        """
+        self.extend(site_id, [to_epoch_seconds(sample["timestamp"])],
+                    {col: [sample.get(col, np.nan)] for col in self.columns})
+
+    def extend(self, site_id, timestamps, columns):
+        """
+        Appends a block of samples in one call.
+
+        Args:
+            timestamps (array-like): Epoch seconds, ascending.
+            columns (dict): Column name -> array-like of the same length.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        n = len(timestamps)
+        if n == 0:
+            return
+        series = self._series(site_id)
+        with series.lock:
+            series._reserve(n)
+            start, end = series.length, series.length + n
+            series.timestamp[start:end] = timestamps
+            for col in self.columns:
+                if col in columns:
+                    series.values[col][start:end] = np.asarray(columns[col], dtype=np.float64)
+            series.length = end
+
+    def __len__(self):
+        return sum(series.length for series in self._sites.values())
+
+    def length(self, site_id):
+        series = self._sites.get(site_id)
+        return 0 if series is None else series.length
+
+    def time_bounds(self, site_id):
+        """Returns (first, last) sample time in epoch seconds, or None."""
+        series = self._sites.get(site_id)
+        if series is None or series.length == 0:
+            return None
+        with series.lock:
+            return float(series.timestamp[0]), float(series.timestamp[series.length - 1])
+
+    def query(self, site_id, columns=None, start=None, end=None, limit=None):
+        """
+        Returns samples with start <= timestamp <= end as a column dict.
+
+        Args:
+            site_id (str): Site to read.
+            columns (iterable): Columns to project (default: all).
+            start, end: Optional time bounds (epoch seconds, datetime or ISO string).
+            limit (int): If given, only the most recent `limit` rows are returned.
+
+        Returns:
+            dict: {"timestamp": array, <column>: array, ...} (read-only views).
+        """
+        columns = self.columns if columns is None else tuple(columns)
+        series = self._sites.get(site_id)
+        if series is None:
+            return {"timestamp": np.empty(0), **{col: np.empty(0) for col in columns}}
+
+        with series.lock:
+            n = series.length
+            ts = series.timestamp[:n]
+            arrays = {col: series.values[col][:n] for col in columns}
+
+        lo = 0 if start is None else int(np.searchsorted(ts, to_epoch_seconds(start), side="left"))
+        hi = n if end is None else int(np.searchsorted(ts, to_epoch_seconds(end), side="right"))
+        if limit is not None:
+            lo = max(lo, hi - limit)
+
+        result = {"timestamp": ts[lo:hi]}
+        result.update({col: arrays[col][lo:hi] for col in columns})
+        for array in result.values():
+            array.flags.writeable = False
+        return result
+
+    def tail(self, site_id, first_row=0, columns=None):
+        """
+        Rows from index `first_row` to the current end of a site's series.
+
+        Rows never change once appended, so the returned row count identifies
+        a version of the series: callers that remember it can later read only
+        what was appended since (see core.history_cache).
+
+        Returns:
+            tuple: (row_count, {"timestamp": array, <column>: array, ...}) with
+                   read-only views of rows first_row..row_count-1.
+        """
+        columns = self.columns if columns is None else tuple(columns)
+        series = self._sites.get(site_id)
+        if series is None:
+            return 0, {"timestamp": np.empty(0), **{col: np.empty(0) for col in columns}}
+
+        with series.lock:
+            n = series.length
+            result = {"timestamp": series.timestamp[first_row:n]}
+            result.update({col: series.values[col][first_row:n] for col in columns})
+        for array in result.values():
+            array.flags.writeable = False
+        return n, result
+
+    def load_csv(self, path, site_id):
+        """Bulk-loads a <SITE>_historical_data.csv style file."""
+        timestamps = []
+        rows = {col: [] for col in self.columns}
+        with open(path, newline="") as handle:
+            for record in csv.DictReader(handle):
+                timestamps.append(to_epoch_seconds(record["timestamp"]))
+                for col in self.columns:
+                    value = record.get(col)
+                    rows[col].append(float(value) if value not in (None, "") else np.nan)
+        order = np.argsort(timestamps, kind="stable")
+        self.extend(site_id, np.asarray(timestamps)[order],
+                    {col: np.asarray(values)[order] for col, values in rows.items()})
+        return len(timestamps)
+
+    def load_site_archive(self, site_id):
+        """Loads <PROJECT_ROOT>/<site_id>_historical_data.csv if it exists."""
+        path = os.path.join(PROJECT_ROOT, f"{site_id}_historical_data.csv")
+        if self.length(site_id) or not os.path.exists(path):
+            return 0
+        return self.load_csv(path, site_id)
+
+
+# Process-wide store shared by the simulation services and every session.
+history = HistoryStore()
@@ -1,14 +1,16 @@
 # core/live_data.py
 
-import random
 from datetime import datetime
 
+from core.history_cache import history_cache
+from core.history_store import history
+from core.noise import noise
+
 # --- 1. THE ASSET LEDGER (Persistence Simulation) ---
 # In a production system, this value would be saved to a database.
-# For now, it stays in memory as your "Monotonic Odometer".
-if 'persistent_throughput' not in globals():
-    global persistent_throughput
-    persistent_throughput = 450.0  # Starting value in kWh
+# For now, it stays in memory as your "Monotonic Odometer", one per site.
+INITIAL_THROUGHPUT_KWH = 450.0  # Starting value in kWh
+persistent_throughput = {}
 
 def get_live_data(site_id, sim_net_kw=0.0, time_step_seconds=10):
     """
@@ -19,21 +21,21 @@ def get_live_data(site_id, sim_net_kw=0.0, time_step_seconds=10):
         sim_net_kw (float): The net power flow from the simulator.
         time_step_seconds (int): Time elapsed since last update.
     """
-    global persistent_throughput
-    
     # 2. Independent Causal Signal (Ambient Temp)
     # This represents the actual environment, separate from battery heat
-    ambient_celsius = 24.5 + random.uniform(-1.5, 1.5)
+    # Per-site seeded streams (core.noise), so a replayed run sees the same weather
+    ambient_celsius = 24.5 + noise.stream(site_id, "ambient").uniform(-1.5, 1.5)
     
     # 3. Energy Throughput Logic (The Odometer)
     # Power (kW) * Time (Hours) = Energy (kWh)
     delta_hours = time_step_seconds / 3600.0
     energy_increment = abs(sim_net_kw) * delta_hours
-    persistent_throughput += energy_increment
+    site_throughput = persistent_throughput.get(site_id, INITIAL_THROUGHPUT_KWH) + energy_increment
+    persistent_throughput[site_id] = site_throughput
     
     # 4. Generate Live Readings
     # We simulate these to match the site's expected scale
-    load_kw = 12.0 + random.uniform(-2, 4)
+    load_kw = 12.0 + noise.stream(site_id, "load").uniform(-2, 4)
     solar_kw = max(0, load_kw + sim_net_kw) # Derived from physics flow
     
     return {
@@ -42,16 +44,28 @@ def get_live_data(site_id, sim_net_kw=0.0, time_step_seconds=10):
         "solar_kw": round(solar_kw, 2),
         "load_kw": round(load_kw, 2),
         "ambient_temp": round(ambient_celsius, 1), # Causal Separator
-        "energy_throughput_kwh": round(persistent_throughput, 4), # Asset Odometer
-        "battery_soc": 85.0, # Placeholder: will be updated by sim_state in app.py
+        "energy_throughput_kwh": round(site_throughput, 4), # Asset Odometer
+        "battery_soc": None, # No BMS reading in the simulated feed (null in JSON); core.soc_estimator fuses real ones
         "critical_load_ratio": 0.45, # Strategic Governance metric
     }
 
 def log_live_data(site_id, data):
-    """Placeholder for future database logging."""
-    # print(f"📝 [LOG] Site {site_id} updated: {data['energy_throughput_kwh']} kWh total.")
-    pass
+    """Records one evidence package in the shared history store."""
+    history.append(site_id, data)
+
+def get_historical_data(site_id, limit=20, columns=None, start=None, end=None, window=None, resolution=None):
+    """
+    Fetches trend data for a site through the shared history query cache.
 
-def get_historical_data(site_id, limit=20):
-    """Placeholder for fetching trend data."""
-    return []
+    Args:
+        limit (int): Most recent rows (raw reads; ignored when resampling).
+        window (float): Trailing seconds up to the latest sample, instead of start/end.
+        resolution (float): Bucket size in seconds; columns become bucket means.
+
+    Returns:
+        dict: Column name -> NumPy array, including "timestamp" (epoch seconds).
+    """
+    if resolution is not None:
+        limit = None
+    return history_cache.query(site_id, columns=columns, start=start, end=end, limit=limit,
+                               window=window, resolution=resolution)
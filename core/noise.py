@@ -0,0 +1,153 @@
+# core/noise.py
+
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+BLOCK_SIZE = 4096          # Draws per pre-drawn block (fixed: it is part of the stream layout)
+ROOT_SEED_ENV = "SKYLINE_NOISE_SEED"
+
+
+def _stable_id(text):
+    """64-bit id that is the same in every process (unlike hash())."""
+    return int.from_bytes(hashlib.blake2b(str(text).encode(), digest_size=8).digest(), "little")
+
+
+def stream_key(root_seed, site_id, purpose):
+    """
+    Philox key for one (site, purpose) stream, derived from the root seed.
+    SeedSequence mixing keeps streams independent even for similar names.
+    """
+    seq = np.random.SeedSequence(root_seed, spawn_key=(_stable_id(site_id), _stable_id(purpose)))
+    words = seq.generate_state(2, np.uint64)
+    return int(words[0]) | (int(words[1]) << 64)
+
+
+def draw_block(key, block_index, start=0, count=BLOCK_SIZE):
+    """
+    Uniform [0, 1) draws start .. start + count - 1 of one block of a stream.
+
+    Philox is counter-based, so block b is generated directly from counter
+    word 1 = b: no earlier block has to be drawn first. That is what makes
+    jump-ahead O(1) and the values independent of how steps are partitioned.
+    Within a block, counter word 0 advances once per 4 draws, so a sub-range
+    is generated from its own offset rather than from the block start.
+    """
+    aligned = start - start % 4
+    bit_generator = np.random.Philox(key=key, counter=[aligned // 4, block_index, 0, 0])
+    values = np.random.Generator(bit_generator).random(start + count - aligned)
+    return values[start - aligned:]
+
+
+class NoiseStream:
+    """
+    One reproducible noise stream for a (site, purpose) pair.
+
+    Draw i of the stream is always the same value for a given root seed,
+    whichever process draws it and whether it is taken one at a time by
+    cursor (uniform) or in bulk (block).
+    """
+    def __init__(self, root_seed, site_id, purpose):
+        self.site_id = site_id
+        self.purpose = purpose
+        self.key = stream_key(root_seed, site_id, purpose)
+        self.position = 0          # Index of the next draw
+        self._block_start = 0      # Draw index of _values[0]
+        self._values = []          # Current block as Python floats
+
+    def seek(self, index):
+        """Jumps to draw `index` (forward or back) without drawing anything in between."""
+        self.position = int(index)
+
+    def _load(self):
+        block_index = self.position // BLOCK_SIZE
+        # Python floats: list indexing is much cheaper than NumPy scalar access
+        self._values = draw_block(self.key, block_index).tolist()
+        self._block_start = block_index * BLOCK_SIZE
+
+    def next(self):
+        """Next uniform [0, 1) draw, advancing the cursor."""
+        offset = self.position - self._block_start
+        if not 0 <= offset < len(self._values):
+            self._load()
+            offset = self.position - self._block_start
+        self.position += 1
+        return self._values[offset]
+
+    def uniform(self, low, high):
+        """Next draw scaled to [low, high), like random.uniform."""
+        offset = self.position - self._block_start
+        if not 0 <= offset < len(self._values):
+            self._load()
+            offset = self.position - self._block_start
+        self.position += 1
+        return low + (high - low) * self._values[offset]
+
+    def block(self, start, count):
+        """
+        Draws start .. start + count - 1 as an array, without moving the cursor.
+        For batched and sharded runs that consume many steps at once; costs
+        O(count), whatever the position in the stream.
+        """
+        if count <= 0:
+            return np.empty(0)
+        parts = []
+        end = start + count
+        while start < end:
+            block_index, offset = divmod(start, BLOCK_SIZE)
+            n = min(BLOCK_SIZE - offset, end - start)
+            parts.append(draw_block(self.key, block_index, offset, n))
+            start += n
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def uniform_block(self, low, high, start, count):
+        """block() scaled to [low, high)."""
+        return low + (high - low) * self.block(start, count)
+
+
+class NoiseSource:
+    """
+    Registry of noise streams, all derived from one root seed.
+
+    The root seed comes from SKYLINE_NOISE_SEED; without it a fresh one is
+    drawn at startup. Either way it is kept in `root_seed`, so any run can be
+    replayed by exporting that value.
+    """
+    def __init__(self, root_seed=None):
+        if root_seed is None:
+            root_seed = np.random.SeedSequence().entropy
+        self.root_seed = int(root_seed)
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def stream(self, site_id, purpose):
+        """The stream for (site_id, purpose), created on first use."""
+        key = (site_id, purpose)
+        stream = self._streams.get(key)
+        if stream is None:
+            with self._lock:
+                stream = self._streams.setdefault(key, NoiseStream(self.root_seed, site_id, purpose))
+        return stream
+
+    def seek_site(self, site_id, index):
+        """Moves every existing stream of a site to draw `index` (e.g. a replayed step count)."""
+        for (stream_site, _), stream in list(self._streams.items()):
+            if stream_site == site_id:
+                stream.seek(index)
+
+    def reseed(self, root_seed):
+        """Switches to a new root seed; streams are re-derived on next use."""
+        with self._lock:
+            self.root_seed = int(root_seed)
+            self._streams = {}
+
+
+def _root_seed_from_env():
+    value = os.environ.get(ROOT_SEED_ENV, "").strip()
+    return int(value) if value else None
+
+
+# Process-wide noise source shared by the live data feed and the physics models.
+noise = NoiseSource(_root_seed_from_env())
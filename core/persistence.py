@@ -0,0 +1,130 @@
+# core/persistence.py
+
+import csv
+import json
+import os
+import threading
+import time
+
+from core.history_store import HISTORY_COLUMNS, PROJECT_ROOT
+
+STATE_DIR_ENV = "SKYLINE_STATE_DIR"
+DEFAULT_STATE_DIR = os.environ.get(STATE_DIR_ENV) or os.path.join(PROJECT_ROOT, "state")
+HEARTBEAT_FILE = "service.json"
+ARCHIVE_HEADER = ("timestamp",) + HISTORY_COLUMNS
+
+
+def _json_default(value):
+    # NumPy scalars (bool_, int64, ...) that json cannot encode natively
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def write_json_atomic(path, data):
+    """
+    Writes JSON via a temp file + os.replace, so a concurrent reader sees
+    either the old file or the new one, never a partial write.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, default=_json_default, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def read_json(path):
+    """Parsed JSON, or None if the file does not exist (yet)."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+class StateStore:
+    """
+    On-disk state written by the headless service and read by UI clients.
+
+    Layout of the state directory:
+      service.json                     heartbeat: pid, sites, cadence, status
+      <SITE>.snapshot.json             latest published step (every tick)
+      <SITE>.twin.json                 resumable twin state (on flush)
+      <SITE>_historical_data.csv       append-only history, same columns as
+                                       the hand-exported archives
+    History rows are buffered in memory and appended in batches by flush().
+    """
+    def __init__(self, state_dir=DEFAULT_STATE_DIR):
+        self.state_dir = state_dir         # Created by the writer (HeadlessService.start)
+        self._pending = {}                 # site_id -> list of CSV rows
+        self._lock = threading.Lock()
+        self.rows_written = 0
+
+    def snapshot_path(self, site_id):
+        return os.path.join(self.state_dir, f"{site_id}.snapshot.json")
+
+    def twin_path(self, site_id):
+        return os.path.join(self.state_dir, f"{site_id}.twin.json")
+
+    def history_path(self, site_id):
+        return os.path.join(self.state_dir, f"{site_id}_historical_data.csv")
+
+    @property
+    def heartbeat_path(self):
+        return os.path.join(self.state_dir, HEARTBEAT_FILE)
+
+    # --- 1. Per-step output ---
+    def publish_snapshot(self, site_id, snapshot):
+        write_json_atomic(self.snapshot_path(site_id), dict(snapshot))
+
+    def read_snapshot(self, site_id):
+        return read_json(self.snapshot_path(site_id))
+
+    def buffer_history(self, site_id, sample):
+        row = [sample.get("timestamp")] + [sample.get(col, "") for col in HISTORY_COLUMNS]
+        with self._lock:
+            self._pending.setdefault(site_id, []).append(row)
+
+    def flush_history(self):
+        """Appends every buffered row to its site's CSV. Returns rows written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        written = 0
+        for site_id, rows in pending.items():
+            path = self.history_path(site_id)
+            new_file = not os.path.exists(path)
+            with open(path, "a", newline="") as handle:
+                writer = csv.writer(handle)
+                if new_file:
+                    writer.writerow(ARCHIVE_HEADER)
+                writer.writerows(rows)
+            written += len(rows)
+        self.rows_written += written
+        return written
+
+    # --- 2. Resumable twin state ---
+    def save_twin(self, site_id, state):
+        write_json_atomic(self.twin_path(site_id), state)
+
+    def load_twin(self, site_id):
+        return read_json(self.twin_path(site_id))
+
+    # --- 3. Service heartbeat ---
+    def write_heartbeat(self, **info):
+        write_json_atomic(self.heartbeat_path, {"pid": os.getpid(), "updated_at": time.time(), **info})
+
+    def read_heartbeat(self):
+        return read_json(self.heartbeat_path)
+
+    def live_sites(self, now=None):
+        """
+        Sites served by a headless service running against this directory:
+        its heartbeat says "running" and is younger than three ticks.
+        Empty when no service is live.
+        """
+        beat = self.read_heartbeat()
+        if not beat or beat.get("status") != "running":
+            return ()
+        now = time.time() if now is None else now
+        if now - beat.get("updated_at", 0) >= 3 * beat.get("step_seconds", 10) + 5:
+            return ()
+        return tuple(beat.get("site_ids", ()))
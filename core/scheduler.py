@@ -0,0 +1,99 @@
+# core/scheduler.py
+
+import heapq
+import itertools
+import threading
+import time
+
+from utils.metrics import metrics
+
+DEFAULT_MAX_CONSECUTIVE_FAILURES = 5  # A job failing this many ticks in a row is dropped
+
+
+class TickScheduler:
+    """
+    Runs periodic jobs (per-site simulation steps, flushes, heartbeats) on
+    one thread at a fixed cadence.
+
+    Each job is scheduled against a monotonic deadline, so slow jobs do not
+    accumulate drift. Ticks that are already overdue when a job finishes are
+    skipped, not replayed (same policy as SimulationService._run).
+
+    A job that raises is logged and counted under its name and keeps its
+    schedule, so one failing site cannot stop the others; only a job that
+    fails max_consecutive_failures ticks in a row is dropped.
+    """
+    def __init__(self, log=print, max_consecutive_failures=DEFAULT_MAX_CONSECUTIVE_FAILURES):
+        self._heap = []                    # (deadline, seq, job)
+        self._seq = itertools.count()
+        self._stop_event = threading.Event()
+        self.log = log
+        self.max_consecutive_failures = max_consecutive_failures
+        self.ticks = 0
+        self.skipped = 0
+        self.failures = {}                 # Job name -> failed runs
+        self.dropped = []                  # Names of jobs removed after repeated failures
+
+    def every(self, interval_seconds, fn, name=None, run_now=True):
+        """Calls fn() every interval_seconds (first call immediately unless run_now=False)."""
+        job = {"fn": fn, "interval": float(interval_seconds), "name": name or getattr(fn, "__name__", "job"),
+               "failed_in_row": 0}
+        first = time.monotonic() + (0.0 if run_now else job["interval"])
+        heapq.heappush(self._heap, (first, next(self._seq), job))
+        return job
+
+    def stop(self):
+        """Makes run() return after the job in progress. Safe from signal handlers."""
+        self._stop_event.set()
+
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def run(self, duration=None):
+        """
+        Runs jobs until stop() (or for `duration` seconds). Blocks the
+        calling thread; the headless service runs it on the main thread so
+        SIGINT/SIGTERM stay responsive.
+        """
+        end = None if duration is None else time.monotonic() + duration
+        while self._heap and not self._stop_event.is_set():
+            deadline, seq, job = self._heap[0]
+            if end is not None and deadline >= end:
+                self._stop_event.wait(max(0.0, end - time.monotonic()))
+                return
+            if self._stop_event.wait(max(0.0, deadline - time.monotonic())):
+                return
+            heapq.heappop(self._heap)
+
+            t0 = metrics.start()
+            try:
+                job["fn"]()
+                job["failed_in_row"] = 0
+            except Exception as exc:
+                if not self._failed(job, exc):
+                    continue
+            finally:
+                metrics.stop("scheduler.job", t0)
+                self.ticks += 1
+
+            next_deadline = deadline + job["interval"]
+            now = time.monotonic()
+            if next_deadline < now:
+                missed = int((now - next_deadline) // job["interval"]) + 1
+                self.skipped += missed
+                next_deadline += missed * job["interval"]
+            heapq.heappush(self._heap, (next_deadline, seq, job))
+
+    def _failed(self, job, exc):
+        """Counts and logs a job failure. False if the job is dropped."""
+        name = job["name"]
+        job["failed_in_row"] += 1
+        self.failures[name] = self.failures.get(name, 0) + 1
+        metrics.count("scheduler.job_failures")
+        if job["failed_in_row"] >= self.max_consecutive_failures:
+            self.dropped.append(name)
+            self.log(f"❌ Job {name} dropped after {job['failed_in_row']} failures in a row: "
+                     f"{type(exc).__name__}: {exc}")
+            return False
+        self.log(f"⚠️ Job {name} failed ({job['failed_in_row']} in a row): {type(exc).__name__}: {exc}")
+        return True
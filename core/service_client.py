@@ -0,0 +1,111 @@
+# core/service_client.py
+
+import csv
+import io
+import os
+import threading
+from types import MappingProxyType
+
+import numpy as np
+
+from core.battery_health import fleet_stress
+from core.config_manager import site_configs
+from core.fleet import fleet
+from core.history_store import HISTORY_COLUMNS, history, to_epoch_seconds
+from core.persistence import DEFAULT_STATE_DIR, StateStore
+
+
+class ServiceClient:
+    """
+    Read-only view of one site run by the headless service (core.headless).
+
+    Same snapshot() interface as SimulationService, so the dashboard does not
+    care which one it holds. Nothing is simulated here: snapshot() re-reads
+    <SITE>.snapshot.json when its mtime changes and tails the site's history
+    CSV into the shared HistoryStore so the trend panel keeps working.
+    """
+    def __init__(self, site_id, store):
+        self.site_id = site_id
+        self.store = store
+        self._snapshot = None
+        self._snapshot_mtime = None
+        self._history_offset = 0
+        self._lock = threading.Lock()
+        history.load_site_archive(site_id)  # Same seed trends as the service
+
+    def snapshot(self):
+        """Latest published state as a read-only mapping (None before the first tick)."""
+        with self._lock:
+            try:
+                mtime = os.stat(self.store.snapshot_path(self.site_id)).st_mtime_ns
+            except FileNotFoundError:
+                return self._snapshot
+            if mtime != self._snapshot_mtime:
+                data = self.store.read_snapshot(self.site_id)
+                if data is not None:
+                    self._snapshot = MappingProxyType(data)
+                    self._snapshot_mtime = mtime
+                    fleet.update(self.site_id, data)
+                    if data.get("battery_stress"):
+                        fleet_stress.update(self.site_id, data["battery_stress"])
+                    self._sync_history()
+            return self._snapshot
+
+    def _sync_history(self):
+        """Appends the CSV rows written since the last call (complete lines only)."""
+        path = self.store.history_path(self.site_id)
+        try:
+            with open(path, "rb") as handle:
+                handle.seek(self._history_offset)
+                chunk = handle.read()
+        except FileNotFoundError:
+            return 0
+        end = chunk.rfind(b"\n") + 1
+        if end == 0:
+            return 0
+        lines = chunk[:end].decode("utf-8").splitlines()
+        if self._history_offset == 0:
+            lines = lines[1:]  # Header
+        self._history_offset += end
+
+        timestamps, rows = [], []
+        for record in csv.reader(io.StringIO("\n".join(lines))):
+            timestamps.append(to_epoch_seconds(record[0]))
+            rows.append([float(v) if v != "" else np.nan for v in record[1:]])
+        if not rows:
+            return 0
+        values = np.asarray(rows, dtype=np.float64)
+        history.extend(self.site_id, np.asarray(timestamps),
+                       {col: values[:, i] for i, col in enumerate(HISTORY_COLUMNS)})
+        return len(rows)
+
+
+# --- Process-wide clients (one per site) ---
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(site_id, state_dir=DEFAULT_STATE_DIR):
+    client = _clients.get(site_id)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(site_id)
+            if client is None:
+                site_configs.get(site_id)  # UnknownSiteError, as with get_service
+                client = ServiceClient(site_id, StateStore(state_dir))
+                _clients[site_id] = client
+    return client
+
+
+def connect(site_id, state_dir=DEFAULT_STATE_DIR):
+    """
+    The dashboard's way in. While a headless service is live on `state_dir`
+    and runs this site, returns a read-only ServiceClient; otherwise falls
+    back to the in-process SimulationService (streamlit-only deployments).
+    """
+    if site_id in StateStore(state_dir).live_sites():
+        client = get_client(site_id, state_dir)
+        if client.snapshot() is not None:
+            return client
+    from core.sim_service import get_service
+    return get_service(site_id)
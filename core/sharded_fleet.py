@@ -0,0 +1,527 @@
+# core/sharded_fleet.py
+
+import multiprocessing
+import os
+import threading
+import time
+from datetime import datetime
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import wait
+
+import numpy as np
+
+from core.batch_sim import BatchSimulation
+from core.noise import NoiseSource, noise
+from physics.inverter import inverter_settings
+from physics.solar import expected_irradiance
+
+STATE_FIELDS = ("energy_kwh", "sim_soc", "sim_temp", "sim_soh", "sim_solar_kw", "sim_load_kw", "sim_net_kw",
+                "sim_battery_kw", "sim_grid_kw", "inverter_temp")
+PARAM_FIELDS = ("panel_area_m2", "panel_efficiency", "panel_temp_coeff",
+                "battery_capacity_kwh", "battery_charge_eff", "battery_thermal_coeff",
+                "inverter_rated_kw", "grid_import_limit_kw", "grid_export_limit_kw")
+_SIM_PARAMS = 6                 # Leading PARAM_FIELDS that BatchSimulation takes positionally
+SITE_ID_BYTES = 32
+NOISE_WINDOW = 512              # Ticks of per-site noise drawn at once by a worker
+DEFAULT_TIMEOUT = 30.0          # Seconds a worker may take for one tick before it counts as hung
+
+# Header layout (int64 slots), followed by the name of the segment that replaced this one
+_SEQ, _TICK, _FRONT, _N_SITES, _CAPACITY, _MOVED, _ABORT = range(7)
+_HEADER_SLOTS = 8
+_NAME_BYTES = 64
+_FIELD = {name: i for i, name in enumerate(STATE_FIELDS)}
+
+# Same input models as core.live_data / physics.solar, drawn from the same
+# per-site core.noise streams, so draw i is the noise of tick i + 1 either way
+_AMBIENT_C, _AMBIENT_NOISE = 24.5, (-1.5, 1.5)
+_LOAD_KW, _LOAD_NOISE = 12.0, (-2.0, 4.0)
+_IRRADIANCE_NOISE = (-50.0, 50.0)
+
+
+_owned_segments = set()  # Created (and tracked) by this process
+
+
+class FleetMovedError(RuntimeError):
+    """The segment was replaced (fleet grew past its capacity) and could not be followed."""
+
+
+def _segment_size(capacity):
+    return (_HEADER_SLOTS * 8 + _NAME_BYTES + capacity * SITE_ID_BYTES
+            + len(PARAM_FIELDS) * capacity * 8 + 2 * len(STATE_FIELDS) * capacity * 8)
+
+
+class SharedFleetState:
+    """
+    Fleet state arrays in one multiprocessing.shared_memory segment.
+
+    The state is double-buffered: workers write tick t into buffer t % 2 while
+    readers use the published ("front") buffer, and publish() flips the front
+    under a sequence lock. A reader that sees the same even sequence number
+    before and after copying has a consistent snapshot of one whole tick for
+    every site, without any IPC or pickling.
+
+    Create with a capacity (owner) or attach with the segment name (workers,
+    dashboards, exporters in other processes).
+    """
+    def __init__(self, capacity=None, name=None, shared_tracker=False):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=_segment_size(capacity))
+            _owned_segments.add(self.shm.name)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # Attaching must not hand the segment to this process's resource
+            # tracker, or it would be unlinked when a reader exits. Workers
+            # share the owner's tracker, where the owner's entry must stay.
+            if not shared_tracker and name not in _owned_segments:
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+            self.owner = False
+            capacity = int(np.ndarray(_HEADER_SLOTS, np.int64, self.shm.buf)[_CAPACITY])
+        self.name = self.shm.name
+        self.capacity = capacity
+        self.shared_tracker = shared_tracker
+
+        buf, offset = self.shm.buf, 0
+        self.header = np.ndarray(_HEADER_SLOTS, np.int64, buf, offset)
+        offset += _HEADER_SLOTS * 8
+        self._next_name = np.ndarray(_NAME_BYTES, np.uint8, buf, offset)
+        offset += _NAME_BYTES
+        self.site_id_bytes = np.ndarray(capacity, f"S{SITE_ID_BYTES}", buf, offset)
+        offset += capacity * SITE_ID_BYTES
+        self.params = np.ndarray((len(PARAM_FIELDS), capacity), np.float64, buf, offset)
+        offset += self.params.nbytes
+        self.buffers = np.ndarray((2, len(STATE_FIELDS), capacity), np.float64, buf, offset)
+        if self.owner:
+            self.header[_CAPACITY] = capacity
+
+    @property
+    def n_sites(self):
+        return int(self.header[_N_SITES])
+
+    @property
+    def tick(self):
+        return int(self.header[_TICK])
+
+    def site_ids(self):
+        return [s.decode() for s in self.site_id_bytes[:self.n_sites]]
+
+    def front(self):
+        """The published buffer, shape (len(STATE_FIELDS), capacity). Writers only."""
+        return self.buffers[self.header[_FRONT]]
+
+    def publish(self, tick):
+        """Makes buffer tick % 2 the front, as tick `tick`."""
+        header = self.header
+        header[_SEQ] += 1          # Odd: readers retry
+        header[_FRONT] = tick % 2
+        header[_TICK] = tick
+        header[_SEQ] += 1
+
+    def repair(self):
+        """After a writer died inside publish(): fall back to the last complete tick."""
+        if self.header[_SEQ] & 1:
+            self.header[_FRONT] = self.header[_TICK] % 2
+            self.header[_SEQ] += 1
+
+    def read(self, fields=STATE_FIELDS, spin_seconds=1.0):
+        """
+        Consistent copy of the latest tick.
+
+        Returns:
+            tuple: (tick, {field: array (n_sites,)})
+        """
+        deadline = time.monotonic() + spin_seconds
+        while True:
+            self._follow()
+            header = self.header
+            seq = int(header[_SEQ])
+            if not seq & 1:
+                front, tick, n = int(header[_FRONT]), int(header[_TICK]), int(header[_N_SITES])
+                data = {f: self.buffers[front, _FIELD[f], :n].copy() for f in fields}
+                if int(header[_SEQ]) == seq and not header[_MOVED]:
+                    return tick, data
+            if time.monotonic() > deadline:
+                raise TimeoutError("fleet state kept changing while being read")
+            time.sleep(0)
+
+    def view(self, fields=STATE_FIELDS):
+        """
+        Zero-copy views of the front buffer. They are guaranteed to hold one
+        whole tick for as long as still_valid(token) is True; check it after
+        using the data (the seqlock read protocol, without the copy).
+
+        Returns:
+            tuple: (token, tick, {field: read-only view (n_sites,)})
+        """
+        self._follow()
+        while True:
+            token = int(self.header[_SEQ])
+            if not token & 1:
+                break
+            time.sleep(0)
+        front, n = int(self.header[_FRONT]), int(self.header[_N_SITES])
+        views = {}
+        for f in fields:
+            views[f] = self.buffers[front, _FIELD[f], :n].view()
+            views[f].flags.writeable = False
+        return token, int(self.header[_TICK]), views
+
+    def still_valid(self, token):
+        return int(self.header[_SEQ]) == token and not self.header[_MOVED]
+
+    def mark_moved(self, new_name):
+        encoded = new_name.encode()
+        self._next_name[:] = 0
+        self._next_name[:len(encoded)] = np.frombuffer(encoded, np.uint8)
+        self.header[_MOVED] = 1
+
+    def _follow(self):
+        """Re-attaches to the replacement segment after the fleet grew."""
+        while self.header[_MOVED]:
+            new_name = bytes(self._next_name).rstrip(b"\0").decode()
+            self.close()
+            try:
+                self.__init__(name=new_name, shared_tracker=self.shared_tracker)
+            except FileNotFoundError:
+                raise FleetMovedError(f"segment {new_name} is gone") from None
+
+    def close(self):
+        # Drop our views first: the mmap cannot close while arrays export it
+        self.header = self._next_name = self.site_id_bytes = self.params = self.buffers = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+        _owned_segments.discard(self.shm.name)
+
+
+def attach(name):
+    """Read-only access to a running ShardedFleet from any process (dashboards, exporters)."""
+    return SharedFleetState(name=name)
+
+
+# --- Worker process ---
+class _ShardWorker:
+    """Steps sites [lo, hi) of the shared fleet with a private BatchSimulation."""
+    def __init__(self, step_seconds, start_epoch, root_seed):
+        self.step_seconds = step_seconds
+        self.start_epoch = start_epoch
+        self.noise = NoiseSource(root_seed)
+        self.state = None
+        self.lo = self.hi = 0
+
+    def assign(self, shm_name, lo, hi):
+        """(Re)loads the shard from the published tick: start, restart and rebalance all land here."""
+        if self.state is None or self.state.name != shm_name:
+            if self.state is not None:
+                self.state.close()
+            self.state = SharedFleetState(name=shm_name, shared_tracker=True)
+        state = self.state
+        self.lo, self.hi = lo, hi
+        self.site_ids = state.site_ids()[lo:hi]
+        params = state.params[:, lo:hi]
+        self.sim = BatchSimulation(
+            *params[:_SIM_PARAMS],
+            **{field: params[i] for i, field in enumerate(PARAM_FIELDS) if i >= _SIM_PARAMS},
+        )
+        front = state.front()
+        self.sim.energy = front[_FIELD["energy_kwh"], lo:hi].copy()
+        self.sim.temperature = front[_FIELD["sim_temp"], lo:hi].copy()
+        self.sim.inverter.temperature = front[_FIELD["inverter_temp"], lo:hi].copy()
+        self.sim.soh = front[_FIELD["sim_soh"], lo:hi].copy()
+        self._window_start = None
+
+    def _draw_window(self, first_draw):
+        def block(purpose, bounds):
+            rows = [self.noise.stream(s, purpose).uniform_block(*bounds, first_draw, NOISE_WINDOW)
+                    for s in self.site_ids]
+            return np.array(rows).reshape(len(self.site_ids), NOISE_WINDOW)
+        self._ambient = block("ambient", _AMBIENT_NOISE)
+        self._load = block("load", _LOAD_NOISE)
+        self._jitter = block("irradiance", _IRRADIANCE_NOISE)
+        self._window_start = first_draw
+
+    def step(self, tick):
+        """Computes `tick` for the shard into buffer tick % 2 (never the published one)."""
+        if self.hi == self.lo:
+            return
+        draw = tick - 1
+        if self._window_start is None or not 0 <= draw - self._window_start < NOISE_WINDOW:
+            self._draw_window(draw)
+        j = draw - self._window_start
+
+        hour = datetime.fromtimestamp(self.start_epoch + draw * self.step_seconds).hour
+        if 9 <= hour <= 17:  # estimate_irradiance, per site jitter
+            irradiance = np.maximum(0.0, float(expected_irradiance(hour)) + self._jitter[:, j])
+        else:
+            irradiance = 0.0
+        out = self.sim.step(self.step_seconds, irradiance,
+                            _AMBIENT_C + self._ambient[:, j], _LOAD_KW + self._load[:, j])
+
+        back = self.state.buffers[tick % 2]
+        lo, hi = self.lo, self.hi
+        back[_FIELD["energy_kwh"], lo:hi] = self.sim.energy
+        for field in STATE_FIELDS[1:]:
+            back[_FIELD[field], lo:hi] = out[field]
+
+
+def _worker_main(conn, arrived, go, step_seconds, start_epoch, root_seed):
+    worker = _ShardWorker(step_seconds, start_epoch, root_seed)
+    while True:
+        command = conn.recv()
+        op = command[0]
+        try:
+            if op == "assign":
+                worker.assign(*command[1:])
+                conn.send(("ok",))
+            elif op == "run":
+                _, first, last = command
+                for tick in range(first, last + 1):
+                    worker.step(tick)
+                    arrived.release()      # Tick barrier: the coordinator publishes,
+                    go.acquire()           # then lets every worker into the next tick
+                    if worker.state.header[_ABORT]:
+                        break
+                conn.send(("done",))
+            elif op == "stop":
+                break
+        except Exception as exc:  # Reported to the coordinator, which raises it
+            conn.send(("error", f"{type(exc).__name__}: {exc}"))
+    if worker.state is not None:
+        worker.state.close()
+
+
+# --- Coordinator ---
+class ShardedFleet:
+    """
+    Runs a fleet of twins across worker processes, one contiguous shard of
+    sites per worker, stepping in place in a SharedFleetState.
+
+    Ticks are barrier-synchronized through semaphores: every worker signals
+    the coordinator when its shard is written, the coordinator publishes the
+    tick and releases them into the next one. Semaphores (unlike locks) are
+    not left held by a process that dies, so a crashed or hung worker is
+    simply detected; the pool is then restarted and every shard reloaded
+    from the last published tick before the run resumes. A step that
+    raises is not retried: the pool is reloaded the same way and the
+    worker's error is raised from run(). Adding sites
+    rebalances the shards the same way; if the segment is full it is
+    replaced by a larger one that attached readers follow.
+
+    Inputs come from per-site core.noise streams indexed by tick, so results
+    do not depend on the number of workers, restarts or rebalancing.
+    """
+    def __init__(self, site_ids, params=None, n_workers=None, step_seconds=10, start_epoch=None,
+                 capacity=None, start_method="spawn", timeout=DEFAULT_TIMEOUT,
+                 initial_soc=50.0, initial_temp=25.0):
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.step_seconds = step_seconds
+        self.start_epoch = time.time() if start_epoch is None else start_epoch
+        self.timeout = timeout
+        self.restarts = 0
+        self._ctx = multiprocessing.get_context(start_method)
+        self._lock = threading.Lock()
+        self._ranges = [(0, 0)] * self.n_workers
+
+        site_ids = list(site_ids)
+        self.state = SharedFleetState(max(capacity or 0, len(site_ids), 1))
+        self._start_pool()
+        self.add_sites(site_ids, params, initial_soc, initial_temp)
+
+    @property
+    def name(self):
+        """Shared-memory segment name, for attach() in other processes."""
+        return self.state.name
+
+    @property
+    def tick(self):
+        return self.state.tick
+
+    def site_ids(self):
+        return self.state.site_ids()
+
+    def _start_pool(self):
+        self._arrived = self._ctx.Semaphore(0)
+        self._go = [self._ctx.Semaphore(0) for _ in range(self.n_workers)]
+        self._workers = []
+        for go in self._go:
+            parent, child = self._ctx.Pipe()
+            process = self._ctx.Process(
+                target=_worker_main, daemon=True,
+                args=(child, self._arrived, go, self.step_seconds, self.start_epoch, noise.root_seed),
+            )
+            process.start()
+            child.close()
+            self._workers.append((process, parent))
+
+    def _stop_pool(self, kill=False):
+        for process, conn in self._workers:
+            try:
+                conn.send(("stop",))
+            except (BrokenPipeError, OSError):
+                pass
+        for process, conn in self._workers:
+            if kill:
+                process.kill()
+            process.join(5)
+            if process.is_alive():
+                process.kill()
+                process.join()
+            conn.close()
+
+    # --- 1. Membership ---
+    def add_sites(self, site_ids, params=None, initial_soc=50.0, initial_temp=25.0):
+        """
+        Adds sites at the current tick and rebalances the shards.
+
+        Args:
+            params (list[Mapping]): Site configs; default site_configs.get(site_id).
+        """
+        site_ids = list(site_ids)
+        if params is None:
+            from core.config_manager import site_configs
+            params = [site_configs.get(site_id) for site_id in site_ids]
+        with self._lock:
+            n, k = self.state.n_sites, len(site_ids)
+            if n + k > self.state.capacity:
+                self._grow(2 * (n + k))
+            state = self.state
+            state.site_id_bytes[n:n + k] = [s.encode() for s in site_ids]
+            # Physics fields as configured, inverter fields resolved (same order as PARAM_FIELDS)
+            rows = [[p[field] for field in PARAM_FIELDS[:_SIM_PARAMS]] + list(inverter_settings(p).values())
+                    for p in params]
+            state.params[:, n:n + k] = np.array(rows, dtype=np.float64).T
+            state.header[_SEQ] += 1  # Odd while the new sites are written
+            front = state.front()
+            capacity = state.params[PARAM_FIELDS.index("battery_capacity_kwh"), n:n + k]
+            front[_FIELD["energy_kwh"], n:n + k] = capacity * initial_soc / 100.0
+            front[_FIELD["sim_soc"], n:n + k] = initial_soc
+            front[_FIELD["sim_temp"], n:n + k] = initial_temp
+            front[_FIELD["inverter_temp"], n:n + k] = initial_temp
+            front[_FIELD["sim_soh"], n:n + k] = 100.0
+            for field in ("sim_solar_kw", "sim_load_kw", "sim_net_kw", "sim_battery_kw", "sim_grid_kw"):
+                front[_FIELD[field], n:n + k] = 0.0
+            state.header[_N_SITES] = n + k
+            state.header[_SEQ] += 1
+            self._assign_all()
+
+    def _grow(self, capacity):
+        old = self.state
+        new = SharedFleetState(capacity)
+        n = old.n_sites
+        new.site_id_bytes[:n] = old.site_id_bytes[:n]
+        new.params[:, :n] = old.params[:, :n]
+        new.buffers[:, :, :n] = old.buffers[:, :, :n]
+        new.header[[_SEQ, _TICK, _FRONT, _N_SITES]] = old.header[[_SEQ, _TICK, _FRONT, _N_SITES]]
+        self.state = new
+        old.mark_moved(new.name)
+        old.close()
+        old.unlink()
+
+    def _assign_all(self):
+        """Splits the sites into contiguous, even shards and (re)loads every worker."""
+        bounds = np.linspace(0, self.state.n_sites, self.n_workers + 1).round().astype(int)
+        self._ranges = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+        for (process, conn), (lo, hi) in zip(self._workers, self._ranges):
+            conn.send(("assign", self.state.name, lo, hi))
+        if not all(self._reply(process, conn) for process, conn in self._workers):
+            self._restart()
+
+    def _reply(self, process, conn, timeout=None):
+        """The worker's reply, or None if it died or did not answer in time."""
+        ready = wait([conn, process.sentinel], self.timeout if timeout is None else timeout)
+        if conn not in ready:
+            return None
+        try:
+            reply = conn.recv()
+        except (EOFError, OSError):
+            return None
+        if reply[0] == "error":
+            raise RuntimeError(f"shard worker failed: {reply[1]}")
+        return reply
+
+    def _restart(self):
+        """Replaces the whole pool and reloads every shard from the last published tick."""
+        self._stop_pool(kill=True)
+        self.state.repair()
+        self.state.header[_ABORT] = 0
+        self.restarts += 1
+        self._start_pool()
+        self._assign_all()
+
+    # --- 2. Stepping ---
+    def run(self, n_ticks=1):
+        """
+        Advances every site by n_ticks, tick-synchronously across workers.
+
+        Returns:
+            int: The published tick afterwards.
+        """
+        with self._lock:
+            target = self.state.tick + n_ticks
+            while self.state.tick < target:
+                if not self._run_ticks(self.state.tick + 1, target):
+                    self._restart()
+            return self.state.tick
+
+    def _run_ticks(self, first, last):
+        """One pass over ticks first..last. False if a worker died or hung."""
+        for process, conn in self._workers:
+            conn.send(("run", first, last))
+        header = self.state.header
+        for tick in range(first, last + 1):
+            try:
+                arrived = self._await_arrivals()
+            except RuntimeError:
+                # A worker's step raised: reload the pool from the last
+                # published tick so the fleet stays usable, then surface it
+                self._restart()
+                raise
+            if not arrived:
+                header[_ABORT] = 1
+                for go in self._go:
+                    go.release()
+                return False
+            self.state.publish(tick)
+            for go in self._go:
+                go.release()
+        return all(self._reply(process, conn) for process, conn in self._workers)
+
+    def _await_arrivals(self):
+        """
+        Waits for every worker to finish the tick. False if one died or hung;
+        a worker whose step raised has replied instead of arriving, and
+        _reply raises its error here.
+        """
+        deadline = time.monotonic() + self.timeout
+        for _ in range(self.n_workers):
+            while not self._arrived.acquire(timeout=0.05):
+                for process, conn in self._workers:
+                    if conn.poll():
+                        self._reply(process, conn)
+                if time.monotonic() > deadline or not all(p.is_alive() for p, _ in self._workers):
+                    return False
+        return True
+
+    # --- 3. Readers ---
+    def read(self, fields=STATE_FIELDS):
+        """Consistent copy of the latest tick: (tick, {field: array})."""
+        return self.state.read(fields)
+
+    def publish_to(self, fleet_state, updated_at=None):
+        """Bulk-writes the latest tick into a core.fleet.FleetState (fleet page, alarm rules)."""
+        tick, data = self.read(("sim_soc", "sim_soh", "sim_temp", "sim_net_kw"))
+        data["updated_at"] = np.full(len(data["sim_soc"]), time.time() if updated_at is None else updated_at)
+        fleet_state.update_batch(self.site_ids()[:len(data["sim_soc"])], data)
+        return tick
+
+    def close(self):
+        self._stop_pool()
+        self.state.close()
+        self.state.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,300 @@
+# core/sim_service.py
+
+import math
+import sys
+import threading
+import time
+from datetime import datetime
+from types import MappingProxyType
+
+from core.battery_health import fleet_stress
+from core.config_manager import site_configs
+from core.fleet import fleet
+from core.forecast import soc_forecaster
+from core.history_store import history
+from core.live_data import get_live_data, log_live_data, persistent_throughput
+from core.noise import noise
+from core.simulator import SimulationCore
+from core.soc_estimator import soc_estimator
+from core.tariff import tariff_engine
+from physics.solar import estimate_irradiance
+from utils.InsightEngine import INSIGHT_CODES, INSIGHT_MESSAGES
+from utils.anomaly import anomaly_detector
+from utils.insight_gate import insight_gate
+from utils.metrics import metrics
+from utils.streaming_insights import streaming_insights
+
+DEFAULT_STEP_SECONDS = 10
+STEP_PHASES = ("physics", "insights", "forecast", "storage")  # Slow-step breakdown
+NOISE_PURPOSES = ("ambient", "load", "load_demand", "irradiance")
+
+
+def _measured(value):
+    return value is not None and math.isfinite(value)
+
+
+class SimulationService:
+    """
+    Owns the single Digital Twin of a site and steps it on a background thread
+    at a fixed cadence, independent of how many dashboard sessions are open.
+
+    Every completed step is published as an immutable snapshot. Readers never
+    take a lock: the snapshot reference is swapped atomically, so a session
+    always sees one whole step, never a half-written one.
+    """
+    def __init__(self, site_id, initial_soc=85, initial_temp=28, step_seconds=DEFAULT_STEP_SECONDS):
+        self.site_id = site_id
+        self.step_seconds = step_seconds
+        self.core = SimulationCore(site_id, initial_soc, initial_temp)
+        soc_estimator.register(site_id, self.core.params, soc=initial_soc, temp=initial_temp)
+        tariff_engine.assign(site_id, self.core.params.get("tariff"))
+        streaming_insights.register(site_id, step_seconds)  # Trend windows sized for this cadence
+        history.load_site_archive(site_id)  # Seed trends with any exported history
+
+        params = self.core.params
+        fleet.register_site(site_id, params.get("latitude", float("nan")), params.get("longitude", float("nan")))
+
+        self.step_count = 0
+        self._irradiance_noise = noise.stream(site_id, "irradiance")
+        self._last_net_kw = 0.0
+        self._snapshot = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lifecycle_lock = threading.Lock()
+        self._step_lock = threading.Lock()  # One step at a time, whichever thread asks
+        self.failed_steps = 0
+        self.last_error = None
+
+    def step(self):
+        """
+        Runs one simulation tick and publishes the resulting snapshot.
+        Steps are serialized, so a viewer's first snapshot() never races the
+        service thread on the same core.
+        """
+        with self._step_lock:
+            return self._step()
+
+    def _step(self):
+        t0, marks = metrics.step_start(self.site_id, self.step_count)  # Phases only on sampled steps
+
+        # Hot-reloaded site parameters (the watcher thread did the parsing)
+        params = site_configs.cached(self.site_id)
+        if params is not None and params is not self.core.params:
+            self.core.apply_params(params)
+            soc_estimator.register(self.site_id, params)
+            tariff_engine.assign(self.site_id, params.get("tariff"))
+
+        # 1. Environmental context (same causal order as the dashboard used)
+        irradiance = estimate_irradiance(datetime.now().hour, noise=self._irradiance_noise)
+        live_data = get_live_data(self.site_id, sim_net_kw=self._last_net_kw, time_step_seconds=self.step_seconds)
+
+        # 2. Physics step
+        sim_state = self.core.run_step(
+            time_step_seconds=self.step_seconds,
+            irradiance=irradiance,
+            ambient_temp=live_data['ambient_temp'],
+            current_load_kw=live_data['load_kw']
+        )
+        # Fuse measured SOC / temperature with the twin's prediction and
+        # re-anchor the twin, so it (and the forecasts) start from the estimate.
+        # Without any measurement the twin runs open loop: the filter only
+        # follows it (its uncertainty would otherwise grow without bound)
+        battery = self.core.battery_model
+        measured_soc, measured_temp = live_data.get('battery_soc'), live_data.get('battery_temp')
+        if _measured(measured_soc) or _measured(measured_temp):
+            estimate = soc_estimator.update(
+                self.site_id, self.step_seconds / 3600.0, sim_state['sim_battery_kw'], live_data['ambient_temp'],
+                measured_soc=measured_soc, measured_temp=measured_temp,
+                predicted_soc=battery.get_soc(), predicted_temp=battery.temperature,
+            )
+            self.core.set_state(soc=estimate['soc'], temp=estimate['temp'])
+            sim_state['sim_soc'] = round(estimate['soc'], 1)
+            sim_state['sim_temp'] = round(estimate['temp'], 1)
+            sim_state['sim_soc_std'] = round(estimate['soc_std'], 2)
+        else:
+            soc_estimator.follow(self.site_id, battery.get_soc(), battery.temperature)
+        self._last_net_kw = sim_state['sim_net_kw']
+        if marks:
+            marks.append(time.perf_counter_ns())
+
+        # 3. Evidence package + insight, computed once for every viewer
+        live_data.update(sim_state)
+        live_data['irradiance'] = round(irradiance, 1)
+        self.step_count += 1
+        live_data['step_index'] = self.step_count
+        live_data['updated_at'] = time.time()
+
+        # Current insight for the banner; debounced transitions go out on the EventBus
+        insight_code = insight_gate.update(self.site_id, live_data['updated_at'], sim_state, live_data)
+        live_data['insight'] = INSIGHT_MESSAGES[insight_code]
+        live_data['insight_code'] = INSIGHT_CODES[insight_code]
+
+        # Trend insight from the site's rolling statistics (O(1) per step)
+        trend_rule = streaming_insights.update(self.site_id, live_data['updated_at'], live_data)
+        live_data['trend_insight'] = trend_rule.message
+        live_data['trend_insight_code'] = trend_rule.code
+        live_data['trend_insight_active'] = trend_rule.active
+
+        # Measured-vs-twin residual score (O(1) per step); windows rank in anomaly_detector
+        score, channel = anomaly_detector.update(self.site_id, live_data['updated_at'], live_data)
+        live_data['anomaly_score'] = round(score, 2)
+        live_data['anomaly_channel'] = channel
+        if marks:
+            marks.append(time.perf_counter_ns())
+
+        # Cached 24 h SOC forecast (re-run only on a new hour or a drift from prediction)
+        forecast = soc_forecaster.update(self.site_id, live_data, live_data['updated_at'])
+        if forecast is not None:  # Batched mode: none until the first fleet refresh
+            live_data['forecast_low_soc_at'] = forecast['low_soc_at']
+            live_data['forecast_min_soc'] = round(forecast['min_soc'], 1)
+        if marks:
+            marks.append(time.perf_counter_ns())
+        # Lifetime stress counters travel with the snapshot (and its JSON file)
+        live_data['battery_stress'] = self.core.stress.to_dict()
+        # Month-to-date energy bill (O(1) running totals under the site's tariff)
+        bill = tariff_engine.update(self.site_id, live_data['updated_at'], sim_state['sim_grid_kw'],
+                                    sim_state['sim_battery_kw'])
+        live_data['bill_month_cost'] = round(bill['total_cost'], 2)
+        live_data['bill_month_savings'] = round(bill['savings'], 2)
+        log_live_data(self.site_id, live_data)
+        fleet.update(self.site_id, live_data)
+        fleet_stress.update(self.site_id, live_data['battery_stress'])
+
+        # 4. Publish (single reference swap)
+        self._snapshot = MappingProxyType(live_data)
+
+        if t0:
+            metrics.observe_step(self.site_id, t0, marks, STEP_PHASES)
+        return self._snapshot
+
+    def export_state(self):
+        """
+        The twin state needed to resume this site after a restart: battery
+        SOC/temperature/SOH, stress counters, SOC estimator state, inverter
+        temperature, step counter, odometer, billing account and noise stream
+        positions.
+        """
+        return {
+            "site_id": self.site_id,
+            "soc": self.core.battery_model.get_soc(),
+            "battery_temp": self.core.battery_model.temperature,
+            "inverter_temp": self.core.inverter_model.temperature,
+            "soh": self.core.soh_model.soh,
+            "battery_stress": self.core.stress.to_dict(),
+            "soc_estimate": soc_estimator.export_state(self.site_id),
+            "tariff_account": tariff_engine.export_state(self.site_id),
+            "step_count": self.step_count,
+            "last_net_kw": self._last_net_kw,
+            "throughput_kwh": persistent_throughput.get(self.site_id),
+            "noise_root_seed": noise.root_seed,
+            "noise_positions": {p: noise.stream(self.site_id, p).position for p in NOISE_PURPOSES},
+        }
+
+    def restore_state(self, state):
+        """
+        Resumes from export_state(). Noise positions are only restored under
+        the same root seed, where they make the continuation reproducible.
+        """
+        battery = self.core.battery_model
+        battery.energy = battery.capacity_kwh * (state["soc"] / 100.0)
+        battery.temperature = state["battery_temp"]
+        if state.get("inverter_temp") is not None:
+            self.core.inverter_model.temperature = state["inverter_temp"]
+        self.core.soh_model.soh = state["soh"]
+        if state.get("battery_stress"):
+            self.core.stress.load_dict(state["battery_stress"])
+        if state.get("soc_estimate"):
+            soc_estimator.load_state(self.site_id, state["soc_estimate"])
+        else:
+            soc_estimator.register(self.site_id, self.core.params, soc=state["soc"], temp=state["battery_temp"])
+        if state.get("tariff_account"):
+            tariff_engine.load_state(self.site_id, state["tariff_account"])
+        self.step_count = state["step_count"]
+        self._last_net_kw = state["last_net_kw"]
+        if state.get("throughput_kwh") is not None:
+            persistent_throughput[self.site_id] = state["throughput_kwh"]
+        if state.get("noise_root_seed") == noise.root_seed:
+            for purpose, position in state.get("noise_positions", {}).items():
+                noise.stream(self.site_id, purpose).seek(position)
+
+    def snapshot(self):
+        """Returns the latest published state as a read-only mapping."""
+        if self._snapshot is None:
+            with self._step_lock:
+                if self._snapshot is None:  # Another thread may have just stepped
+                    self._step()
+        return self._snapshot
+
+    def start(self):
+        """Starts the background loop. Safe to call more than once."""
+        with self._lifecycle_lock:
+            if self.is_running():
+                return self
+            if self._snapshot is None:
+                self.step()  # Viewers get data immediately, not after the first tick
+            self._stop_event.clear()
+            self._thread = threading.Thread(
+                target=self._run, name=f"sim-{self.site_id}", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        with self._lifecycle_lock:
+            self._stop_event.set()
+            if self._thread is not None:
+                self._thread.join(timeout)
+                self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        # Fixed cadence: schedule against a monotonic deadline so slow steps
+        # do not accumulate drift. Missed ticks are skipped, not replayed.
+        next_tick = time.monotonic() + self.step_seconds
+        while not self._stop_event.wait(max(0.0, next_tick - time.monotonic())):
+            try:
+                self.step()
+            except Exception as exc:
+                # Keep the twin alive; viewers see the last good snapshot and last_error
+                self.failed_steps += 1
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                metrics.count("sim.step_failures")
+                print(f"⚠️ {self.site_id}: step {self.step_count + 1} failed: {self.last_error}", file=sys.stderr)
+            next_tick += self.step_seconds
+            now = time.monotonic()
+            if next_tick < now:
+                next_tick = now + self.step_seconds
+
+
+# --- Process-wide service registry (one twin per site) ---
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_service(site_id, autostart=True, step_seconds=DEFAULT_STEP_SECONDS):
+    """
+    Returns the shared SimulationService for a site, creating it on first use.
+    `step_seconds` only applies when the service is created here.
+    """
+    service = _services.get(site_id)
+    if service is None:
+        with _services_lock:
+            service = _services.get(site_id)
+            if service is None:
+                service = SimulationService(site_id, step_seconds=step_seconds)
+                _services[site_id] = service
+    if autostart:
+        site_configs.start_watching()
+        metrics.start_exporters_from_env()
+        service.start()
+    return service
+
+
+def stop_all_services(timeout=None):
+    with _services_lock:
+        services = list(_services.values())
+        _services.clear()
+    for service in services:
+        service.stop(timeout)
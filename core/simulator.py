@@ -2,26 +2,21 @@
 
 from datetime import datetime, timedelta
 import time
-import random
 
 # Package paths relative to the project root
 from physics.solar import SolarPanel
 from physics.battery import Battery
 from physics.load import LoadModel
+from physics.inverter import Inverter, inverter_settings
 from physics.SOHModel import SOHModel 
+from physics.stress import StressCounters
 
 # --- Site-Specific Parameters ---
-SITE_PARAMS = {
-    "KIG-001": {
-        "panel_area_m2": 50,           
-        "panel_efficiency": 0.21,      
-        "panel_temp_coeff": 0.003,     
-        "battery_capacity_kwh": 40,    
-        "battery_charge_eff": 0.95,    
-        "battery_thermal_coeff": 0.005, 
-        "base_load_kw": 3.0            
-    },
-}
+# Loaded from config/sites/<SITE_ID>.json by core.config_manager (validated,
+# cached, hot-reloaded). Unknown sites raise UnknownSiteError.
+from core.config_manager import site_configs
+from core.noise import noise
+from utils.metrics import metrics
 
 class SimulationCore:
     """
@@ -31,11 +26,11 @@ class SimulationCore:
     def __init__(self, site_id, initial_soc, initial_temp):
         self.site_id = site_id
         
-        # Extracts short ID from full name
-        short_site_id = site_id.split(' ')[0]
-        params = SITE_PARAMS.get(short_site_id, SITE_PARAMS["KIG-001"]) 
+        # Extracts short ID from full name; no silent fallback to another site
+        params = site_configs.get(site_id)
         
         # 1. Initialize Physics Components
+        self.params = params
         self.solar_model = SolarPanel(
             area=params["panel_area_m2"],
             efficiency=params["panel_efficiency"],
@@ -47,20 +42,66 @@ class SimulationCore:
             thermal_coeff=params["battery_thermal_coeff"]
         )
         self.load_model = LoadModel(
-            base_load_kw=params["base_load_kw"]
+            base_load_kw=params["base_load_kw"],
+            noise=noise.stream(self.site_id, "load_demand")
         )
         
+        # Hybrid inverter + grid connection (optional config fields, see inverter_settings)
+        self.inverter_model = Inverter(**inverter_settings(params))
+        
         # Set initial state
         self.battery_model.energy = params["battery_capacity_kwh"] * (initial_soc / 100.0)
         self.battery_model.temperature = initial_temp
+        self.inverter_model.temperature = initial_temp
         
         # SOH INITIALIZATION
         self.soh_model = SOHModel(initial_soh=100.0) 
+        
+        # Lifetime stress histograms / throughput (O(1) per step)
+        self.stress = StressCounters(capacity_kwh=params["battery_capacity_kwh"])
+
+    def apply_params(self, params):
+        """
+        Swaps in new site parameters (hot reload) while keeping the twin's
+        state: SOC, battery and inverter temperature, SOH and stress counters
+        carry over.
+        """
+        soc = self.battery_model.get_soc()
+        temperature = self.battery_model.temperature
+        inverter_temp = self.inverter_model.temperature
+        self.params = params
+        self.solar_model = SolarPanel(
+            area=params["panel_area_m2"],
+            efficiency=params["panel_efficiency"],
+            temp_coeff=params["panel_temp_coeff"]
+        )
+        self.battery_model = Battery(
+            capacity_kwh=params["battery_capacity_kwh"],
+            efficiency_charge=params["battery_charge_eff"],
+            thermal_coeff=params["battery_thermal_coeff"]
+        )
+        self.battery_model.energy = params["battery_capacity_kwh"] * (soc / 100.0)
+        self.battery_model.temperature = temperature
+        self.stress.capacity_kwh = params["battery_capacity_kwh"]
+        self.inverter_model = Inverter(**inverter_settings(params))
+        self.inverter_model.temperature = inverter_temp
+        self.load_model = LoadModel(
+            base_load_kw=params["base_load_kw"],
+            noise=noise.stream(self.site_id, "load_demand")
+        )
+
+    def set_state(self, soc=None, temp=None):
+        """Re-anchors the battery state (e.g. to a state estimator's correction)."""
+        if soc is not None:
+            self.battery_model.energy = self.battery_model.capacity_kwh * (soc / 100.0)
+        if temp is not None:
+            self.battery_model.temperature = temp
 
     def run_step(self, time_step_seconds, irradiance, ambient_temp, current_load_kw):
         """
         Runs one step of the Digital Twin simulation with Causal Guardrails.
         """
+        t0 = metrics.start_sampled()  # Timing every call would add ~4 % to it
         dt_hours = time_step_seconds / 3600.0 
         
         # 1. Physics Input: Solar Generation
@@ -79,9 +120,17 @@ class SimulationCore:
         else:
             system_state = "Discharging"
             
-        # 3. Battery Physics: Update SOC and Temperature
-        power_in = max(0.0, net_power)  
-        power_out = max(0.0, -net_power) 
+        # 3. Power Flow: inverter losses/clipping and grid limits decide what the battery sees
+        battery = self.battery_model
+        sim_battery_kw, sim_grid_kw, _, _, _ = self.inverter_model.step(
+            sim_solar_kw, sim_load_kw,
+            battery.charge_limit_kw(dt_hours), battery.discharge_limit_kw(dt_hours),
+            dt_hours, ambient_temp
+        )
+        
+        # 4. Battery Physics: Update SOC and Temperature
+        power_in = max(0.0, sim_battery_kw)  
+        power_out = max(0.0, -sim_battery_kw) 
         
         prev_soc = self.battery_model.get_soc() 
         
@@ -93,7 +142,7 @@ class SimulationCore:
             env_temp=ambient_temp
         )
 
-        # 4. SOH Physics: Calculate Degradation
+        # 5. SOH Physics: Calculate Degradation
         soc_change_percent = sim_soc - prev_soc
         
         sim_soh = self.soh_model.update_soh(
@@ -101,8 +150,10 @@ class SimulationCore:
             battery_temp_c=sim_temp,
             dt_hours=dt_hours
         )
+        self.stress.update(sim_temp, sim_soc, sim_battery_kw, dt_hours)
 
-        # 5. Return the Evidence Package
+        # 6. Return the Evidence Package
+        metrics.stop("sim.run_step", t0)
         return {
             "sim_soc": round(sim_soc, 1),
             "sim_temp": round(sim_temp, 1),
@@ -110,6 +161,9 @@ class SimulationCore:
             "sim_solar_kw": round(sim_solar_kw, 2),
             "sim_load_kw": round(sim_load_kw, 2),
             "sim_net_kw": round(net_power, 2),
+            "sim_battery_kw": round(sim_battery_kw, 2),
+            "sim_grid_kw": round(sim_grid_kw, 2),
+            "inverter_temp": round(self.inverter_model.temperature, 1),
             "system_state": system_state,          # Causal State
             "ambient_temp": round(ambient_temp, 1) # Independent Signal
         }
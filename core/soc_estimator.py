@@ -0,0 +1,326 @@
+# core/soc_estimator.py
+
+import math
+import threading
+
+import numpy as np
+
+# Same hard-coded physics constants as physics/battery.py
+_MAX_TEMP_C = 55.0
+_HEAT_TRANSFER_ALPHA = 0.1
+
+_INITIAL_CAPACITY = 256
+
+# State vector: SOC (%), power bias (kW, + = the battery gets less than the
+# model says), battery temperature (C). Measurements observe SOC and temperature.
+STATE_NAMES = ("soc", "bias_kw", "temp")
+_SOC, _BIAS, _TEMP = range(len(STATE_NAMES))
+_DIAG = np.arange(len(STATE_NAMES))
+
+# Variances: process noise grows per hour of prediction; the SOC measurement
+# variance is sized from KIG-001_historical_data.csv (measured vs twin SOC
+# residual std ~1.8 %).
+DEFAULT_PROCESS_VAR = (0.5 ** 2, 0.2 ** 2, 1.0 ** 2)
+DEFAULT_MEASUREMENT_VAR = (1.5 ** 2, 0.5 ** 2)
+DEFAULT_INITIAL_VAR = (5.0 ** 2, 0.5 ** 2, 2.0 ** 2)
+# SOC variance ceiling: a uniform guess over 0-100 % has a std of ~29 %, so
+# an unmeasured battery's uncertainty saturates there instead of growing.
+MAX_SOC_VAR = 30.0 ** 2
+
+
+class SocEstimator:
+    """
+    Linear Kalman filter of SOC, power bias and temperature for every battery
+    of the fleet, one row per site: state means in an (N, 3) array and the
+    covariances stacked in (N, 3, 3), so a step for any number of batteries
+    is a fixed handful of array operations.
+
+    1. Predict: the Battery model (energy balance with charge efficiency,
+       lumped thermal model) driven by the terminal power over the step,
+       minus the learned power bias. A twin's own run_step result can be
+       passed as the prediction instead; the bias is then applied on top.
+    2. Correct: with whatever was measured (SOC and/or temperature; NaN means
+       not measured, which leaves that channel to the model).
+    3. The caller re-anchors its twin to the estimate (SimulationCore.set_state
+       / BatchSimulation.set_state), so forecasts start from corrected state
+       and the model stops drifting from the measurements.
+    """
+    def __init__(self, process_var=DEFAULT_PROCESS_VAR, measurement_var=DEFAULT_MEASUREMENT_VAR,
+                 initial_var=DEFAULT_INITIAL_VAR):
+        self.process_var = np.asarray(process_var, dtype=np.float64)
+        self.measurement_var = np.asarray(measurement_var, dtype=np.float64)
+        self.initial_var = np.asarray(initial_var, dtype=np.float64)
+        self._lock = threading.Lock()
+        self._index = {}
+        self.size = 0
+        self.site_id = np.empty(_INITIAL_CAPACITY, dtype=object)
+        self.x = np.zeros((_INITIAL_CAPACITY, len(STATE_NAMES)))
+        self.P = np.zeros((_INITIAL_CAPACITY, len(STATE_NAMES), len(STATE_NAMES)))
+        self.capacity_kwh = np.ones(_INITIAL_CAPACITY)
+        self.charge_eff = np.ones(_INITIAL_CAPACITY)
+        self.thermal_coeff = np.zeros(_INITIAL_CAPACITY)
+        self.steps = 0
+        self.corrections = 0
+
+    # --- Writers ---
+    def _grow(self, needed):
+        capacity = len(self.site_id)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+
+        def grown(array, fill=0.0):
+            new = np.full((capacity,) + array.shape[1:], fill, dtype=array.dtype)
+            new[:self.size] = array[:self.size]
+            return new
+
+        self.site_id = grown(self.site_id, None)
+        self.x = grown(self.x)
+        self.P = grown(self.P)
+        self.capacity_kwh = grown(self.capacity_kwh, 1.0)
+        self.charge_eff = grown(self.charge_eff, 1.0)
+        self.thermal_coeff = grown(self.thermal_coeff)
+
+    def register(self, site_id, params, soc=None, temp=None):
+        """
+        Adds a battery, or refreshes its parameters (config hot reload).
+
+        Args:
+            params (Mapping): Site config (battery_capacity_kwh, battery_charge_eff,
+                              battery_thermal_coeff).
+            soc, temp (float): Reset the estimate to this state (with the
+                               initial uncertainty). Required for a new battery.
+        """
+        with self._lock:
+            row = self._index.get(site_id)
+            if row is None:
+                if soc is None or temp is None:
+                    raise ValueError(f"{site_id}: a new battery needs an initial soc and temp")
+                self._grow(self.size + 1)
+                row = self.size
+                self.site_id[row] = site_id
+                self._index[site_id] = row
+                self.size += 1
+            self.capacity_kwh[row] = params["battery_capacity_kwh"]
+            self.charge_eff[row] = params["battery_charge_eff"]
+            self.thermal_coeff[row] = params["battery_thermal_coeff"]
+            if soc is not None and temp is not None:
+                self.x[row] = (soc, 0.0, temp)
+                self.P[row] = np.diag(self.initial_var)
+
+    def update_batch(self, site_ids, dt_hours, battery_kw, ambient_temp, measured_soc=None, measured_temp=None,
+                     predicted_soc=None, predicted_temp=None):
+        """
+        One predict + correct step for many batteries. Every argument after
+        site_ids is a scalar or an array aligned with them.
+
+        Args:
+            site_ids (sequence): Registered batteries.
+            dt_hours: Length of the step.
+            battery_kw: Terminal power over the step, + = charging.
+            ambient_temp: Ambient temperature over the step.
+            measured_soc, measured_temp: Measurements at the end of the step
+                                         (None / NaN = not measured).
+            predicted_soc, predicted_temp: Model state at the end of the step
+                                           (e.g. the twin after run_step); by
+                                           default the filter propagates its
+                                           own Battery model.
+
+        Returns:
+            dict: Arrays "soc", "bias_kw", "temp", "soc_std", "temp_std".
+
+        Raises:
+            KeyError: A site was never registered.
+        """
+        n = len(site_ids)
+
+        def column(value, fill=np.nan):
+            return np.broadcast_to(np.asarray(fill if value is None else value, dtype=np.float64), (n,))
+
+        dt, power, ambient = column(dt_hours), column(battery_kw), column(ambient_temp)
+        with self._lock:
+            rows = np.fromiter((self._index[s] for s in site_ids), dtype=np.int64, count=n)
+            x, P = self.x[rows], self.P[rows]
+
+            # 1. Predict (Battery.step, linear in the state for a given power)
+            gain = 100.0 * dt / self.capacity_kwh[rows]                   # SOC % per kW over the step
+            cooling = _HEAT_TRANSFER_ALPHA * dt
+            if predicted_soc is None:
+                charge = np.where(power > 0.0, power * self.charge_eff[rows], power)
+                x[:, _SOC] += gain * charge
+            else:
+                x[:, _SOC] = column(predicted_soc)
+            x[:, _SOC] -= gain * x[:, _BIAS]
+            if predicted_temp is None:
+                x[:, _TEMP] += cooling * (ambient - x[:, _TEMP]) + np.abs(power) * self.thermal_coeff[rows] * dt
+            else:
+                x[:, _TEMP] = column(predicted_temp)
+            # P = F P F^T with F = I except F[soc, bias] = -gain, F[temp, temp] = 1 - cooling
+            decay = 1.0 - cooling
+            P[:, _SOC, :] -= gain[:, None] * P[:, _BIAS, :]
+            P[:, _TEMP, :] *= decay[:, None]
+            P[:, :, _SOC] -= gain[:, None] * P[:, :, _BIAS]
+            P[:, :, _TEMP] *= decay[:, None]
+            P[:, _DIAG, _DIAG] += dt[:, None] * self.process_var
+            # Cap the SOC variance by scaling its row and column (keeps P positive semi-definite)
+            shrink = np.sqrt(np.minimum(1.0, MAX_SOC_VAR / P[:, _SOC, _SOC]))
+            P[:, _SOC, :] *= shrink[:, None]
+            P[:, :, _SOC] *= shrink[:, None]
+
+            # 2. Correct with the measured channels (2x2 innovation covariance
+            #    inverted in closed form). An unmeasured channel gets a unit
+            #    variance, no cross term and a zero gain column.
+            z_soc, z_temp = column(measured_soc), column(measured_temp)
+            seen_soc, seen_temp = np.isfinite(z_soc), np.isfinite(z_temp)
+            y_soc = np.where(seen_soc, z_soc - x[:, _SOC], 0.0)
+            y_temp = np.where(seen_temp, z_temp - x[:, _TEMP], 0.0)
+            s_soc = np.where(seen_soc, P[:, _SOC, _SOC] + self.measurement_var[0], 1.0)
+            s_temp = np.where(seen_temp, P[:, _TEMP, _TEMP] + self.measurement_var[1], 1.0)
+            s_cross = np.where(seen_soc & seen_temp, P[:, _SOC, _TEMP], 0.0)
+            det = s_soc * s_temp - s_cross * s_cross
+            ph_soc, ph_temp = P[:, :, _SOC], P[:, :, _TEMP]
+            k_soc = (ph_soc * (s_temp * seen_soc / det)[:, None] - ph_temp * (s_cross * seen_soc / det)[:, None])
+            k_temp = (ph_temp * (s_soc * seen_temp / det)[:, None] - ph_soc * (s_cross * seen_temp / det)[:, None])
+            x += k_soc * y_soc[:, None] + k_temp * y_temp[:, None]
+            P -= k_soc[:, :, None] * P[:, None, _SOC, :] + k_temp[:, :, None] * P[:, None, _TEMP, :]
+            seen = seen_soc | seen_temp
+
+            # 3. Physical bounds, then store
+            np.clip(x[:, _SOC], 0.0, 100.0, out=x[:, _SOC])
+            np.minimum(x[:, _TEMP], _MAX_TEMP_C, out=x[:, _TEMP])
+            self.x[rows] = x
+            self.P[rows] = P
+            self.steps += n
+            self.corrections += int(seen.sum())
+        return self._estimates(x, P)
+
+    def update(self, site_id, dt_hours, battery_kw, ambient_temp, measured_soc=None, measured_temp=None,
+               predicted_soc=None, predicted_temp=None):
+        """
+        update_batch() for one battery with plain floats (the per-step path
+        of a SimulationService, where array overhead would dominate).
+
+        Returns:
+            dict: Floats "soc", "bias_kw", "temp", "soc_std", "temp_std".
+        """
+        seen_soc = measured_soc is not None and math.isfinite(measured_soc)
+        seen_temp = measured_temp is not None and math.isfinite(measured_temp)
+        q_soc, q_bias, q_temp = self.process_var.tolist()
+        r_soc, r_temp = self.measurement_var.tolist()
+        with self._lock:
+            row = self._index[site_id]
+            soc, bias, temp = self.x[row].tolist()
+            P = self.P[row].tolist()
+
+            # 1. Predict
+            gain = 100.0 * dt_hours / float(self.capacity_kwh[row])
+            cooling = _HEAT_TRANSFER_ALPHA * dt_hours
+            if predicted_soc is None:
+                soc += gain * (battery_kw * float(self.charge_eff[row]) if battery_kw > 0.0 else battery_kw)
+            else:
+                soc = predicted_soc
+            soc -= gain * bias
+            if predicted_temp is None:
+                temp += cooling * (ambient_temp - temp) + abs(battery_kw) * float(self.thermal_coeff[row]) * dt_hours
+            else:
+                temp = predicted_temp
+            decay = 1.0 - cooling
+            for j in range(3):
+                P[_SOC][j] -= gain * P[_BIAS][j]
+                P[_TEMP][j] *= decay
+            for i in range(3):
+                P[i][_SOC] -= gain * P[i][_BIAS]
+                P[i][_TEMP] *= decay
+            P[_SOC][_SOC] += dt_hours * q_soc
+            P[_BIAS][_BIAS] += dt_hours * q_bias
+            P[_TEMP][_TEMP] += dt_hours * q_temp
+            if P[_SOC][_SOC] > MAX_SOC_VAR:
+                shrink = math.sqrt(MAX_SOC_VAR / P[_SOC][_SOC])
+                for j in range(3):
+                    P[_SOC][j] *= shrink
+                    P[j][_SOC] *= shrink
+
+            # 2. Correct (same closed form as update_batch)
+            if seen_soc or seen_temp:
+                y_soc = measured_soc - soc if seen_soc else 0.0
+                y_temp = measured_temp - temp if seen_temp else 0.0
+                s_soc = P[_SOC][_SOC] + r_soc if seen_soc else 1.0
+                s_temp = P[_TEMP][_TEMP] + r_temp if seen_temp else 1.0
+                s_cross = P[_SOC][_TEMP] if seen_soc and seen_temp else 0.0
+                det = s_soc * s_temp - s_cross * s_cross
+                a_soc, b_soc = (s_temp / det, s_cross / det) if seen_soc else (0.0, 0.0)
+                a_temp, b_temp = (s_soc / det, s_cross / det) if seen_temp else (0.0, 0.0)
+                k_soc = [P[i][_SOC] * a_soc - P[i][_TEMP] * b_soc for i in range(3)]
+                k_temp = [P[i][_TEMP] * a_temp - P[i][_SOC] * b_temp for i in range(3)]
+                soc += k_soc[_SOC] * y_soc + k_temp[_SOC] * y_temp
+                bias += k_soc[_BIAS] * y_soc + k_temp[_BIAS] * y_temp
+                temp += k_soc[_TEMP] * y_soc + k_temp[_TEMP] * y_temp
+                h_soc, h_temp = list(P[_SOC]), list(P[_TEMP])
+                for i in range(3):
+                    for j in range(3):
+                        P[i][j] -= k_soc[i] * h_soc[j] + k_temp[i] * h_temp[j]
+                self.corrections += 1
+
+            # 3. Physical bounds, then store
+            soc = min(100.0, max(0.0, soc))
+            temp = min(_MAX_TEMP_C, temp)
+            self.x[row] = (soc, bias, temp)
+            self.P[row] = P
+            self.steps += 1
+        return {
+            "soc": soc,
+            "bias_kw": bias,
+            "temp": temp,
+            "soc_std": math.sqrt(P[_SOC][_SOC]),
+            "temp_std": math.sqrt(P[_TEMP][_TEMP]),
+        }
+
+    def follow(self, site_id, soc, temp):
+        """
+        Moves one battery's estimate to the twin's state without a predict
+        step, for sites with no measurement at all: the filter stays in line
+        with the open-loop twin, and its covariance does not grow while
+        nothing can correct it.
+        """
+        with self._lock:
+            row = self._index[site_id]
+            self.x[row, _SOC] = soc
+            self.x[row, _TEMP] = temp
+
+    @staticmethod
+    def _estimates(x, P):
+        return {
+            "soc": x[:, _SOC],
+            "bias_kw": x[:, _BIAS],
+            "temp": x[:, _TEMP],
+            "soc_std": np.sqrt(P[:, _SOC, _SOC]),
+            "temp_std": np.sqrt(P[:, _TEMP, _TEMP]),
+        }
+
+    # --- Readers / persistence ---
+    def estimate(self, site_id):
+        """Latest estimate of one battery as floats, or None if unregistered."""
+        with self._lock:
+            row = self._index.get(site_id)
+            if row is None:
+                return None
+            x, P = self.x[row:row + 1].copy(), self.P[row:row + 1].copy()
+        return {name: float(values[0]) for name, values in self._estimates(x, P).items()}
+
+    def export_state(self, site_id):
+        """JSON-ready filter state (mean and covariance) for twin checkpoints."""
+        with self._lock:
+            row = self._index[site_id]
+            return {"x": self.x[row].tolist(), "P": self.P[row].tolist()}
+
+    def load_state(self, site_id, state):
+        """Restores export_state() output for a registered battery."""
+        with self._lock:
+            row = self._index[site_id]
+            self.x[row] = state["x"]
+            self.P[row] = state["P"]
+
+
+# Process-wide estimator shared by the simulation services.
+soc_estimator = SocEstimator()
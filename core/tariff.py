@@ -0,0 +1,527 @@
+# core/tariff.py
+
+import json
+import os
+import sys
+import threading
+from collections import deque
+
+import numpy as np
+
+from core.config_manager import ConfigError
+from core.history_store import PROJECT_ROOT, history, to_epoch_seconds
+
+DEFAULT_TARIFF_FILE = os.environ.get("SKYLINE_TARIFF_FILE", os.path.join(PROJECT_ROOT, "config", "tariffs.json"))
+DEFAULT_TARIFF = "default"
+DEFAULT_MAX_GAP_SECONDS = 900.0   # Longer gaps between samples are outages, not billed
+MAX_CACHED_DAYS = 4096            # Per-tariff day cache; profiles are shared, so entries are small
+MAX_CLOSED_MONTHS = 24            # Closed billing periods kept per site
+SLOT_SECONDS = 60                 # Price resolution: periods start / end on whole minutes
+SLOTS_PER_DAY = 86400 // SLOT_SECONDS
+_DAY_SETS = {"all": range(7), "weekdays": range(5), "weekends": range(5, 7)}
+
+# Per-billing-period fields, in the order bill_samples() and the running accounts report them.
+BILL_FIELDS = (
+    "import_kwh", "export_kwh", "energy_cost", "peak_demand_kw", "demand_charge", "total_cost",
+    "baseline_energy_cost", "baseline_peak_demand_kw", "baseline_demand_charge", "baseline_total_cost", "savings",
+)
+
+
+def _minute_of_day(text):
+    """'17:30' -> 1050. '24:00' is accepted as the end of the day."""
+    hours, minutes = (int(part) for part in str(text).split(":"))
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or hours * 60 + minutes > 1440:
+        raise ValueError(f"invalid time of day {text!r}")
+    return hours * 60 + minutes
+
+
+def month_label(month_id):
+    """Months since 1970-01 -> 'YYYY-MM'."""
+    return str(np.datetime64(int(month_id), "M"))
+
+
+class Tariff:
+    """
+    One time-of-use tariff: base import / export prices, periods that
+    override them by time of day, weekday / weekend and month, and a
+    demand charge on the highest interval-average import of each billing
+    (calendar) month.
+
+    Prices are compiled into per-minute arrays once per distinct day
+    profile (month, weekend) and cached per day, so pricing a sample is an
+    index into a cached array and pricing a history range is a gather
+    from a stack of day rows.
+    """
+    def __init__(self, name, import_price, export_price=0.0, periods=(), utc_offset_hours=0.0,
+                 demand_charge_per_kw=0.0, demand_interval_minutes=15):
+        """
+        Args:
+            import_price, export_price (float): Base price per kWh (export is a credit).
+            periods (iterable): Dicts with "start" / "end" ("HH:MM", local time,
+                                wrapping past midnight if end <= start), optional
+                                "days" ("all", "weekdays", "weekends"), "months"
+                                (1-12), "import_price", "export_price" and
+                                "demand" (peak demand is only measured in the
+                                periods flagged true; if none is, all day).
+                                Later periods override earlier ones.
+            utc_offset_hours (float): Local time of the tariff (day and month boundaries).
+            demand_charge_per_kw (float): Charge per kW of monthly peak demand.
+            demand_interval_minutes (int): Averaging interval for demand; must divide a day.
+
+        Raises:
+            ValueError: On malformed periods or a demand interval that does not divide a day.
+        """
+        self.name = name
+        self.import_price = float(import_price)
+        self.export_price = float(export_price)
+        self.periods = tuple(dict(period) for period in periods)
+        self.utc_offset_s = float(utc_offset_hours) * 3600.0
+        self.demand_charge_per_kw = float(demand_charge_per_kw)
+        self.demand_interval_s = int(demand_interval_minutes) * 60
+        if self.demand_interval_s <= 0 or 86400 % self.demand_interval_s:
+            raise ValueError(f"{name}: demand_interval_minutes must divide a day")
+        for period in self.periods:
+            if "start" not in period or "end" not in period:
+                raise ValueError(f"{name}: every period needs a start and an end")
+            _minute_of_day(period["start"])
+            _minute_of_day(period["end"])
+            if period.get("days", "all") not in _DAY_SETS:
+                raise ValueError(f"{name}: days must be one of {sorted(_DAY_SETS)}")
+        self._demand_windows = any(period.get("demand") for period in self.periods)
+        self._profiles = {}
+        self._days = {}
+
+    @classmethod
+    def from_dict(cls, name, spec):
+        """Builds a tariff from its JSON form (the __init__ keyword arguments)."""
+        return cls(name, **spec)
+
+    # --- 1. Compiled price arrays ---
+    def _profile(self, month, weekday):
+        """(import, export, demand mask) per minute for one (month, weekday) combination."""
+        key = (month, weekday >= 5)
+        profile = self._profiles.get(key)
+        if profile is not None:
+            return profile
+        import_price = np.full(SLOTS_PER_DAY, self.import_price)
+        export_price = np.full(SLOTS_PER_DAY, self.export_price)
+        demand = np.full(SLOTS_PER_DAY, not self._demand_windows)
+        for period in self.periods:
+            if weekday not in _DAY_SETS[period.get("days", "all")]:
+                continue
+            if "months" in period and month not in period["months"]:
+                continue
+            start, end = _minute_of_day(period["start"]), _minute_of_day(period["end"])
+            spans = [(start, end)] if start < end else [(start, SLOTS_PER_DAY), (0, end)]
+            for lo, hi in spans:
+                if "import_price" in period:
+                    import_price[lo:hi] = period["import_price"]
+                if "export_price" in period:
+                    export_price[lo:hi] = period["export_price"]
+                if period.get("demand"):
+                    demand[lo:hi] = True
+        for array in (import_price, export_price, demand):
+            array.flags.writeable = False
+        profile = self._profiles.setdefault(key, (import_price, export_price, demand))
+        return profile
+
+    def day(self, day):
+        """
+        Price arrays of one local day.
+
+        Args:
+            day (int): Local days since 1970-01-01.
+
+        Returns:
+            tuple: (import, export, demand mask, month id), the arrays
+                   per minute (read-only, shared between days).
+        """
+        entry = self._days.get(day)
+        if entry is None:
+            if len(self._days) >= MAX_CACHED_DAYS:
+                self._days.clear()
+            month_id = int(np.datetime64(day, "D").astype("datetime64[M]").astype(np.int64))
+            entry = self._profile(month_id % 12 + 1, (day + 3) % 7) + (month_id,)  # 1970-01-01 was a Thursday
+            self._days[day] = entry
+        return entry
+
+    def slots(self, ts):
+        """Epoch seconds -> local minute slots since 1970-01-01 (int64)."""
+        return np.floor_divide(np.asarray(ts, dtype=np.float64) + self.utc_offset_s, SLOT_SECONDS).astype(np.int64)
+
+    def prices(self, slots):
+        """
+        Vectorized price lookup.
+
+        Args:
+            slots (array): Local minute slots (see slots()), ascending.
+
+        Returns:
+            tuple: (import, export, demand mask, month id) arrays aligned with slots.
+        """
+        if len(slots) == 0:
+            return np.empty(0), np.empty(0), np.empty(0, dtype=bool), np.empty(0, dtype=np.int64)
+        first = int(slots[0]) // SLOTS_PER_DAY
+        entries = [self.day(d) for d in range(first, int(slots[-1]) // SLOTS_PER_DAY + 1)]
+        index = slots - first * SLOTS_PER_DAY
+        import_price, export_price, demand = (np.concatenate([e[k] for e in entries])[index] for k in range(3))
+        month_id = np.fromiter((e[3] for e in entries), dtype=np.int64, count=len(entries))[index // SLOTS_PER_DAY]
+        return import_price, export_price, demand, month_id
+
+
+def load_tariffs(path=DEFAULT_TARIFF_FILE):
+    """
+    Reads {name: spec} tariffs from a JSON file. A flat zero-price
+    "default" is added when the file has none (or does not exist).
+
+    Raises:
+        ConfigError: On malformed JSON or an invalid tariff.
+    """
+    tariffs = {}
+    if os.path.exists(path):
+        try:
+            with open(path) as handle:
+                specs = json.load(handle)
+            tariffs = {name: Tariff.from_dict(name, spec) for name, spec in specs.items()}
+        except (ValueError, TypeError, KeyError, AttributeError) as exc:
+            raise ConfigError(f"{path}: {exc}") from exc
+    tariffs.setdefault(DEFAULT_TARIFF, Tariff(DEFAULT_TARIFF, 0.0))
+    return tariffs
+
+
+def bill_samples(tariff, ts, grid_kw, battery_kw, prev_ts=None, max_gap_seconds=DEFAULT_MAX_GAP_SECONDS):
+    """
+    Energy cost, demand charges and savings of a sample range, per billing month.
+
+    Each sample's power is held over the interval since the previous sample
+    (the step the twin just simulated) and priced at the sample's time.
+    The no-battery baseline imports grid_kw - battery_kw (battery conversion
+    losses are not backed out).
+
+    Args:
+        tariff (Tariff): Prices to apply.
+        ts (array): Sample times (epoch seconds), ascending.
+        grid_kw (array): Grid power, + = import. NaN counts as zero.
+        battery_kw (array): Battery power, + = charging. NaN counts as zero.
+        prev_ts (float): Time of the sample before ts[0], if any (else it bills nothing).
+        max_gap_seconds (float): Longer intervals are outages and bill nothing.
+
+    Returns:
+        dict: "month" ('YYYY-MM' labels) and BILL_FIELDS arrays, one entry per month.
+    """
+    ts = np.asarray(ts, dtype=np.float64)
+    n = len(ts)
+    if n == 0:
+        return {"month": np.empty(0, dtype="<U7"), **{name: np.empty(0) for name in BILL_FIELDS}}
+
+    # 1. Hours billed per sample
+    dt = np.empty(n)
+    dt[0] = 0.0 if prev_ts is None else ts[0] - prev_ts
+    np.subtract(ts[1:], ts[:-1], out=dt[1:])
+    dt[(dt > max_gap_seconds) | (dt < 0)] = 0.0
+    hours = dt / 3600.0
+
+    # 2. Energy flows with and without the battery (import / export kWh per
+    #    sample), summed per minute slot: prices are constant within one
+    grid = np.nan_to_num(np.asarray(grid_kw, dtype=np.float64))
+    baseline = grid - np.nan_to_num(np.asarray(battery_kw, dtype=np.float64))
+    flows = np.empty((4, n))
+    np.multiply(np.maximum(grid, 0.0), hours, out=flows[0])
+    np.subtract(flows[0], grid * hours, out=flows[1])
+    np.multiply(np.maximum(baseline, 0.0), hours, out=flows[2])
+    np.subtract(flows[2], baseline * hours, out=flows[3])
+    slots = tariff.slots(ts)
+    slot_starts = np.r_[0, np.flatnonzero(np.diff(slots)) + 1]
+    flows = np.add.reduceat(flows, slot_starts, axis=1)
+    slots = slots[slot_starts]
+
+    # 3. Priced per slot, summed per month
+    import_price, export_price, demand, month_id = tariff.prices(slots)
+    costs = np.array([flows[0] * import_price - flows[1] * export_price,
+                      flows[2] * import_price - flows[3] * export_price])
+    month_starts = np.r_[0, np.flatnonzero(np.diff(month_id)) + 1]
+    energy = np.add.reduceat(flows[:2], month_starts, axis=1)
+    cost = np.add.reduceat(costs, month_starts, axis=1)
+
+    # 4. Peak demand: interval-average import in demand windows, max per month
+    #    (intervals divide a day, so none spans two months)
+    interval = slots // (tariff.demand_interval_s // SLOT_SECONDS)
+    interval_starts = np.r_[0, np.flatnonzero(np.diff(interval)) + 1]
+    interval_kwh = np.add.reduceat(flows[[0, 2]] * demand, interval_starts, axis=1)
+    interval_month = month_id[interval_starts]
+    peak_starts = np.r_[0, np.flatnonzero(np.diff(interval_month)) + 1]
+    peak_kw = np.maximum.reduceat(interval_kwh, peak_starts, axis=1) * (3600.0 / tariff.demand_interval_s)
+    demand_charge = peak_kw * tariff.demand_charge_per_kw
+
+    total, baseline_total = cost + demand_charge
+    return {
+        "month": np.array([month_label(m) for m in month_id[month_starts]]),
+        "import_kwh": energy[0],
+        "export_kwh": energy[1],
+        "energy_cost": cost[0],
+        "peak_demand_kw": peak_kw[0],
+        "demand_charge": demand_charge[0],
+        "total_cost": total,
+        "baseline_energy_cost": cost[1],
+        "baseline_peak_demand_kw": peak_kw[1],
+        "baseline_demand_charge": demand_charge[1],
+        "baseline_total_cost": baseline_total,
+        "savings": baseline_total - total,
+    }
+
+
+class _Account:
+    """Running totals of one site's open billing month (same accounting as bill_samples)."""
+    __slots__ = ("tariff", "month_id", "last_ts", "interval", "interval_kwh", "baseline_interval_kwh",
+                 "peak_kwh", "baseline_peak_kwh", "import_kwh", "export_kwh", "energy_cost", "baseline_energy_cost")
+
+    def __init__(self, tariff, month_id=None):
+        self.tariff = tariff
+        self.month_id = month_id
+        self.last_ts = None
+        self.interval = None
+        self._reset()
+
+    def _reset(self):
+        self.interval_kwh = self.baseline_interval_kwh = 0.0
+        self.peak_kwh = self.baseline_peak_kwh = 0.0
+        self.import_kwh = self.export_kwh = 0.0
+        self.energy_cost = self.baseline_energy_cost = 0.0
+
+    def totals(self):
+        """The open month as one bill row (the current interval counts toward the peak)."""
+        to_kw = 3600.0 / self.tariff.demand_interval_s
+        peak_kw = max(self.peak_kwh, self.interval_kwh) * to_kw
+        baseline_peak_kw = max(self.baseline_peak_kwh, self.baseline_interval_kwh) * to_kw
+        demand_charge = peak_kw * self.tariff.demand_charge_per_kw
+        baseline_demand_charge = baseline_peak_kw * self.tariff.demand_charge_per_kw
+        total = self.energy_cost + demand_charge
+        baseline_total = self.baseline_energy_cost + baseline_demand_charge
+        return {
+            "month": None if self.month_id is None else month_label(self.month_id),
+            "import_kwh": self.import_kwh,
+            "export_kwh": self.export_kwh,
+            "energy_cost": self.energy_cost,
+            "peak_demand_kw": peak_kw,
+            "demand_charge": demand_charge,
+            "total_cost": total,
+            "baseline_energy_cost": self.baseline_energy_cost,
+            "baseline_peak_demand_kw": baseline_peak_kw,
+            "baseline_demand_charge": baseline_demand_charge,
+            "baseline_total_cost": baseline_total,
+            "savings": baseline_total - total,
+        }
+
+
+class TariffEngine:
+    """
+    Energy-cost accounting for every site.
+
+    1. Each site is assigned a named Tariff (site config "tariff", else
+       "default"); tariffs come from config/tariffs.json.
+    2. update() folds one new sample into the site's open billing month in
+       O(1): a price lookup in the cached day arrays and a few float adds.
+       A sample in a new month closes the open one into a short per-site
+       list of closed months.
+    3. bill() / fleet_bill() price arbitrary history ranges with
+       bill_samples(), a fixed number of vectorized passes per site, for
+       billing-period reports and back-billing after a tariff change.
+
+    A tariff file that fails to load leaves the previous table (at startup,
+    the flat default) in place; the problem is recorded in `error`.
+    """
+    def __init__(self, tariffs=None, max_gap_seconds=DEFAULT_MAX_GAP_SECONDS):
+        self.tariffs = dict(tariffs) if tariffs is not None else {DEFAULT_TARIFF: Tariff(DEFAULT_TARIFF, 0.0)}
+        self.max_gap_seconds = max_gap_seconds
+        self._site_tariff = {}
+        self._accounts = {}
+        self._closed = {}
+        self._lock = threading.Lock()
+        self.error = None
+
+    def load_tariffs(self, path=DEFAULT_TARIFF_FILE):
+        """
+        Replaces the tariff table from a JSON file (see load_tariffs()).
+
+        Raises:
+            ConfigError: The file is invalid; the current table is kept.
+        """
+        try:
+            tariffs = load_tariffs(path)
+        except ConfigError as exc:
+            self.error = str(exc)
+            raise
+        self.error = None
+        with self._lock:
+            self.tariffs = tariffs
+            for account in self._accounts.values():
+                account.tariff = tariffs.get(account.tariff.name, tariffs[DEFAULT_TARIFF])
+        return sorted(tariffs)
+
+    def assign(self, site_id, name=None):
+        """
+        Sets a site's tariff. Running totals keep accumulating: samples from
+        now on are priced with the new tariff. Unknown names (e.g. a typo in
+        a hot-reloaded site config) fall back to the default tariff.
+
+        Returns:
+            str: The tariff name in effect.
+        """
+        name = name if name in self.tariffs else DEFAULT_TARIFF
+        tariff = self.tariffs[name]
+        with self._lock:
+            self._site_tariff[site_id] = name
+            account = self._accounts.get(site_id)
+            if account is not None:
+                account.tariff = tariff
+        return name
+
+    def tariff(self, site_id):
+        return self.tariffs[self._site_tariff.get(site_id, DEFAULT_TARIFF)]
+
+    # --- 1. Incremental monthly totals ---
+    def update(self, site_id, timestamp, grid_kw, battery_kw):
+        """
+        Adds one sample to the site's open billing month.
+
+        Args:
+            timestamp (float): Epoch seconds (samples in time order).
+            grid_kw (float): Grid power, + = import.
+            battery_kw (float): Battery power, + = charging.
+
+        Returns:
+            dict: The open month's totals (a bill row).
+        """
+        grid_kw = 0.0 if grid_kw != grid_kw else grid_kw
+        battery_kw = 0.0 if battery_kw != battery_kw else battery_kw
+        with self._lock:
+            account = self._accounts.get(site_id)
+            if account is None:
+                account = self._accounts[site_id] = _Account(self.tariff(site_id))
+            tariff = account.tariff
+            slot = int((timestamp + tariff.utc_offset_s) // SLOT_SECONDS)
+            day, minute = divmod(slot, SLOTS_PER_DAY)
+            import_price, export_price, demand, month_id = tariff.day(day)
+            if month_id != account.month_id:
+                if account.month_id is not None:
+                    self._closed.setdefault(site_id, deque(maxlen=MAX_CLOSED_MONTHS)).append(account.totals())
+                account.month_id = month_id
+                account._reset()
+
+            # Same hold / gap rules as bill_samples
+            dt = 0.0 if account.last_ts is None else timestamp - account.last_ts
+            hours = dt / 3600.0 if 0.0 <= dt <= self.max_gap_seconds else 0.0
+            account.last_ts = timestamp
+            import_price, export_price = float(import_price[minute]), float(export_price[minute])
+            baseline_kw = grid_kw - battery_kw
+            imported, exported = max(grid_kw, 0.0) * hours, max(-grid_kw, 0.0) * hours
+            baseline_imported, baseline_exported = max(baseline_kw, 0.0) * hours, max(-baseline_kw, 0.0) * hours
+            account.import_kwh += imported
+            account.export_kwh += exported
+            account.energy_cost += imported * import_price - exported * export_price
+            account.baseline_energy_cost += baseline_imported * import_price - baseline_exported * export_price
+
+            interval = slot // (tariff.demand_interval_s // SLOT_SECONDS)
+            if interval != account.interval:
+                account.peak_kwh = max(account.peak_kwh, account.interval_kwh)
+                account.baseline_peak_kwh = max(account.baseline_peak_kwh, account.baseline_interval_kwh)
+                account.interval = interval
+                account.interval_kwh = account.baseline_interval_kwh = 0.0
+            if demand[minute]:
+                account.interval_kwh += imported
+                account.baseline_interval_kwh += baseline_imported
+            return account.totals()
+
+    def monthly_totals(self, site_ids=None):
+        """
+        Open-month totals of the fleet (or the given sites) from the running accounts.
+
+        Returns:
+            dict: Arrays aligned with "site_id": "month" and BILL_FIELDS.
+        """
+        with self._lock:
+            if site_ids is None:
+                site_ids = list(self._accounts)
+            site_ids = [s for s in site_ids if s in self._accounts]
+            rows = [self._accounts[s].totals() for s in site_ids]
+        report = {"site_id": np.array(site_ids, dtype=object), "month": np.array([r["month"] for r in rows])}
+        for name in BILL_FIELDS:
+            report[name] = np.fromiter((r[name] for r in rows), dtype=np.float64, count=len(rows))
+        return report
+
+    def closed_months(self, site_id):
+        """Bill rows of the site's closed months, oldest first."""
+        with self._lock:
+            return list(self._closed.get(site_id, ()))
+
+    # --- 2. History ranges ---
+    def bill(self, site_id, start=None, end=None, store=history, tariff=None):
+        """
+        Bills a site's recorded history (sim_grid_kw / sim_battery_kw) between start and end.
+
+        Args:
+            start, end: Optional bounds (epoch seconds, datetime or ISO string).
+            tariff (str): Tariff to apply instead of the site's (what-if comparisons).
+
+        Returns:
+            dict: bill_samples() rows, one per billing month in the range.
+        """
+        tariff = self.tariff(site_id) if tariff is None else self.tariffs[tariff]
+        start = None if start is None else to_epoch_seconds(start)
+        # Read one gap back so the first sample in range knows its interval
+        data = store.query(site_id, columns=("sim_grid_kw", "sim_battery_kw"),
+                           start=None if start is None else start - self.max_gap_seconds, end=end)
+        ts = data["timestamp"]
+        first = 0 if start is None else int(np.searchsorted(ts, start, side="left"))
+        prev_ts = float(ts[first - 1]) if first else None
+        return bill_samples(tariff, ts[first:], data["sim_grid_kw"][first:], data["sim_battery_kw"][first:],
+                            prev_ts=prev_ts, max_gap_seconds=self.max_gap_seconds)
+
+    def fleet_bill(self, start=None, end=None, site_ids=None, store=history):
+        """
+        bill() for every site with history, flattened into one table.
+
+        Returns:
+            dict: Arrays "site_id", "month" and BILL_FIELDS, one entry per (site, month).
+        """
+        site_ids = store.site_ids() if site_ids is None else site_ids
+        bills = [(site_id, self.bill(site_id, start, end, store)) for site_id in site_ids]
+        report = {
+            "site_id": np.array([s for s, b in bills for _ in b["month"]], dtype=object),
+            "month": np.concatenate([b["month"] for _, b in bills]) if bills else np.empty(0, dtype="<U7"),
+        }
+        for name in BILL_FIELDS:
+            report[name] = np.concatenate([b[name] for _, b in bills]) if bills else np.empty(0)
+        return report
+
+    # --- 3. Persistence ---
+    def export_state(self, site_id):
+        """JSON-ready running account of one site (None if it has none)."""
+        with self._lock:
+            account = self._accounts.get(site_id)
+            if account is None:
+                return None
+            state = {name: getattr(account, name) for name in _Account.__slots__ if name != "tariff"}
+            state["tariff"] = account.tariff.name
+            state["closed"] = list(self._closed.get(site_id, ()))
+            return state
+
+    def load_state(self, site_id, state):
+        """Restores export_state(). The site's currently assigned tariff wins over the saved one."""
+        with self._lock:
+            account = _Account(self.tariff(site_id))
+            for name in _Account.__slots__:
+                if name != "tariff" and name in state:
+                    setattr(account, name, state[name])
+            self._accounts[site_id] = account
+            self._closed[site_id] = deque(state.get("closed", ()), maxlen=MAX_CLOSED_MONTHS)
+
+
+# Process-wide accounting shared by every service (tariffs from config/tariffs.json).
+# A broken tariff file must not break importing the services: bill at the
+# flat default until it is fixed.
+tariff_engine = TariffEngine()
+try:
+    tariff_engine.load_tariffs()
+except ConfigError as _exc:
+    print(f"⚠️ Tariffs not loaded, billing at the flat default: {_exc}", file=sys.stderr)
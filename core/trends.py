@@ -0,0 +1,69 @@
+# core/trends.py
+
+import time
+
+import numpy as np
+
+from core.history_cache import history_cache
+from utils.downsample import lttb_many
+
+# Dashboard label -> history column (twin output, so every site has it)
+TREND_SIGNALS = {
+    "State of Charge (%)": "sim_soc",
+    "Solar (kW)": "sim_solar_kw",
+    "Load (kW)": "sim_load_kw",
+    "Battery Temp (°C)": "sim_temp",
+    "State of Health (%)": "sim_soh",
+}
+
+# Range label -> window length in seconds
+TREND_RANGES = {
+    "1h": 3600,
+    "24h": 24 * 3600,
+    "7d": 7 * 24 * 3600,
+    "30d": 30 * 24 * 3600,
+}
+
+
+def build_trend_payload(site_id, range_key, width_px, cache=history_cache):
+    """
+    One trailing window of every trend signal at the pixel budget, read
+    through the shared history query cache: LTTB over the raw window for the
+    line (width_px points, so its shape survives) plus a min / max envelope
+    of width_px / 2 cached buckets, so short spikes stay visible. New samples
+    only re-slice the raw window and extend the cached buckets.
+
+    Returns:
+        dict: {"range": ..., "width": ..., "raw_points": int,
+               "signals": {label: {"x", "y", "env_x", "env_min", "env_max"}}}
+    """
+    span = TREND_RANGES[range_key]
+    columns = tuple(TREND_SIGNALS.values())
+    raw = cache.query(site_id, columns=columns, window=span)
+    resolution = span / max(1, int(width_px) // 2)
+    buckets = cache.query(site_id, columns=columns, window=span, resolution=resolution)
+    ts = raw["timestamp"]
+    env_x = buckets["timestamp"] + resolution / 2  # Bucket centres
+    payload = {"site_id": site_id, "range": range_key, "width": width_px, "raw_points": len(ts), "signals": {}}
+
+    lines = lttb_many(ts, [raw[column] for column in columns], width_px)
+    for (label, column), (x, y) in zip(TREND_SIGNALS.items(), lines):
+        filled = np.isfinite(buckets[f"{column}_min"])  # Empty or all-NaN buckets
+        payload["signals"][label] = {
+            "x": x, "y": y,
+            "env_x": env_x[filled], "env_min": buckets[f"{column}_min"][filled],
+            "env_max": buckets[f"{column}_max"][filled],
+        }
+    return payload
+
+
+def get_trend_payload(site_id, range_key, width_px, cache=history_cache):
+    """
+    Timed front door for build_trend_payload.
+
+    Returns:
+        tuple: (payload, stats) where stats reports the compute time.
+    """
+    t0 = time.perf_counter()
+    payload = build_trend_payload(site_id, range_key, int(width_px), cache=cache)
+    return payload, {"compute_ms": (time.perf_counter() - t0) * 1000.0}
@@ -1,14 +1,53 @@
+import time
+
+_T0 = time.perf_counter()  # Fallback cold-start reference where /proc is unavailable
+
+import argparse
+import os
+import sys
+
+# Only numpy-free modules at import time: argument parsing (and --help) must
+# not wait for the simulation stack, which initialize_backend() loads.
 from core.event_bus import EventBus
 from core.device_registry.registry_manager import DeviceRegistry
-import app  # This connects the UI to your logic
+from utils.metrics import metrics
+
+
+def _cold_start_ms():
+    """
+    Milliseconds since the process was launched, interpreter start-up
+    included (Linux /proc, 10 ms resolution). Elsewhere, since main.py began.
+    """
+    try:
+        with open("/proc/self/stat") as handle:
+            start_ticks = int(handle.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as handle:
+            uptime = float(handle.read().split()[0])
+        return (uptime - start_ticks / os.sysconf("SC_CLK_TCK")) * 1e3
+    except (OSError, ValueError, IndexError):
+        return (time.perf_counter() - _T0) * 1e3
 
 def on_device_registered(event_data):
     """Callback for when a new hardware device is detected."""
     print("📡 EVENT RECEIVED: Device Registered")
     print(event_data)
 
+def on_insight_changed(event_data):
+    """Callback for when a site's stable insight changes (already debounced)."""
+    print(f"🧠 {event_data['site_id']}: {event_data['previous']} -> {event_data['current']}")
+
+def on_alarms_changed(event_data):
+    """Callback for one tick's batch of alarm transitions."""
+    for kind, mark in (("raised", "🚨"), ("cleared", "✅")):
+        batch = event_data[kind]
+        for code, site_id, value in zip(batch["code"], batch["site_id"], batch["value"]):
+            print(f"{mark} {site_id}: {code} {kind} ({value:.1f})")
+
 def initialize_backend():
     """Sets up the Digital Twin infrastructure."""
+    from core.alarms import ALARMS_CHANGED_EVENT
+    from utils.insight_gate import INSIGHT_CHANGED_EVENT, insight_gate
+
     event_bus = EventBus()
 
     # Subscribe to device registration events
@@ -17,6 +56,22 @@ def initialize_backend():
         callback=on_device_registered
     )
 
+    # Insight transitions from every site's simulation loop
+    event_bus.subscribe(
+        event_type=INSIGHT_CHANGED_EVENT,
+        callback=on_insight_changed
+    )
+    insight_gate.event_bus = event_bus
+
+    # Raise/clear transitions of the fleet-wide alarm rules (one event per tick)
+    event_bus.subscribe(
+        event_type=ALARMS_CHANGED_EVENT,
+        callback=on_alarms_changed
+    )
+
+    # Metrics endpoint / snapshot dump when SKYLINE_METRICS=1
+    metrics.start_exporters_from_env()
+
     registry = DeviceRegistry(event_bus=event_bus)
 
     # Register the Victron battery (simulating hardware discovery)
@@ -31,9 +86,58 @@ def initialize_backend():
     )
     return event_bus, registry
 
+def run_headless(args):
+    """
+    Runs the simulation service without any UI: per-site twins on a
+    fixed-cadence scheduler, results written to the state directory.
+    Dashboards started with `streamlit run app.py` attach to it read-only.
+    """
+    bus, _ = initialize_backend()
+
+    from core.headless import HeadlessService
+    from core.persistence import DEFAULT_STATE_DIR
+    site_ids = [s for s in args.sites.split(",") if s] or None
+    service = HeadlessService(
+        site_ids=site_ids,
+        step_seconds=args.step_seconds,
+        state_dir=args.state_dir or DEFAULT_STATE_DIR,
+        flush_seconds=args.flush_seconds,
+        event_bus=bus,
+        shards=args.shards,
+    )
+    service.install_signal_handlers()
+    service.start()
+    print(f"✅ Headless service up {_cold_start_ms():.0f} ms after launch: "
+          f"{len(service.site_ids)} site(s) every {args.step_seconds:g} s -> {service.store.state_dir}")
+    if service.sharded is not None:
+        print(f"🧩 {args.shards} shard worker(s), fleet state in shared memory segment {service.sharded.name}")
+    service.run(args.duration)
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Skyline Aether Digital Twin backend")
+    parser.add_argument("--headless", action="store_true",
+                        help="run the simulation service only (no Streamlit, pandas or plotly)")
+    parser.add_argument("--sites", default="", help="comma-separated site IDs (default: every configured site)")
+    parser.add_argument("--step-seconds", type=float, default=10.0)
+    parser.add_argument("--flush-seconds", type=float, default=30.0, help="history/state checkpoint interval")
+    parser.add_argument("--state-dir", default=None, help="default: $SKYLINE_STATE_DIR or ./state")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--shards", type=int, default=0,
+                        help="step the fleet on this many worker processes over shared memory (default: off)")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.headless:
+        sys.exit(run_headless(args))
+
     # 1. Start the backend logic
     bus, reg = initialize_backend()
     
     # 2. Launch the Streamlit UI (This keeps the app alive)
+    # Imported here so initializing the backend never pays for the UI stack.
+    import app
     app.main_dashboard()
@@ -28,6 +28,14 @@ class Battery:
         # Ensure it stays within physical limits
         return max(0.0, min(100.0, soc))
 
+    def charge_limit_kw(self, dt_hours):
+        """Terminal power that fills the remaining headroom within dt_hours."""
+        return max(0.0, self.capacity_kwh - self.energy) / (dt_hours * self.efficiency_charge)
+
+    def discharge_limit_kw(self, dt_hours):
+        """Terminal power that can be delivered for dt_hours (energy and C-rate bound)."""
+        return min(self.max_power_kw, max(0.0, self.energy) / dt_hours)
+
     def step(self, power_in_kw, power_out_kw, dt_hours, env_temp):
         """
         Updates the state over a time step (dt_hours).
@@ -67,4 +75,4 @@ class Battery:
         # Enforce temperature safety limit
         self.temperature = min(self.max_temp, self.temperature)
         
-        return soc, self.temperature
\ No newline at end of file
+        return soc, self.temperature
\ No newline at end of file
@@ -0,0 +1,310 @@
+# physics/inverter.py
+import math
+from functools import lru_cache
+
+import numpy as np
+
+# Datasheet-style efficiency curve of a hybrid (PV + battery) inverter:
+# (AC output / rated power, efficiency). Below the first point the loss
+# falls linearly to the standby consumption at zero output.
+DEFAULT_EFFICIENCY_CURVE = (
+    (0.05, 0.900), (0.10, 0.940), (0.20, 0.962), (0.30, 0.970),
+    (0.50, 0.975), (0.75, 0.974), (1.00, 0.970),
+)
+DEFAULT_STANDBY_PU = 0.002         # Standby draw as a fraction of rated power
+TABLE_STEPS = 1024                 # Uniform interpolation steps per table
+
+# Heatsink thermal model: steady-state rise above ambient is proportional to
+# the loss (per unit of rated power); first-order lag towards it.
+DEFAULT_THERMAL_RISE_C = 420.0     # C per unit loss (~6 C at 60% load, ~14 C at full load)
+DEFAULT_TIME_CONSTANT_S = 600.0
+DEFAULT_DERATE_START_C = 50.0      # Output derates linearly above this heatsink temperature
+DEFAULT_SHUTDOWN_C = 70.0          # ... down to zero here
+
+
+class EfficiencyTable:
+    """
+    Precomputed per-unit conversion tables for one efficiency curve.
+
+    dc_for_ac: DC input needed for an AC output (output + loss).
+    ac_for_dc: AC output obtainable from a DC input (the inverse, solved
+               once here instead of per step).
+    Both are sampled on uniform grids, so a lookup is one multiply, one
+    index and one linear interpolation. Tables are per unit of rated power
+    and shared by every inverter with the same curve (see efficiency_table).
+    """
+    def __init__(self, curve=DEFAULT_EFFICIENCY_CURVE, standby_pu=DEFAULT_STANDBY_PU, steps=TABLE_STEPS):
+        load_pu, efficiency = (np.array(v, dtype=np.float64) for v in zip(*curve))
+        ac_grid = np.linspace(0.0, 1.0, steps + 1)
+        point_loss = load_pu * (1.0 / efficiency - 1.0)
+        loss = np.interp(ac_grid, np.concatenate(([0.0], load_pu)), np.concatenate(([standby_pu], point_loss)))
+        dc_table = ac_grid + loss
+        if np.any(np.diff(dc_table) <= 0):
+            raise ValueError("Efficiency curve must give a strictly increasing DC input")
+
+        self.steps = steps
+        self.dc_max_pu = float(dc_table[-1])
+        self._ac_scale = float(steps)
+        self._dc_scale = steps / self.dc_max_pu
+        dc_grid = np.linspace(0.0, self.dc_max_pu, steps + 1)
+        ac_table = np.interp(dc_grid, dc_table, ac_grid, left=0.0)  # Below standby: no output
+
+        # NumPy copies for batches, lists for the scalar path (no NumPy scalar overhead)
+        self.dc_table, self.ac_table = dc_table, ac_table
+        self._dc_slope, self._ac_slope = np.append(np.diff(dc_table), 0.0), np.append(np.diff(ac_table), 0.0)
+        self._dc_list, self._dc_slope_list = dc_table.tolist(), self._dc_slope.tolist()
+        self._ac_list, self._ac_slope_list = ac_table.tolist(), self._ac_slope.tolist()
+
+    @staticmethod
+    def _lookup_batch(values, slopes, pos, last):
+        # In place on pos (always a temporary here); take() gathers beat np.interp's search ~10x
+        np.maximum(pos, 0.0, out=pos)
+        np.minimum(pos, last, out=pos)
+        i = pos.astype(np.intp)
+        pos -= i
+        pos *= slopes.take(i)
+        pos += values.take(i)
+        return pos
+
+    def dc_for_ac(self, ac_pu):
+        pos = ac_pu * self._ac_scale
+        if pos <= 0.0:
+            return self._dc_list[0]
+        if pos >= self.steps:
+            return self._dc_list[-1]
+        i = int(pos)
+        return self._dc_list[i] + (pos - i) * self._dc_slope_list[i]
+
+    def ac_for_dc(self, dc_pu):
+        pos = dc_pu * self._dc_scale
+        if pos <= 0.0:
+            return 0.0
+        if pos >= self.steps:
+            return 1.0
+        i = int(pos)
+        return self._ac_list[i] + (pos - i) * self._ac_slope_list[i]
+
+    def dc_for_ac_batch(self, ac_pu):
+        return self._lookup_batch(self.dc_table, self._dc_slope, ac_pu * self._ac_scale, self.steps)
+
+    def ac_for_dc_batch(self, dc_pu):
+        return self._lookup_batch(self.ac_table, self._ac_slope, dc_pu * self._dc_scale, self.steps)
+
+
+@lru_cache(maxsize=None)
+def efficiency_table(curve=DEFAULT_EFFICIENCY_CURVE, standby_pu=DEFAULT_STANDBY_PU):
+    """Shared EfficiencyTable per (curve, standby); curve must be a tuple of pairs."""
+    return EfficiencyTable(curve, standby_pu)
+
+
+def default_inverter_rating(panel_area_m2, panel_efficiency, battery_capacity_kwh):
+    """
+    Rated AC power (kW) for sites that do not configure one: the larger of
+    the array's peak output at 1000 W/m^2 and a 0.5C battery discharge.
+    Scalars or NumPy arrays.
+    """
+    return np.maximum(panel_area_m2 * panel_efficiency, 0.5 * np.asarray(battery_capacity_kwh, dtype=np.float64))
+
+
+def inverter_settings(params):
+    """
+    Inverter / grid-connection settings of a site config, with defaults for
+    configs that predate them: the default rating, and no grid connection
+    (import and export limits of 0 kW, i.e. an islanded site).
+    """
+    rated_kw = params.get("inverter_rated_kw")
+    if rated_kw is None:
+        rated_kw = float(default_inverter_rating(
+            params["panel_area_m2"], params["panel_efficiency"], params["battery_capacity_kwh"]))
+    return {
+        "rated_kw": rated_kw,
+        "grid_import_limit_kw": params.get("grid_import_limit_kw", 0.0),
+        "grid_export_limit_kw": params.get("grid_export_limit_kw", 0.0),
+    }
+
+
+class Inverter:
+    """
+    Hybrid inverter and grid connection of one site: splits the PV (DC) and
+    load (AC) powers between battery and grid, with load-dependent losses,
+    clipping at the (thermally derated) AC rating and grid limits.
+
+    Priority order: PV serves the load, the surplus charges the battery, then
+    is exported; the battery covers what PV cannot, then the grid imports.
+    PV that has nowhere to go is curtailed; load that cannot be served is unmet.
+    """
+    def __init__(self, rated_kw, grid_import_limit_kw=0.0, grid_export_limit_kw=0.0,
+                 curve=DEFAULT_EFFICIENCY_CURVE, standby_pu=DEFAULT_STANDBY_PU,
+                 thermal_rise_c=DEFAULT_THERMAL_RISE_C, time_constant_s=DEFAULT_TIME_CONSTANT_S,
+                 derate_start_c=DEFAULT_DERATE_START_C, shutdown_c=DEFAULT_SHUTDOWN_C):
+        self.rated_kw = rated_kw                           # AC rating (kW)
+        self.grid_import_limit_kw = grid_import_limit_kw   # 0 = no grid connection
+        self.grid_export_limit_kw = grid_export_limit_kw
+        self.table = efficiency_table(tuple(map(tuple, curve)), standby_pu)
+        self.thermal_rise_c = thermal_rise_c
+        self.time_constant_s = time_constant_s
+        self.derate_start_c = derate_start_c
+        self.shutdown_c = shutdown_c
+        self._lag = (None, 0.0)                            # (dt_hours, 1 - exp(-dt / tau))
+
+        self.temperature = 25.0                            # Heatsink temperature (C)
+
+    def ac_limit_kw(self):
+        """AC rating after thermal derating."""
+        derate = (self.shutdown_c - self.temperature) / (self.shutdown_c - self.derate_start_c)
+        return self.rated_kw * max(0.0, min(1.0, derate))
+
+    def step(self, pv_kw, load_kw, charge_limit_kw, discharge_limit_kw, dt_hours, ambient_temp):
+        """
+        Resolves the power flow for one step and updates the heatsink temperature.
+
+        Args:
+            pv_kw (float): DC power from the array.
+            load_kw (float): AC demand.
+            charge_limit_kw, discharge_limit_kw (float): What the battery can
+                accept / deliver at its terminals this step.
+
+        Returns:
+            tuple: (battery_kw (+ = charging), grid_kw (+ = import), loss_kw,
+                    curtailed_kw, unmet_kw)
+        """
+        rated = self.rated_kw
+        table = self.table
+
+        # 1. Load first, up to the (derated) rating. Usually PV + battery can
+        #    carry it and one table lookup gives the DC draw; otherwise the
+        #    inverse table gives what the available DC can deliver
+        ac_serve = min(load_kw, self.ac_limit_kw())
+        dc_in = rated * table.dc_for_ac(ac_serve / rated)
+        dc_avail = pv_kw + discharge_limit_kw
+        if dc_in > dc_avail:
+            ac_serve = rated * table.ac_for_dc(dc_avail / rated)   # 0 below standby: inverter idles
+            dc_in = dc_avail
+
+        # 2. DC the battery cannot take is exported, within headroom and the export limit
+        ac_out = ac_serve
+        spill_kw = pv_kw - charge_limit_kw
+        if spill_kw > dc_in and self.grid_export_limit_kw > 0.0:
+            ac_out = max(ac_serve, min(rated * table.ac_for_dc(spill_kw / rated), self.ac_limit_kw(),
+                                       ac_serve + self.grid_export_limit_kw))
+            dc_in = rated * table.dc_for_ac(ac_out / rated)
+
+        # 3. The battery balances the DC bus; PV beyond its charge limit is clipped
+        battery_kw = pv_kw - dc_in
+        curtailed_kw = 0.0
+        if battery_kw > charge_limit_kw:
+            curtailed_kw = battery_kw - charge_limit_kw
+            battery_kw = charge_limit_kw
+        loss_kw = dc_in - ac_out
+
+        # 4. The grid covers what the inverter could not
+        shortfall = load_kw - ac_serve
+        grid_import = min(shortfall, self.grid_import_limit_kw)
+        grid_kw = grid_import - (ac_out - ac_serve)
+
+        # 5. Heatsink: first-order lag towards ambient + rise(loss); the lag factor only changes with dt
+        lag_dt, alpha = self._lag
+        if lag_dt != dt_hours:
+            alpha = 1.0 - math.exp(-dt_hours * 3600.0 / self.time_constant_s)
+            self._lag = (dt_hours, alpha)
+        target = ambient_temp + self.thermal_rise_c * loss_kw / rated
+        self.temperature += (target - self.temperature) * alpha
+
+        return battery_kw, grid_kw, loss_kw, curtailed_kw, shortfall - grid_import
+
+
+class InverterBank:
+    """
+    N inverters stepped together with NumPy: Inverter.step element-wise,
+    using the same shared EfficiencyTable. Every parameter broadcasts to (N,).
+    """
+    def __init__(self, rated_kw, grid_import_limit_kw=0.0, grid_export_limit_kw=0.0,
+                 curve=DEFAULT_EFFICIENCY_CURVE, standby_pu=DEFAULT_STANDBY_PU,
+                 thermal_rise_c=DEFAULT_THERMAL_RISE_C, time_constant_s=DEFAULT_TIME_CONSTANT_S,
+                 derate_start_c=DEFAULT_DERATE_START_C, shutdown_c=DEFAULT_SHUTDOWN_C,
+                 initial_temp=25.0):
+        arrays = np.broadcast_arrays(
+            *(np.asarray(v, dtype=np.float64) for v in (
+                rated_kw, grid_import_limit_kw, grid_export_limit_kw, initial_temp))
+        )
+        (self.rated_kw, self.grid_import_limit_kw, self.grid_export_limit_kw,
+         initial_temp) = (np.array(a, ndmin=1) for a in arrays)
+        self.size = self.rated_kw.shape[0]
+        self.table = efficiency_table(tuple(map(tuple, curve)), standby_pu)
+        self.thermal_rise_c = thermal_rise_c
+        self.time_constant_s = time_constant_s
+        self.derate_start_c = derate_start_c
+        self.shutdown_c = shutdown_c
+        self.exports = bool(np.any(self.grid_export_limit_kw > 0))
+        self._inv_rated = 1.0 / self.rated_kw
+
+        self.temperature = initial_temp.copy()
+
+    def ac_limit_kw(self):
+        derate = (self.shutdown_c - self.temperature) / (self.shutdown_c - self.derate_start_c)
+        return self.rated_kw * np.clip(derate, 0.0, 1.0)
+
+    def step(self, pv_kw, load_kw, charge_limit_kw, discharge_limit_kw, dt_hours, ambient_temp):
+        """
+        Inverter.step for every inverter. Inputs are scalars or arrays of shape (N,).
+
+        Returns:
+            dict: battery_kw, grid_kw, loss_kw, curtailed_kw, unmet_kw arrays.
+        """
+        size = self.size
+        rated, inv_rated = self.rated_kw, self._inv_rated
+        table = self.table
+        pv_kw = np.broadcast_to(pv_kw, (size,))
+        # Derating only matters once a heatsink is past derate_start_c
+        ac_limit = self.ac_limit_kw() if self.temperature.max() > self.derate_start_c else rated
+
+        # 1. Load first: one lookup for all, the inverse only where PV + battery fall short
+        ac_serve = np.minimum(load_kw, ac_limit)
+        dc_in = table.dc_for_ac_batch(ac_serve * inv_rated)
+        dc_in *= rated
+        dc_avail = np.add(pv_kw, discharge_limit_kw, out=np.empty(size))
+        short = np.flatnonzero(dc_in > dc_avail)
+        if len(short):
+            ac_serve[short] = rated[short] * table.ac_for_dc_batch(dc_avail[short] * inv_rated[short])
+            dc_in[short] = dc_avail[short]
+
+        # 2. Export of what the battery cannot take (skipped for islanded fleets)
+        ac_out = ac_serve
+        if self.exports:
+            spill_kw = pv_kw - charge_limit_kw
+            spill = np.flatnonzero((spill_kw > dc_in) & (self.grid_export_limit_kw > 0.0))
+            if len(spill):
+                ac_out = ac_serve.copy()
+                r = rated[spill]
+                limit = np.broadcast_to(ac_limit, (size,))[spill]
+                ac_out[spill] = np.maximum(ac_serve[spill], np.minimum(
+                    np.minimum(r * table.ac_for_dc_batch(spill_kw[spill] / r), limit),
+                    ac_serve[spill] + self.grid_export_limit_kw[spill]))
+                dc_in[spill] = r * table.dc_for_ac_batch(ac_out[spill] / r)
+
+        # 3. Battery balances the DC bus; PV beyond its charge limit is clipped
+        balance = pv_kw - dc_in
+        battery_kw = np.minimum(balance, charge_limit_kw)
+        curtailed_kw = balance
+        curtailed_kw -= battery_kw
+        loss_kw = dc_in
+        loss_kw -= ac_out
+
+        # 4. Grid
+        shortfall = load_kw - ac_serve
+        grid_import = np.minimum(shortfall, self.grid_import_limit_kw)
+
+        # 5. Heatsink (a new array: callers may keep the previous step's)
+        alpha = 1.0 - math.exp(-dt_hours * 3600.0 / self.time_constant_s)
+        target = loss_kw * (self.thermal_rise_c * alpha) * self._inv_rated
+        target += (ambient_temp - self.temperature) * alpha
+        target += self.temperature
+        self.temperature = target
+
+        return {
+            "battery_kw": battery_kw,
+            "grid_kw": grid_import - (ac_out - ac_serve),
+            "loss_kw": loss_kw,
+            "curtailed_kw": curtailed_kw,
+            "unmet_kw": shortfall - grid_import,
+        }
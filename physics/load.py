@@ -2,10 +2,15 @@
 import random
 from datetime import datetime
 
+import numpy as np
+
 class LoadModel:
     """Models human-driven energy demand with time-of-day variation."""
-    def __init__(self, base_load_kw, peak_multiplier=1.5, evening_start=18, evening_end=22):
+    def __init__(self, base_load_kw, peak_multiplier=1.5, evening_start=18, evening_end=22, noise=None):
         self.base_load = base_load_kw # Average daytime load (kW)
+        # Anything with uniform(low, high), e.g. a core.noise stream. The global
+        # random module is only the fallback for standalone use.
+        self.noise = noise if noise is not None else random
         self.peak_multiplier = peak_multiplier
         self.evening_start = evening_start
         self.evening_end = evening_end
@@ -15,7 +20,9 @@ class LoadModel:
         Calculates expected load demand (kW) based on the current hour.
         """
         hour = current_time.hour
-        variation = random.uniform(-0.2, 0.3) # Simulates minor appliance switching
+        # One draw per call in every branch, so draw i always belongs to call i
+        u = self.noise.uniform(0.0, 1.0)
+        variation = -0.2 + 0.5 * u # Simulates minor appliance switching, uniform(-0.2, 0.3)
         
         # Evening Peak (18:00 - 22:00)
         if self.evening_start <= hour <= self.evening_end:
@@ -25,7 +32,21 @@ class LoadModel:
         # Overnight Low (0:00 - 6:00)
         elif 0 <= hour <= 6:
             # Drop to maintenance level
-             return self.base_load * 0.4 * (1 + random.uniform(-0.1, 0.1))
+            return self.base_load * 0.4 * (1 - 0.1 + 0.2 * u)
         
         # Daytime Standard
-        return self.base_load * (1 + variation)
\ No newline at end of file
+        return self.base_load * (1 + variation)
+
+    def expected_demand(self, hours):
+        """
+        Mean demand (kW) for an hour of day (scalar or NumPy array), i.e. demand()
+        without the random appliance switching. Used by forecasting.
+        Fractional hours are floored, like datetime.hour.
+        """
+        hours = np.floor(np.asarray(hours, dtype=np.float64)) % 24
+        mean_variation = 0.05  # Mean of uniform(-0.2, 0.3)
+        return np.where(
+            (self.evening_start <= hours) & (hours <= self.evening_end),
+            self.base_load * self.peak_multiplier * (1 + mean_variation),
+            np.where(hours <= 6, self.base_load * 0.4, self.base_load * (1 + mean_variation)),
+        )
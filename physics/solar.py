@@ -1,4 +1,7 @@
 # physics/solar.py
+import random
+
+import numpy as np
 
 class SolarPanel:
     """Models the power output of a solar array based on irradiance and temperature."""
@@ -21,4 +24,27 @@ class SolarPanel:
         power_watts = irradiance * self.area * self.efficiency * temp_loss
         
         # Convert to Kilowatts for use in the main system
-        return power_watts / 1000.0
\ No newline at end of file
+        return power_watts / 1000.0
+
+
+def estimate_irradiance(hour, jitter_w_m2=50.0, noise=random):
+    """
+    Estimates plane-of-array irradiance (W/m^2) from the hour of day.
+    A triangular clear-sky profile peaking at 13:00, with +/- jitter for cloud noise.
+    `noise` is anything with uniform(low, high), e.g. a core.noise stream; it
+    is drawn once per call, night included, so draw i always belongs to call i.
+    """
+    jitter = noise.uniform(-jitter_w_m2, jitter_w_m2)
+    if not 9 <= hour <= 17:
+        return 0.0
+    return max(0, 1000 * (1 - abs(hour - 13) / 4) + jitter)
+
+
+def expected_irradiance(hours):
+    """
+    estimate_irradiance without the jitter, for a scalar or NumPy array of
+    hours of day. Fractional hours are floored, like datetime.hour.
+    """
+    hours = np.floor(np.asarray(hours, dtype=np.float64)) % 24
+    profile = np.maximum(0.0, 1000 * (1 - np.abs(hours - 13) / 4))
+    return np.where((hours >= 9) & (hours <= 17), profile, 0.0)
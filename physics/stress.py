@@ -0,0 +1,90 @@
+# physics/stress.py
+import bisect
+
+# Fixed bin layouts, shared by every battery so fleet arrays line up.
+# Temperature: under 0 C, 5 C bins up to 60 C, 60 C and over.
+TEMP_MIN_C, TEMP_STEP_C, TEMP_BINS = 0.0, 5.0, 14
+# SOC: 10% bins (100% lands in the top bin).
+SOC_STEP, SOC_BINS = 10.0, 10
+# C-rate (|battery power| / capacity): rest, then increasingly hard use.
+C_RATE_EDGES = (0.05, 0.25, 0.5, 1.0, 2.0)
+C_RATE_BINS = len(C_RATE_EDGES) + 1
+
+
+def temp_bin_edges():
+    """Lower edge of each temperature bin (the first is open below)."""
+    return [float("-inf")] + [TEMP_MIN_C + i * TEMP_STEP_C for i in range(TEMP_BINS - 1)]
+
+
+class StressCounters:
+    """
+    Lifetime stress accumulators of one battery, updated in O(1) per step.
+
+    Time spent in each temperature, SOC and C-rate bin (hours), cumulative
+    charge / discharge throughput at the terminals (kWh) and the equivalent
+    full cycles derived from it. The histograms are small fixed-size lists,
+    so the whole history of a battery is a few dozen numbers and health
+    analytics never need to rescan the history store.
+    """
+    def __init__(self, capacity_kwh):
+        self.capacity_kwh = capacity_kwh
+        self.hours = 0.0
+        self.charge_kwh = 0.0
+        self.discharge_kwh = 0.0
+        self.temp_hours = [0.0] * TEMP_BINS
+        self.soc_hours = [0.0] * SOC_BINS
+        self.c_rate_hours = [0.0] * C_RATE_BINS
+
+    def update(self, temp_c, soc_percent, battery_kw, dt_hours):
+        """
+        Adds one step.
+
+        Args:
+            temp_c (float): Battery temperature.
+            soc_percent (float): State of charge (0-100).
+            battery_kw (float): Terminal power, + = charging.
+            dt_hours (float): Step length.
+        """
+        # 1. Time-at-temperature / SOC: uniform bins, index by arithmetic
+        t = int((temp_c - TEMP_MIN_C) // TEMP_STEP_C) + 1
+        self.temp_hours[0 if t < 0 else (t if t < TEMP_BINS else TEMP_BINS - 1)] += dt_hours
+        s = int(soc_percent // SOC_STEP)
+        self.soc_hours[0 if s < 0 else (s if s < SOC_BINS else SOC_BINS - 1)] += dt_hours
+
+        # 2. C-rate and throughput
+        power = abs(battery_kw)
+        self.c_rate_hours[bisect.bisect_right(C_RATE_EDGES, power / self.capacity_kwh)] += dt_hours
+        if battery_kw > 0.0:
+            self.charge_kwh += power * dt_hours
+        else:
+            self.discharge_kwh += power * dt_hours
+        self.hours += dt_hours
+
+    def equivalent_full_cycles(self):
+        """Discharge throughput divided by nominal capacity."""
+        return self.discharge_kwh / self.capacity_kwh
+
+    def to_dict(self):
+        """JSON-ready copy (snapshot / twin state)."""
+        return {
+            "hours": self.hours,
+            "charge_kwh": self.charge_kwh,
+            "discharge_kwh": self.discharge_kwh,
+            "capacity_kwh": self.capacity_kwh,
+            "temp_hours": list(self.temp_hours),
+            "soc_hours": list(self.soc_hours),
+            "c_rate_hours": list(self.c_rate_hours),
+        }
+
+    def load_dict(self, data):
+        """
+        Restores counters from to_dict(). Histograms saved with a different
+        bin layout are ignored (they cannot be re-binned), throughput is kept.
+        """
+        self.hours = data.get("hours", 0.0)
+        self.charge_kwh = data.get("charge_kwh", 0.0)
+        self.discharge_kwh = data.get("discharge_kwh", 0.0)
+        for name, bins in (("temp_hours", TEMP_BINS), ("soc_hours", SOC_BINS), ("c_rate_hours", C_RATE_BINS)):
+            values = data.get(name)
+            if values is not None and len(values) == bins:
+                setattr(self, name, [float(v) for v in values])
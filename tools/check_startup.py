@@ -0,0 +1,148 @@
+# tools/check_startup.py
+"""
+Startup / rerun budget check for the dashboard and backend.
+
+Measures, each in a fresh interpreter:
+  1. `python -X importtime -c "import app"`  (cold import of the UI module)
+  2. `python -X importtime -c "import main"` (backend entry point)
+  3. Headless cold start: wall clock from launching `main.py --headless`
+     until it reports the service up (interpreter start-up included).
+  4. First-render and warm-rerun latency of app.py via streamlit's AppTest.
+
+Fails (exit code 1) when a tracked number exceeds its budget or when a module
+that must stay lazy shows up at import time.
+
+Usage:
+    python tools/check_startup.py            # check against STARTUP_BUDGET
+    python tools/check_startup.py --json     # also print the raw measurements
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Milliseconds. Generous enough for a laptop, tight enough to catch a heavy
+# dependency being pulled back onto the import path.
+STARTUP_BUDGET = {
+    "import_app_ms": 1500,
+    "import_main_ms": 150,
+    "headless_cold_start_ms": 200,
+    "first_render_ms": 2500,
+    "rerun_ms": 300,
+}
+
+# Modules that only specific panels/tools need; importing app or main must not load them.
+LAZY_MODULES = {
+    "app": ("pandas", "pydeck", "core.trends", "ui.trend_panel", "ui.fleet_page"),
+    "main": ("numpy", "streamlit", "pandas", "plotly", "pydeck", "app"),
+}
+HEADLESS_UP_MARKER = "Headless service up"
+
+
+def measure_import(module):
+    """
+    Runs `python -X importtime -c "import <module>"` and parses stderr.
+
+    Returns:
+        tuple: (total_ms, {module_name: cumulative_ms})
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+    )
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cumulative_us) / 1000.0
+    return cumulative.get(module, 0.0), cumulative
+
+
+def measure_headless(runs=3):
+    """
+    Median wall-clock ms from spawning `main.py --headless` to its "service
+    up" line, each run in a fresh interpreter and an empty state directory.
+    """
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
+    samples = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as state_dir:
+            t0 = time.perf_counter()
+            proc = subprocess.Popen(
+                [sys.executable, "main.py", "--headless", "--duration", "0", "--state-dir", state_dir],
+                cwd=PROJECT_ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+            )
+            for line in proc.stdout:
+                if HEADLESS_UP_MARKER in line:
+                    samples.append((time.perf_counter() - t0) * 1000)
+                    break
+            proc.stdout.close()
+            proc.wait()
+    return statistics.median(samples) if samples else float("inf")
+
+
+def measure_render():
+    """First render and one warm rerun of app.py, in a separate interpreter."""
+    script = (
+        "import json, time\n"
+        "from streamlit.testing.v1 import AppTest\n"
+        "at = AppTest.from_file('app.py', default_timeout=60)\n"
+        "t0 = time.perf_counter(); at.run(); first = time.perf_counter() - t0\n"
+        "t0 = time.perf_counter(); at.run(); rerun = time.perf_counter() - t0\n"
+        "print(json.dumps({'first_render_ms': first * 1000, 'rerun_ms': rerun * 1000,"
+        " 'exception': bool(at.exception)}))\n"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", script], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--json", action="store_true", help="print raw measurements as JSON")
+    parser.add_argument("--skip-render", action="store_true", help="only check import times")
+    args = parser.parse_args()
+
+    results, failures = {}, []
+
+    for module, lazy in LAZY_MODULES.items():
+        total_ms, cumulative = measure_import(module)
+        results[f"import_{module}_ms"] = total_ms
+        results[f"import_{module}_top"] = sorted(cumulative.items(), key=lambda kv: -kv[1])[:10]
+        leaked = [name for name in lazy if name in cumulative]
+        if leaked:
+            failures.append(f"`import {module}` eagerly loads {', '.join(leaked)}")
+
+    results["headless_cold_start_ms"] = measure_headless()
+
+    if not args.skip_render:
+        render = measure_render()
+        results.update(render)
+        if render["exception"]:
+            failures.append("app.py raised during first render")
+
+    for metric, budget in STARTUP_BUDGET.items():
+        if metric in results and results[metric] > budget:
+            failures.append(f"{metric} = {results[metric]:.0f} ms exceeds budget {budget} ms")
+
+    for metric in STARTUP_BUDGET:
+        if metric in results:
+            print(f"{metric:<22} {results[metric]:8.1f} ms   (budget {STARTUP_BUDGET[metric]} ms)")
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
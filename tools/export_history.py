@@ -0,0 +1,76 @@
+# tools/export_history.py
+"""
+Streams site history to Parquet or an Arrow IPC stream for analytics.
+
+Reads the <SITE>_historical_data.csv archives (the hand exports in the
+project root and the files the headless service appends to in the state
+directory) block by block, so exporting months of a whole fleet never
+holds more than one batch per writer in memory. Site and time filters
+are pushed down: unselected sites' files are never opened and reading
+stops at the first block past --end.
+
+Usage:
+    python tools/export_history.py history.parquet
+    python tools/export_history.py kig.arrows --sites KIG-001 \\
+        --columns solar_kw,battery_soc,sim_soc --start 2025-12-01 --end 2026-01-01
+    python tools/export_history.py fleet/ --partition-by-site --workers 8
+    python tools/export_history.py now.parquet --fleet-segment psm_1a2b3c   # live sharded fleet
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.history_export import (  # noqa: E402
+    DEFAULT_BATCH_ROWS, DEFAULT_COMPRESSION, EXPORT_FORMATS, ArchiveSource, SharedFleetSource, export_history,
+)
+from core.history_store import PROJECT_ROOT  # noqa: E402
+from core.persistence import DEFAULT_STATE_DIR  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out", help="output file (or directory with --partition-by-site)")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default=None, help="default: from the extension")
+    parser.add_argument("--sites", default="", help="comma-separated site IDs (default: all)")
+    parser.add_argument("--columns", default="", help="comma-separated columns (default: all)")
+    parser.add_argument("--start", default=None, help="inclusive, ISO-8601 or epoch seconds")
+    parser.add_argument("--end", default=None, help="inclusive, ISO-8601 or epoch seconds")
+    parser.add_argument("--archive-dir", action="append", default=None,
+                        help="where to find archives (repeatable; default: project root and state dir)")
+    parser.add_argument("--fleet-segment", default=None,
+                        help="export the current tick of a `main.py --headless --shards N` fleet instead "
+                             "(segment name: fleet_segment in the state dir heartbeat)")
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS)
+    parser.add_argument("--compression", default=DEFAULT_COMPRESSION, help="zstd, lz4, snappy (parquet), none")
+    parser.add_argument("--partition-by-site", action="store_true")
+    parser.add_argument("--workers", type=int, default=None, help="parallel site writers (default: CPU count)")
+    args = parser.parse_args()
+
+    def parse_time(value):
+        return None if value is None else (float(value) if value.replace(".", "", 1).isdigit() else value)
+
+    if args.fleet_segment:
+        source = SharedFleetSource(args.fleet_segment)
+    else:
+        source = ArchiveSource(args.archive_dir or (DEFAULT_STATE_DIR, PROJECT_ROOT))
+    t0 = time.perf_counter()
+    stats = export_history(
+        args.out, fmt=args.format, source=source,
+        site_ids=[s for s in args.sites.split(",") if s] or None,
+        columns=[c for c in args.columns.split(",") if c] or None,
+        start=parse_time(args.start), end=parse_time(args.end),
+        batch_rows=args.batch_rows,
+        compression=None if args.compression == "none" else args.compression,
+        partition_by_site=args.partition_by_site, workers=args.workers,
+    )
+    elapsed = time.perf_counter() - t0
+    print(f"{stats['rows']:,} rows -> {args.out} ({stats['files']} file(s), "
+          f"{stats['bytes'] / 1e6:.1f} MB) in {elapsed:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+# tools/load_test.py
+"""
+Local load / soak harness: N headless dashboard sessions against app.py and
+M synthetic site telemetry streams, then a capacity report.
+
+- Sites: M generated site configs (written to a temporary SKYLINE_CONFIG_DIR
+  next to the real ones), each with its own SimulationService stepping every
+  --site-tick seconds.
+- Viewers: N streamlit AppTest sessions spread over the sites (plus a
+  --fleet-fraction on the fleet page). Each one reruns every --refresh
+  seconds, like the dashboard's auto-reload. Reruns are driven from one
+  scheduler thread, so a rerun that starts late shows the node falling
+  behind the refresh interval.
+- Recorded: rerun latency and start lag percentiles, process RSS over time
+  (slope in MB/hour), session_state size per viewer (leak check), and CPU
+  per viewer (process CPU with viewers minus a telemetry-only warm-up).
+
+Usage:
+    python tools/load_test.py --sessions 20 --sites 50 --duration 300
+    python tools/load_test.py --sessions 10 --sites 10 --duration 7200 --report soak.md   # soak
+"""
+import argparse
+import json
+import os
+import pickle
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+APP_PATH = os.path.join(PROJECT_ROOT, "app.py")
+REAL_CONFIG_DIR = os.path.join(PROJECT_ROOT, "config", "sites")
+
+
+def rss_mb():
+    """Resident set size of this process (MB)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0  # peak, on platforms without /proc
+
+
+def percentiles(values, qs=(50, 95, 99)):
+    if not values:
+        return {f"p{q}": None for q in qs}
+    ordered = sorted(values)
+    return {f"p{q}": ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))] for q in qs}
+
+
+def slope_per_hour(samples):
+    """Least-squares slope of (t_seconds, value) samples, per hour."""
+    if len(samples) < 2:
+        return 0.0
+    ts = [t for t, _ in samples]
+    vs = [v for _, v in samples]
+    t_mean, v_mean = statistics.fmean(ts), statistics.fmean(vs)
+    var = sum((t - t_mean) ** 2 for t in ts)
+    if var == 0:
+        return 0.0
+    return sum((t - t_mean) * (v - v_mean) for t, v in zip(ts, vs)) / var * 3600.0
+
+
+def session_state_bytes(app_test):
+    state = app_test.session_state.to_dict()
+    try:
+        return len(pickle.dumps(state))
+    except Exception:
+        return len(repr(state))
+
+
+def prepare_sites(n_sites, config_dir):
+    """Copies the real configs and adds n_sites synthetic ones (LOAD-00000 ...)."""
+    if os.path.isdir(REAL_CONFIG_DIR):
+        for name in os.listdir(REAL_CONFIG_DIR):
+            shutil.copy(os.path.join(REAL_CONFIG_DIR, name), config_dir)
+    base = {
+        "panel_area_m2": 50, "panel_efficiency": 0.21, "panel_temp_coeff": 0.003,
+        "battery_capacity_kwh": 40, "battery_charge_eff": 0.95, "battery_thermal_coeff": 0.005,
+        "base_load_kw": 3.0,
+    }
+    site_ids = []
+    for i in range(n_sites):
+        site_id = f"LOAD-{i:05d}"
+        config = dict(base, battery_capacity_kwh=20 + (i % 7) * 10, latitude=-2.0 + (i % 50) * 0.02,
+                      longitude=29.5 + (i // 50) * 0.02)
+        with open(os.path.join(config_dir, f"{site_id}.json"), "w") as f:
+            json.dump(config, f)
+        site_ids.append(site_id)
+    return site_ids
+
+
+class Viewer:
+    """One headless dashboard session with its own rerun schedule."""
+    def __init__(self, index, site_id, fleet_view, refresh_seconds, start_at):
+        from streamlit.testing.v1 import AppTest
+        self.index = index
+        self.label = "fleet" if fleet_view else site_id
+        self.app = AppTest.from_file(APP_PATH, default_timeout=120)
+        if fleet_view:
+            self.app.query_params["view"] = "fleet"
+        else:
+            self.app.query_params["site"] = site_id
+        self.refresh_seconds = refresh_seconds
+        self.next_run = start_at
+        self.latencies = []
+        self.lags = []
+        self.errors = 0
+        self.state_bytes = []
+
+    def rerun(self, now, elapsed):
+        self.lags.append(max(0.0, now - self.next_run))
+        t0 = time.perf_counter()
+        try:
+            self.app.run()
+            if self.app.exception:
+                self.errors += 1
+        except Exception:
+            self.errors += 1
+        self.latencies.append(time.perf_counter() - t0)
+        self.state_bytes.append((elapsed, session_state_bytes(self.app)))
+        self.next_run += self.refresh_seconds
+        if self.next_run < time.monotonic():
+            self.next_run = time.monotonic()  # Missed refreshes are skipped, as in a browser
+
+
+def run(args):
+    from core.sim_service import get_service, stop_all_services
+    from utils.metrics import metrics
+
+    # Record in-process only: the services (and the app under test) would
+    # otherwise start the HTTP exporter, clashing with a dashboard on :9108
+    os.environ["SKYLINE_METRICS_PORT"] = "0"
+    metrics.enable()
+    site_ids = args.site_ids
+    services = [get_service(site_id, step_seconds=args.site_tick) for site_id in site_ids]
+    print(f"{len(services)} telemetry streams running (every {args.site_tick:g} s)")
+
+    # 1. Telemetry-only warm-up: baseline CPU without viewers
+    cpu0, t0 = time.process_time(), time.monotonic()
+    time.sleep(args.warmup)
+    baseline_cpu = (time.process_time() - cpu0) / (time.monotonic() - t0)
+
+    # 2. Viewers, staggered across one refresh interval
+    start = time.monotonic()
+    n_fleet = int(round(args.sessions * args.fleet_fraction))
+    viewers = [
+        Viewer(i, site_ids[i % len(site_ids)], i < n_fleet, args.refresh,
+               start + args.refresh * i / max(1, args.sessions))
+        for i in range(args.sessions)
+    ]
+    rss_samples = [(0.0, rss_mb())]
+    next_rss = start + args.sample_every
+    cpu0 = time.process_time()
+    end = start + args.duration
+    while True:
+        now = time.monotonic()
+        if now >= end:
+            break
+        viewer = min(viewers, key=lambda v: v.next_run)
+        if viewer.next_run > now:
+            time.sleep(min(viewer.next_run, next_rss, end) - now)
+        else:
+            viewer.rerun(now, now - start)
+        if time.monotonic() >= next_rss:
+            rss_samples.append((time.monotonic() - start, rss_mb()))
+            next_rss += args.sample_every
+            print(f"  t={time.monotonic() - start:7.0f} s  rss {rss_samples[-1][1]:7.1f} MB  "
+                  f"reruns {sum(len(v.latencies) for v in viewers):,}", flush=True)
+    wall = time.monotonic() - start
+    loaded_cpu = (time.process_time() - cpu0) / wall
+    rss_samples.append((wall, rss_mb()))
+    service_step = metrics.snapshot()["histograms"].get("sim.service_step", {})
+    stop_all_services(timeout=5)
+
+    # 3. Report
+    latencies = [x for v in viewers for x in v.latencies]
+    lags = [x for v in viewers for x in v.lags]
+    reruns = len(latencies)
+    expected = args.sessions * wall / args.refresh
+    mean_latency = statistics.fmean(latencies) if latencies else 0.0
+    viewer_cpu = max(0.0, loaded_cpu - baseline_cpu) / max(1, args.sessions)
+    state_growth = [slope_per_hour([s for s in v.state_bytes if s[0] >= 2 * args.refresh]) for v in viewers]
+    # Growth is judged after the ramp-up (first reruns import and warm caches)
+    ramp = max(2 * args.refresh, 0.1 * wall)
+    settled_rss = [sample for sample in rss_samples if sample[0] >= ramp]
+    headroom = max(0.0, 1.0 - baseline_cpu)
+    # One rerun at a time per core: viewers sustainable at this refresh interval
+    capacity = int(headroom * args.refresh / mean_latency) if mean_latency else None
+
+    return {
+        "settings": {k: getattr(args, k) for k in ("sessions", "sites", "duration", "refresh",
+                                                 "site_tick", "fleet_fraction", "warmup")},
+        "cpu_count": os.cpu_count(),
+        "wall_seconds": wall,
+        "reruns": reruns,
+        "reruns_expected": expected,
+        "rerun_errors": sum(v.errors for v in viewers),
+        "rerun_latency_s": {**percentiles(latencies), "mean": mean_latency, "max": max(latencies, default=None)},
+        "rerun_lag_s": {**percentiles(lags), "max": max(lags, default=None)},
+        "late_reruns_pct": 100.0 * sum(lag > 1.0 for lag in lags) / max(1, len(lags)),
+        "service_step_s": {k: service_step.get(k) for k in ("count", "p50_s", "p99_s", "max_s")},
+        "rss_mb": {"start": rss_samples[0][1], "end": rss_samples[-1][1], "peak": max(v for _, v in rss_samples),
+                   "slope_mb_per_hour": slope_per_hour(settled_rss)},
+        "session_state_bytes": {"max": max((b for v in viewers for _, b in v.state_bytes), default=0),
+                                "max_growth_bytes_per_hour": max(state_growth, default=0.0)},
+        "cpu": {"telemetry_only": baseline_cpu, "with_viewers": loaded_cpu, "per_viewer": viewer_cpu},
+        "estimated_capacity_viewers": capacity,
+    }
+
+
+def render_report(result):
+    s, lat, lag = result["settings"], result["rerun_latency_s"], result["rerun_lag_s"]
+    ms = lambda v: "-" if v is None else f"{v * 1e3:.1f} ms"  # noqa: E731
+    rss, cpu = result["rss_mb"], result["cpu"]
+    lines = [
+        "# Capacity report",
+        "",
+        f"{s['sessions']} viewers ({s['fleet_fraction']:.0%} on the fleet page), {s['sites']} synthetic sites "
+        f"stepping every {s['site_tick']:g} s, refresh {s['refresh']:g} s, "
+        f"{result['wall_seconds'] / 60:.1f} min on {result['cpu_count']} CPU(s).",
+        "",
+        "| Metric | Value |",
+        "|---|---|",
+        f"| Reruns (expected) | {result['reruns']:,} ({result['reruns_expected']:,.0f}) |",
+        f"| Rerun errors | {result['rerun_errors']} |",
+        f"| Rerun latency p50 / p95 / p99 / max | {ms(lat['p50'])} / {ms(lat['p95'])} / {ms(lat['p99'])} / {ms(lat['max'])} |",
+        f"| Rerun start lag p50 / p95 / p99 / max | {ms(lag['p50'])} / {ms(lag['p95'])} / {ms(lag['p99'])} / {ms(lag['max'])} |",
+        f"| Reruns starting > 1 s late | {result['late_reruns_pct']:.1f}% |",
+        f"| Service step p50 / p99 | {ms(result['service_step_s']['p50_s'])} / {ms(result['service_step_s']['p99_s'])} |",
+        f"| RSS start / end / peak | {rss['start']:.0f} / {rss['end']:.0f} / {rss['peak']:.0f} MB |",
+        f"| RSS growth after ramp-up | {rss['slope_mb_per_hour']:+.1f} MB/hour |",
+        f"| session_state max size / growth | {result['session_state_bytes']['max']:,} B / "
+        f"{result['session_state_bytes']['max_growth_bytes_per_hour']:+,.0f} B/hour |",
+        f"| CPU telemetry only / with viewers | {cpu['telemetry_only']:.1%} / {cpu['with_viewers']:.1%} of one core |",
+        f"| CPU per viewer | {cpu['per_viewer']:.2%} of one core |",
+        f"| Estimated viewers per core at this refresh | {result['estimated_capacity_viewers']} |",
+        "",
+    ]
+    if result["late_reruns_pct"] > 5:
+        lines.append("**Reruns are falling behind the refresh interval: the node is over capacity.**")
+    if result["session_state_bytes"]["max_growth_bytes_per_hour"] > 10_000:
+        lines.append("**session_state keeps growing: possible per-session leak.**")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=10, help="simulated dashboard viewers (N)")
+    parser.add_argument("--sites", type=int, default=20, help="synthetic site telemetry streams (M)")
+    parser.add_argument("--duration", type=float, default=300.0, help="seconds with viewers attached")
+    parser.add_argument("--refresh", type=float, default=10.0, help="viewer rerun interval (s)")
+    parser.add_argument("--site-tick", type=float, default=10.0, help="telemetry step interval (s)")
+    parser.add_argument("--fleet-fraction", type=float, default=0.1, help="share of viewers on the fleet page")
+    parser.add_argument("--warmup", type=float, default=15.0, help="telemetry-only baseline (s)")
+    parser.add_argument("--sample-every", type=float, default=30.0, help="RSS sampling interval (s)")
+    parser.add_argument("--report", default="capacity_report.md")
+    parser.add_argument("--json", default=None, help="also write raw results as JSON")
+    args = parser.parse_args()
+
+    config_dir = tempfile.mkdtemp(prefix="skyline-load-")
+    try:
+        args.site_ids = prepare_sites(args.sites, config_dir)
+        os.environ["SKYLINE_CONFIG_DIR"] = config_dir  # Before core.config_manager is imported
+        result = run(args)
+    finally:
+        shutil.rmtree(config_dir, ignore_errors=True)
+
+    report = render_report(result)
+    with open(args.report, "w", encoding="utf-8") as f:
+        f.write(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+# tools/sizing_study.py
+"""
+PV / battery sizing study: sweeps panel area x battery capacity x charge
+efficiency over a multi-year irradiance/load history.
+
+Every configuration is one twin of a BatchSimulation; the grid is split into
+chunks that run on a process pool, and each chunk's rows are appended to the
+output CSV as soon as it finishes.
+
+Usage:
+    python tools/sizing_study.py --years 5 --panel-area 20:120:50 --capacity 10:100:50
+    python tools/sizing_study.py --history KIG-001_historical_data.csv --years 5 \\
+        --charge-eff 0.90,0.95 --out sizing_kig.csv
+
+Grid axes accept "start:stop:num" (inclusive linspace) or a comma list.
+Without --history, a synthetic history is built from the site's irradiance
+and load profile models with day-to-day cloud and demand variation.
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.batch_sim import BatchSimulation  # noqa: E402
+from core.history_store import HistoryStore  # noqa: E402
+from core.config_manager import UnknownSiteError, site_configs  # noqa: E402
+from physics.load import LoadModel  # noqa: E402
+from physics.solar import expected_irradiance  # noqa: E402
+
+EOL_SOH = 80.0
+RESULT_COLUMNS = (
+    "panel_area_m2", "battery_capacity_kwh", "battery_charge_eff",
+    "load_kwh", "solar_kwh", "unmet_kwh", "unmet_pct", "curtailed_kwh", "curtailed_pct",
+    "equivalent_full_cycles", "final_soh", "years_to_eol",
+)
+
+
+def parse_axis(spec):
+    """'start:stop:num' -> inclusive linspace, 'a,b,c' -> list."""
+    if ":" in spec:
+        start, stop, num = spec.split(":")
+        return np.linspace(float(start), float(stop), int(num))
+    return np.array([float(v) for v in spec.split(",")])
+
+
+# --- 1. Input history ---
+def synthetic_history(site_params, years, step_seconds, seed=0):
+    """Profile-model history with daily cloudiness and demand variation."""
+    rng = np.random.default_rng(seed)
+    steps_per_day = int(86400 // step_seconds)
+    n_days = int(round(years * 365))
+    hours = (np.arange(steps_per_day) * step_seconds / 3600.0) % 24
+
+    clear_sky = expected_irradiance(hours)
+    demand = LoadModel(base_load_kw=site_params["base_load_kw"]).expected_demand(hours)
+    cloudiness = np.clip(rng.normal(0.85, 0.2, (n_days, 1)), 0.1, 1.1)
+    irradiance = clear_sky[None, :] * cloudiness
+    load = demand[None, :] * (1 + rng.uniform(-0.2, 0.3, (n_days, steps_per_day)))
+    day_of_year = np.arange(n_days)[:, None] % 365
+    ambient = 25 + 3 * np.sin(2 * np.pi * day_of_year / 365) + 4 * np.sin(2 * np.pi * (hours[None, :] - 9) / 24)
+    return {
+        "irradiance": irradiance.ravel(),
+        "load_kw": load.ravel(),
+        "ambient_temp": ambient.ravel(),
+    }
+
+
+def history_from_csv(paths, years, step_seconds):
+    """
+    Resamples recorded history to step_seconds bins (bin means), then tiles it
+    to cover `years` if the recording is shorter.
+    """
+    store = HistoryStore()
+    for path in paths:
+        store.load_csv(path, "study")
+    data = store.query("study", columns=("irradiance", "load_kw", "ambient_temp"))
+    t = data["timestamp"]
+    if len(t) == 0:
+        raise SystemExit("history files contain no samples")
+
+    bins = ((t - t[0]) // step_seconds).astype(np.int64)
+    counts = np.bincount(bins)
+    keep = counts > 0
+    profile = {}
+    for name in ("irradiance", "load_kw", "ambient_temp"):
+        values = np.nan_to_num(np.asarray(data[name], dtype=np.float64), nan=0.0 if name != "ambient_temp" else 25.0)
+        profile[name] = (np.bincount(bins, weights=values) / np.maximum(counts, 1))[keep]
+
+    n_steps = int(years * 365 * 86400 // step_seconds)
+    reps = -(-n_steps // len(profile["irradiance"]))
+    return {name: np.tile(values, reps)[:n_steps] for name, values in profile.items()}
+
+
+# --- 2. Worker ---
+_HISTORY = None
+_STEP_SECONDS = None
+_SITE = None
+
+
+def _init_worker(history, step_seconds, site_params):
+    global _HISTORY, _STEP_SECONDS, _SITE
+    _HISTORY, _STEP_SECONDS, _SITE = history, step_seconds, site_params
+
+
+def run_chunk(configs):
+    """
+    Simulates one chunk of configurations over the whole history.
+
+    Args:
+        configs (np.ndarray): (N, 3) rows of panel_area_m2, battery_capacity_kwh,
+                              battery_charge_eff.
+
+    Returns:
+        list[tuple]: One RESULT_COLUMNS row per configuration.
+    """
+    irradiance, load, ambient = _HISTORY["irradiance"], _HISTORY["load_kw"], _HISTORY["ambient_temp"]
+    sim = BatchSimulation(
+        panel_area_m2=configs[:, 0],
+        panel_efficiency=_SITE["panel_efficiency"],
+        panel_temp_coeff=_SITE["panel_temp_coeff"],
+        battery_capacity_kwh=configs[:, 1],
+        battery_charge_eff=configs[:, 2],
+        battery_thermal_coeff=_SITE["battery_thermal_coeff"],
+        initial_soc=50.0,
+        initial_temp=float(ambient[0]),
+    )
+    solar_kwh = np.zeros(sim.size)
+    for t in range(len(irradiance)):
+        solar_kwh += sim.step(_STEP_SECONDS, irradiance[t], ambient[t], load[t])["sim_solar_kw"]
+    dt_hours = _STEP_SECONDS / 3600.0
+    solar_kwh *= dt_hours
+
+    years = len(irradiance) * _STEP_SECONDS / (365 * 86400)
+    load_kwh = float(load.sum() * dt_hours)
+    soh_lost = 100.0 - sim.soh
+    years_to_eol = np.where(soh_lost > 0, years * (100.0 - EOL_SOH) / np.maximum(soh_lost, 1e-12), np.inf)
+    return list(zip(
+        configs[:, 0].tolist(), configs[:, 1].tolist(), configs[:, 2].tolist(),
+        [load_kwh] * sim.size, solar_kwh.tolist(),
+        sim.unmet_kwh.tolist(), (100 * sim.unmet_kwh / load_kwh).tolist(),
+        sim.curtailed_kwh.tolist(), (100 * sim.curtailed_kwh / np.maximum(solar_kwh, 1e-12)).tolist(),
+        sim.equivalent_full_cycles().tolist(), sim.soh.tolist(), years_to_eol.tolist(),
+    ))
+
+
+# --- 3. Driver ---
+def run_study(history, step_seconds, site_params, configs, out_path, chunk_size=256, max_workers=None):
+    """
+    Runs every configuration and streams rows to out_path (CSV) as chunks finish.
+
+    Returns:
+        int: Number of configurations written.
+    """
+    chunks = [configs[i:i + chunk_size] for i in range(0, len(configs), chunk_size)]
+    max_workers = max_workers or os.cpu_count() or 1
+    written = 0
+    with open(out_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(RESULT_COLUMNS)
+        f.flush()
+
+        def emit(rows):
+            nonlocal written
+            writer.writerows(rows)
+            f.flush()
+            written += len(rows)
+            print(f"  {written:,}/{len(configs):,} configurations", end="\r", flush=True)
+
+        if max_workers == 1:
+            _init_worker(history, step_seconds, site_params)
+            for chunk in chunks:
+                emit(run_chunk(chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                     initargs=(history, step_seconds, site_params)) as pool:
+                for future in as_completed([pool.submit(run_chunk, chunk) for chunk in chunks]):
+                    emit(future.result())
+    print()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--site", default="KIG-001", help="site config supplying the fixed parameters")
+    parser.add_argument("--history", nargs="*", default=None, help="<SITE>_historical_data.csv files")
+    parser.add_argument("--years", type=float, default=5.0)
+    parser.add_argument("--step-minutes", type=float, default=60.0)
+    parser.add_argument("--panel-area", default="20:120:50", help="m^2")
+    parser.add_argument("--capacity", default="10:100:50", help="kWh")
+    parser.add_argument("--charge-eff", default="0.95")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="sizing_study.csv")
+    args = parser.parse_args()
+
+    try:
+        site_params = dict(site_configs.get(args.site))
+    except UnknownSiteError:
+        raise SystemExit(f"unknown site {args.site!r}; known: {', '.join(site_configs.site_ids())}")
+    step_seconds = args.step_minutes * 60.0
+
+    t0 = time.perf_counter()
+    if args.history:
+        history = history_from_csv(args.history, args.years, step_seconds)
+    else:
+        history = synthetic_history(site_params, args.years, step_seconds, seed=args.seed)
+    grid = np.meshgrid(parse_axis(args.panel_area), parse_axis(args.capacity), parse_axis(args.charge_eff),
+                       indexing="ij")
+    configs = np.column_stack([axis.ravel() for axis in grid])
+    print(f"{len(configs):,} configurations x {len(history['irradiance']):,} steps "
+          f"({args.years:g} years at {args.step_minutes:g} min), history built in {time.perf_counter() - t0:.2f} s")
+
+    t0 = time.perf_counter()
+    written = run_study(history, step_seconds, site_params, configs, args.out,
+                        chunk_size=args.chunk_size, max_workers=args.workers)
+    print(f"wrote {written:,} rows to {args.out} in {time.perf_counter() - t0:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
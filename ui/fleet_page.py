@@ -0,0 +1,125 @@
+# ui/fleet_page.py
+
+import os
+import time
+
+import numpy as np
+import streamlit as st
+
+from core.fleet import SORTABLE_COLUMNS, SYSTEM_STATES, fleet, seed_demo_fleet
+from core.config_manager import ConfigError, UnknownSiteError
+from core.persistence import DEFAULT_STATE_DIR, StateStore
+from core.service_client import get_client
+
+PAGE_SIZE_OPTIONS = (25, 50, 100, 250)
+TABLE_COLUMNS = ("site_id", "system_state", "sim_soc", "sim_soh", "sim_temp", "sim_net_kw", "insight")
+
+
+def _refresh_headless_sites(state_dir=DEFAULT_STATE_DIR):
+    """
+    Pulls the latest snapshot of every site the headless service runs into the
+    fleet table (file reads, no threads). In-process twins already publish to
+    the fleet table themselves; none are started just to fill this page.
+    """
+    for site_id in StateStore(state_dir).live_sites():
+        try:
+            get_client(site_id, state_dir).snapshot()
+        except (UnknownSiteError, ConfigError):
+            continue  # Served headless but unknown or broken here; its own page reports why
+
+
+@st.cache_resource
+def _seed_demo_sites(n_sites):
+    """Populates synthetic sites once per process (SKYLINE_DEMO_SITES)."""
+    return seed_demo_fleet(fleet, n_sites) if n_sites > 0 else []
+
+
+def _soc_color(soc):
+    # red (empty) -> cyan (full), RGBA for pydeck
+    frac = soc.clip(0, 100) / 100.0
+    return [[int(255 * (1 - f)), int(242 * f), int(255 * f), 180] for f in frac]
+
+
+def render_fleet_page():
+    """
+    Fleet overview: filterable, sortable, paginated table + map of every site.
+    Filtering, sorting and paging run server-side in FleetState.query; only the
+    current page is sent to the (virtualized) table.
+    """
+    _refresh_headless_sites()
+    _seed_demo_sites(int(os.environ.get("SKYLINE_DEMO_SITES", "0")))
+
+    st.markdown("<h1>Fleet Overview</h1>", unsafe_allow_html=True)
+
+    # 1. Controls
+    f1, f2, f3, f4 = st.columns([2, 2, 1, 1])
+    states = f1.multiselect("State", SYSTEM_STATES, default=list(SYSTEM_STATES), key="fleet_states")
+    soc_range = f2.slider("SOC (%)", 0.0, 100.0, (0.0, 100.0), key="fleet_soc")
+    soh_max = f3.number_input("SOH ≤", 0.0, 100.0, 100.0, key="fleet_soh")
+    site_prefix = f4.text_input("Site ID", key="fleet_prefix")
+
+    s1, s2, s3, s4 = st.columns([2, 1, 1, 1])
+    sort_by = s1.selectbox("Sort by", SORTABLE_COLUMNS, key="fleet_sort")
+    descending = s2.toggle("Descending", key="fleet_desc")
+    only_insights = s3.toggle("Active insights only", key="fleet_insights")
+    page_size = s4.selectbox("Rows / page", PAGE_SIZE_OPTIONS, index=1, key="fleet_page_size")
+
+    # 2. One vectorized query
+    t0 = time.perf_counter()
+    result = fleet.query(
+        sort_by=sort_by, descending=descending, states=states, soc_range=soc_range,
+        soh_max=soh_max, with_insight=True if only_insights else None,
+        site_prefix=site_prefix.strip() or None,
+        page=st.session_state.get("fleet_page", 0), page_size=page_size,
+    )
+    query_ms = (time.perf_counter() - t0) * 1000.0
+
+    total = result["total"]
+    n_pages = max(1, -(-total // page_size))
+    page = min(st.session_state.get("fleet_page", 0), n_pages - 1)
+    if page != st.session_state.get("fleet_page", 0):
+        st.session_state.fleet_page = page
+        st.rerun()
+
+    # 3. Table (current page only)
+    rows = result["rows"]
+    table = {col: rows[col] for col in TABLE_COLUMNS}
+    event = st.dataframe(
+        table, hide_index=True, width="stretch",
+        on_select="rerun", selection_mode="single-row", key="fleet_table",
+    )
+    selected = event.selection.rows if event is not None else []
+    if selected:
+        st.query_params.update(view="site", site=str(rows["site_id"][selected[0]]))
+        st.rerun()
+
+    p1, p2, p3 = st.columns([1, 2, 1])
+    if p1.button("◀ Prev", disabled=page == 0):
+        st.session_state.fleet_page = page - 1
+        st.rerun()
+    p2.caption(f"Page {page + 1} / {n_pages} · {total:,} of {fleet.size:,} sites · query {query_ms:.1f} ms")
+    if p3.button("Next ▶", disabled=page >= n_pages - 1):
+        st.session_state.fleet_page = page + 1
+        st.rerun()
+
+    # 4. Map of every matching site
+    import pydeck as pdk  # Only the fleet page needs pydeck
+
+    located = fleet.locations(result["matched_index"])
+    mask = np.isfinite(located["latitude"]) & np.isfinite(located["longitude"])
+    points = [
+        {"site_id": s, "lat": float(lat), "lon": float(lon), "soc": float(soc), "color": color}
+        for s, lat, lon, soc, color in zip(
+            located["site_id"][mask], located["latitude"][mask], located["longitude"][mask],
+            located["sim_soc"][mask], _soc_color(located["sim_soc"][mask]),
+        )
+    ]
+    st.pydeck_chart(pdk.Deck(
+        map_style=None,
+        initial_view_state=pdk.ViewState(latitude=-1.95, longitude=29.9, zoom=7),
+        layers=[pdk.Layer(
+            "ScatterplotLayer", data=points, get_position="[lon, lat]",
+            get_fill_color="color", get_radius=1500, pickable=True,
+        )],
+        tooltip={"text": "{site_id}\nSOC {soc}%"},
+    ))
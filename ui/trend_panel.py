@@ -0,0 +1,62 @@
+# ui/trend_panel.py
+
+import time
+from datetime import datetime
+
+import streamlit as st
+
+from core.trends import TREND_RANGES, get_trend_payload
+
+
+def _to_datetimes(epoch_seconds):
+    return [datetime.fromtimestamp(t) for t in epoch_seconds]
+
+
+def render_trend_panel(site_id):
+    """
+    Trend charts for SOC, solar, load, battery temperature and SOH.
+    Series are resampled server-side (core.trends) before anything is
+    sent to the browser; payload size and render time are shown per chart.
+    """
+    import plotly.graph_objects as go  # Only this panel needs plotly
+
+    st.markdown('<p class="label-text">Trends</p>', unsafe_allow_html=True)
+    c_range, c_width = st.columns([3, 1])
+    range_key = c_range.radio("Range", list(TREND_RANGES), index=1, horizontal=True, key="trend_range")
+    width_px = c_width.number_input("Point budget (px)", min_value=100, max_value=4000, value=1200, step=100, key="trend_width")
+
+    payload, stats = get_trend_payload(site_id, range_key, width_px)
+    if payload["raw_points"] == 0:
+        st.caption("No history recorded for this site yet.")
+        return
+
+    for label, series in payload["signals"].items():
+        t0 = time.perf_counter()
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=_to_datetimes(series["env_x"]), y=series["env_max"],
+            mode="lines", line=dict(width=0), hoverinfo="skip", showlegend=False,
+        ))
+        fig.add_trace(go.Scatter(
+            x=_to_datetimes(series["env_x"]), y=series["env_min"],
+            mode="lines", line=dict(width=0), fill="tonexty",
+            fillcolor="rgba(0, 242, 255, 0.12)", hoverinfo="skip", showlegend=False,
+        ))
+        fig.add_trace(go.Scatter(
+            x=_to_datetimes(series["x"]), y=series["y"],
+            mode="lines", line=dict(color="#00f2ff", width=1.5), name=label,
+        ))
+        fig.update_layout(
+            title=label, height=240, margin=dict(l=10, r=10, t=35, b=10),
+            paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)",
+            font=dict(color="#e2e8f0"), showlegend=False,
+        )
+        payload_bytes = len(fig.to_json())
+        st.plotly_chart(fig, width="stretch")
+        render_ms = (time.perf_counter() - t0) * 1000.0
+
+        st.caption(
+            f"{payload['raw_points']:,} raw → {len(series['x']):,} pts "
+            f"(+{len(series['env_x']):,} envelope) · payload {payload_bytes / 1024:.1f} KiB · "
+            f"render {render_ms:.1f} ms · downsample {stats['compute_ms']:.1f} ms"
+        )
@@ -1,74 +1,143 @@
 # utils/InsightEngine.py
+from collections import namedtuple
+
+import numpy as np
+
+from utils.metrics import metrics as perf_metrics
+
+# --- 1. THE RULE TABLE ---
+# Ordered from most critical to least: the first rule whose condition holds wins.
+# Conditions only use comparisons and &, so the same expression works on
+# scalars (one site) and on NumPy columns (a fleet or a historical replay).
+InsightRule = namedtuple("InsightRule", ["code", "message", "condition", "active"])
+
+INSIGHT_RULES = (
+    # Rule 1: Thermal Stress (Temp 5°C above ambient under high power transfer)
+    InsightRule(
+        "THERMAL_STRESS",
+        "Battery operating at elevated temperature under high power transfer, suggesting potential thermal stress.",
+        lambda c: (c["sim_temp"] > c["ambient_temp"] + 5) & (c["sim_net_kw"] > 5),
+        True,
+    ),
+    # Rule 2: Charging Efficiency (High sun but battery is near flat charge/discharge)
+    # Note: Requires history, but we use a proxy for now.
+    InsightRule(
+        "LOW_CHARGE_ACCEPTANCE",
+        "High solar irradiance detected, but net power flow is minimal, check battery charge acceptance or site load balance.",
+        lambda c: (c["irradiance"] > 700) & (c["sim_net_kw"] < 0.5) & (c["sim_net_kw"] > -0.5) & (c["sim_soc"] < 95),
+        True,
+    ),
+    # Rule 3: Deep Discharge Warning (SOC is low and still discharging)
+    InsightRule(
+        "DEEP_DISCHARGE",
+        "Critical: Battery SOC is below 20% and still discharging. Grid support or load shedding may be required.",
+        lambda c: (c["sim_soc"] < 20) & (c["sim_net_kw"] < 0),
+        True,
+    ),
+    # Rule 4: High Discharge Warning (SOC is healthy but discharging fast)
+    InsightRule(
+        "HIGH_DISCHARGE",
+        "High load demand requires rapid discharge, closely monitor discharge rate and battery temperature.",
+        lambda c: (c["sim_soc"] >= 20) & (c["sim_net_kw"] < -5),
+        True,
+    ),
+    # Rule 5: Stable State (If nothing critical is happening)
+    InsightRule(
+        "EFFICIENT",
+        "System is operating efficiently, with stable charge levels and low thermal variance.",
+        lambda c: (c["irradiance"] > 10) & (c["sim_soc"] > 30) & (c["sim_temp"] < c["ambient_temp"] + 3),
+        False,
+    ),
+    InsightRule(
+        "NOMINAL",
+        "System status is nominal. No immediate physics-driven warnings detected.",
+        lambda c: True,
+        False,
+    ),
+)
+
+INSIGHT_CODES = tuple(rule.code for rule in INSIGHT_RULES)
+INSIGHT_MESSAGES = tuple(rule.message for rule in INSIGHT_RULES)
+ACTIVE_INSIGHT_CODES = tuple(i for i, rule in enumerate(INSIGHT_RULES) if rule.active)
+
+# Inputs and the defaults used when a value is missing
+INSIGHT_INPUTS = {
+    "sim_net_kw": 0.0,
+    "sim_soc": 0.0,
+    "sim_temp": 0.0,
+    "ambient_temp": 25.0,
+    "irradiance": 0.0,
+}
+
+_BATCH_CHUNK_ROWS = 1 << 20
+
 
 def generate_insights(sim_state, initial_state):
     """
     Translates simulation results and contextual data into professional,
     physics-grounded qualitative insights.
-    
+
     Args:
         sim_state (dict): The dictionary returned by SimulationCore.run_step().
         initial_state (dict): The dictionary containing initial and time-series data
                               (like ambient_temp, irradiance, load_kw).
-    
+
     Returns:
         str: A single actionable system insight sentence.
     """
-    
-    insights = []
-    
-    # 1. Gather Key Metrics and Trends (Simplified for first launch)
-    
-    # Use the simulation's net power to determine charge/discharge direction
-    net_power = sim_state.get("sim_net_kw", 0.0)
-    
-    # Use the simulated SOC and Temp for directional insights
-    sim_soc = sim_state.get("sim_soc", 0.0)
-    sim_temp = sim_state.get("sim_temp", 0.0)
-    
-    # Use the ambient data for context
-    ambient_temp = initial_state.get("ambient_temp", 25.0)
-    irradiance = initial_state.get("irradiance", 0.0)
-    
-    
-    # 2. Apply Logic Rules (The 'Grammar' of the system)
-    
-    # Rule 1: Thermal Stress (Temp is high relative to environment and power flow is high)
-    if sim_temp > ambient_temp + 5 and net_power > 5: # Temp 5°C above ambient under high power
-        insights.append(
-            "Battery operating at elevated temperature under high power transfer, suggesting potential thermal stress."
-        )
-
-    # Rule 2: Charging Efficiency (High solar but little SOC change)
-    # Note: Requires history, but we use a proxy for now.
-    if irradiance > 700 and net_power < 0.5 and net_power > -0.5 and sim_soc < 95: # High sun but battery is near flat charge/discharge
-        insights.append(
-            "High solar irradiance detected, but net power flow is minimal, check battery charge acceptance or site load balance."
-        )
+    t0 = perf_metrics.start_sampled()
 
-    # Rule 3: Deep Discharge Warning (SOC is low and still discharging)
-    if sim_soc < 20 and net_power < 0:
-        insights.append(
-            "Critical: Battery SOC is below 20% and still discharging. Grid support or load shedding may be required."
-        )
-    
-    # Rule 4: High Discharge Warning (SOC is healthy but discharging fast)
-    elif sim_soc >= 20 and net_power < -5: # Discharging at high power
-        insights.append(
-            "High load demand requires rapid discharge, closely monitor discharge rate and battery temperature."
-        )
-        
-    # Rule 5: Stable State (If nothing critical is happening)
-    if not insights:
-        # Check if the system is running well
-        if irradiance > 10 and sim_soc > 30 and sim_temp < ambient_temp + 3:
-             insights.append(
-                "System is operating efficiently, with stable charge levels and low thermal variance."
-            )
-        else:
-             insights.append(
-                "System status is nominal. No immediate physics-driven warnings detected."
-            )
-            
-    # 3. Return the single, most relevant insight (the first one generated)
-    # For now, the rules are ordered from most critical to least.
-    return insights[0]
\ No newline at end of file
+    # 1. Gather Key Metrics (twin output from sim_state, context from initial_state)
+    metrics = {
+        "sim_net_kw": sim_state.get("sim_net_kw", 0.0),
+        "sim_soc": sim_state.get("sim_soc", 0.0),
+        "sim_temp": sim_state.get("sim_temp", 0.0),
+        "ambient_temp": initial_state.get("ambient_temp", 25.0),
+        "irradiance": initial_state.get("irradiance", 0.0),
+    }
+
+    # 2. Return the single, most relevant insight (first matching rule)
+    message = next(rule.message for rule in INSIGHT_RULES if rule.condition(metrics))
+    perf_metrics.stop("insights.generate", t0)
+    return message
+
+
+def generate_insight_codes(columns):
+    """
+    Vectorized generate_insights over columnar state arrays.
+
+    Every rule condition is evaluated as one boolean mask over the whole
+    column set and np.select keeps the first (highest-priority) match per row,
+    so the result equals calling generate_insights row by row.
+
+    Args:
+        columns (dict | DataFrame): Arrays for sim_soc, sim_temp, sim_net_kw,
+                                    ambient_temp and irradiance (missing
+                                    columns use the scalar defaults).
+
+    Returns:
+        np.ndarray: int8 index into INSIGHT_RULES / INSIGHT_MESSAGES per row.
+    """
+    present = [name for name in INSIGHT_INPUTS if name in columns]
+    if not present:
+        raise ValueError(f"generate_insight_codes needs at least one of {list(INSIGHT_INPUTS)}")
+    n_rows = len(columns[present[0]])
+    arrays = {
+        name: np.asarray(columns[name], dtype=np.float64) if name in columns else np.full(n_rows, default)
+        for name, default in INSIGHT_INPUTS.items()
+    }
+
+    # Chunked so the temporary masks stay cache- and memory-friendly on 10M+ rows
+    codes = np.empty(n_rows, dtype=np.int8)
+    choices = np.arange(len(INSIGHT_RULES) - 1, dtype=np.int8)
+    fallback = len(INSIGHT_RULES) - 1
+    for start in range(0, n_rows, _BATCH_CHUNK_ROWS):
+        chunk = {name: arr[start:start + _BATCH_CHUNK_ROWS] for name, arr in arrays.items()}
+        masks = [rule.condition(chunk) for rule in INSIGHT_RULES[:-1]]
+        codes[start:start + _BATCH_CHUNK_ROWS] = np.select(masks, choices, default=fallback)
+    return codes
+
+
+def generate_insights_batch(columns):
+    """Like generate_insight_codes, but returns the insight sentences (object array)."""
+    return np.asarray(INSIGHT_MESSAGES, dtype=object)[generate_insight_codes(columns)]
@@ -0,0 +1,265 @@
+# utils/anomaly.py
+import math
+from collections import deque
+
+import numpy as np
+
+# Measured column -> twin column, with the smallest residual std the model
+# assumes (sigma floor) and the divergence scale: a residual of
+# 4 x divergence_scale scores 4 even if it has persisted for hours.
+RESIDUAL_CHANNELS = (
+    # (name, measured, simulated, sigma_floor, divergence_scale)
+    ("soc", "battery_soc", "sim_soc", 0.5, 0.5),
+    ("solar", "solar_kw", "sim_solar_kw", 0.2, 0.3),
+    ("load", "load_kw", "sim_load_kw", 0.2, 0.3),
+)
+CHANNEL_NAMES = tuple(channel[0] for channel in RESIDUAL_CHANNELS)
+RESIDUAL_COLUMNS = tuple(col for channel in RESIDUAL_CHANNELS for col in channel[1:3])
+
+DEFAULT_ALPHA = 0.02          # EWMA weight per sample (~50-sample memory)
+DEFAULT_THRESHOLD = 4.0       # Score above which a sample is anomalous
+DEFAULT_WARMUP = 10           # Samples before a site's model is trusted
+
+
+def ewm(x, alpha, initial):
+    """
+    Vectorized EWMA along the last axis: y[t] = (1 - alpha) * y[t-1] + alpha * x[t].
+
+    Uses the closed form inside blocks short enough that the (1 - alpha)^-k
+    scaling stays well conditioned, so only one Python iteration runs per
+    block instead of per sample. Works on 1-D series or 2-D [site, time].
+
+    Args:
+        x (np.ndarray): Input series.
+        alpha (float): Smoothing weight in (0, 1].
+        initial (float | np.ndarray): y[-1] (per row for 2-D input).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    out = np.empty_like(x)
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        out[...] = x
+        return out
+    n = x.shape[-1]
+    block = min(n, max(1, int(10.0 / -math.log(decay))))
+    k = np.arange(block, dtype=np.float64)
+    up = decay ** -k                              # (1-a)^-j
+    scale = alpha * decay ** k                    # a * (1-a)^k
+    down = decay ** (k + 1)                       # (1-a)^(k+1)
+
+    prev = np.asarray(initial, dtype=np.float64)
+    for start in range(0, n, block):
+        stop = min(n, start + block)
+        m = stop - start
+        acc = np.cumsum(x[..., start:stop] * up[:m], axis=-1)
+        acc *= scale[:m]
+        acc += prev[..., None] * down[:m] if np.ndim(prev) else prev * down[:m]
+        out[..., start:stop] = acc
+        prev = acc[..., -1]
+    return out
+
+
+def score_history(columns, alpha=DEFAULT_ALPHA, warmup=DEFAULT_WARMUP):
+    """
+    Batch residual scoring over a full history (one site), fully vectorized.
+
+    For every channel the residual r = measured - simulated is tracked with an
+    EWMA mean and EW variance. Each sample is scored against the model as it
+    stood *before* that sample (same as the online detector), as the larger of
+      - the innovation z-score |r - mean| / sigma (sudden change), and
+      - the divergence score |r| / divergence_scale (twin and measurement
+        disagree, however long it has been going on).
+
+    Args:
+        columns (dict): Arrays for the measured/simulated columns in RESIDUAL_CHANNELS.
+
+    Returns:
+        dict: {"score": array, "channel": int array (index into CHANNEL_NAMES),
+               "residuals": {name: array}}
+    """
+    n = len(next(iter(columns.values())))
+    n_channels = len(RESIDUAL_CHANNELS)
+    r = np.zeros((n_channels, n))
+    residuals = {}
+    for i, (name, measured, simulated, _, _) in enumerate(RESIDUAL_CHANNELS):
+        if measured in columns and simulated in columns:
+            diff = np.asarray(columns[measured], dtype=np.float64) - np.asarray(columns[simulated], dtype=np.float64)
+            r[i] = np.where(np.isfinite(diff), diff, 0.0)
+            residuals[name] = r[i]
+    if n == 0:
+        return {"score": np.zeros(0), "channel": np.zeros(0, dtype=np.int64), "residuals": residuals}
+
+    # All channels advance together as one [channel, time] recurrence
+    sigma_floor = np.array([channel[3] for channel in RESIDUAL_CHANNELS])[:, None]
+    divergence_scale = np.array([channel[4] for channel in RESIDUAL_CHANNELS])[:, None]
+
+    mean = ewm(r, alpha, r[:, 0])
+    prior_mean = np.concatenate((r[:, :1], mean[:, :-1]), axis=1)
+    innovation = r - prior_mean
+    # West's EW variance: var_t = (1-a) * (var_{t-1} + a * d_t^2)
+    var = ewm((1.0 - alpha) * innovation ** 2, alpha, np.zeros(n_channels))
+    prior_var = np.concatenate((np.zeros((n_channels, 1)), var[:, :-1]), axis=1)
+
+    z = np.abs(innovation) / np.sqrt(prior_var + sigma_floor ** 2)
+    stacked = np.maximum(z, np.abs(r) / divergence_scale)
+    stacked[:, :warmup] = 0.0
+    return {"score": stacked.max(axis=0), "channel": stacked.argmax(axis=0), "residuals": residuals}
+
+
+def find_anomaly_windows(timestamps, scores, channels, threshold=DEFAULT_THRESHOLD, max_gap=3):
+    """
+    Groups anomalous samples into windows and ranks them by severity.
+
+    Samples above `threshold` that are at most `max_gap` samples apart belong
+    to the same window. Severity is the summed excess score over the window,
+    so long moderate divergences rank alongside short sharp ones.
+
+    Returns:
+        list[dict]: Windows sorted by severity (highest first).
+    """
+    timestamps = np.asarray(timestamps)
+    scores = np.asarray(scores)
+    flagged = np.flatnonzero(scores > threshold)
+    if len(flagged) == 0:
+        return []
+
+    # Window boundaries where the gap between flagged samples is too large
+    breaks = np.flatnonzero(np.diff(flagged) > max_gap + 1)
+    first = flagged[np.concatenate(([0], breaks + 1))]
+    last = flagged[np.concatenate((breaks, [len(flagged) - 1]))]
+
+    excess = np.where(scores > threshold, scores - threshold, 0.0)
+    cum_excess = np.concatenate(([0.0], np.cumsum(excess)))
+    severity = cum_excess[last + 1] - cum_excess[first]
+    peak_idx = np.array([f + int(np.argmax(scores[f:l + 1])) for f, l in zip(first, last)])
+
+    order = np.argsort(-severity, kind="stable")
+    return [
+        {
+            "start": timestamps[first[i]],
+            "end": timestamps[last[i]],
+            "samples": int(last[i] - first[i] + 1),
+            "peak_score": float(scores[peak_idx[i]]),
+            "peak_at": timestamps[peak_idx[i]],
+            "channel": CHANNEL_NAMES[int(channels[peak_idx[i]])],
+            "severity": float(severity[i]),
+        }
+        for i in order
+    ]
+
+
+def scan_history(store, site_ids=None, start=None, end=None, threshold=DEFAULT_THRESHOLD, **score_kwargs):
+    """
+    Scores every site in a HistoryStore and returns the fleet's anomaly windows,
+    ranked by severity. Sites are processed one at a time (bounded memory).
+    """
+    site_ids = store.site_ids() if site_ids is None else site_ids
+    needed = list(RESIDUAL_COLUMNS)
+    windows = []
+    for site_id in site_ids:
+        data = store.query(site_id, columns=needed, start=start, end=end)
+        if len(data["timestamp"]) == 0:
+            continue
+        scored = score_history(data, **score_kwargs)
+        for window in find_anomaly_windows(data["timestamp"], scored["score"], scored["channel"], threshold):
+            window["site_id"] = site_id
+            windows.append(window)
+    windows.sort(key=lambda w: -w["severity"])
+    return windows
+
+
+class ResidualAnomalyDetector:
+    """
+    Online version of score_history: per-site EWMA residual models updated
+    incrementally (O(1) per sample), producing the same scores as the batch
+    path over the same data. Anomalous runs are grouped into windows that are
+    emitted once they close.
+
+    Each site's state is only touched by the thread that steps that site
+    (its SimulationService), so updates take no lock; models are plain
+    float lists because per-sample NumPy scalar access costs more than the
+    arithmetic.
+    """
+    def __init__(self, alpha=DEFAULT_ALPHA, threshold=DEFAULT_THRESHOLD,
+                 warmup=DEFAULT_WARMUP, max_gap=3, max_windows=1000):
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.max_gap = max_gap
+        self.sites = {}
+        self.closed_windows = deque(maxlen=max_windows)
+
+    def _state(self, site_id):
+        state = self.sites.get(site_id)
+        if state is None:
+            n_channels = len(RESIDUAL_CHANNELS)
+            state = {
+                "count": 0,
+                "mean": [0.0] * n_channels,
+                "var": [0.0] * n_channels,
+                "open_window": None,
+                "since_flag": 0,
+            }
+            self.sites[site_id] = state
+        return state
+
+    def update(self, site_id, timestamp, sample):
+        """
+        Scores one sample, then folds it into the site's residual model.
+
+        Returns:
+            tuple: (score, channel_name)
+        """
+        state = self._state(site_id)
+        a = self.alpha
+        mean, var, first = state["mean"], state["var"], state["count"] == 0
+        best_score, best_channel = 0.0, 0
+        for i, (name, measured, simulated, sigma_floor, divergence_scale) in enumerate(RESIDUAL_CHANNELS):
+            m, s = sample.get(measured), sample.get(simulated)
+            r = (m - s) if m is not None and s is not None and m == m and s == s else 0.0
+            if first:
+                mean[i] = r
+            innovation = r - mean[i]
+            score = max(abs(innovation) / math.sqrt(var[i] + sigma_floor * sigma_floor),
+                        abs(r) / divergence_scale)
+            mean[i] += a * innovation
+            var[i] = (1.0 - a) * (var[i] + a * innovation * innovation)
+            if score > best_score:
+                best_score, best_channel = score, i
+        if state["count"] < self.warmup:
+            best_score = 0.0
+        state["count"] += 1
+
+        self._track_window(site_id, state, timestamp, best_score, best_channel)
+        return best_score, CHANNEL_NAMES[best_channel]
+
+    def _track_window(self, site_id, state, timestamp, score, channel):
+        window = state["open_window"]
+        if score > self.threshold:
+            state["since_flag"] = 0
+            if window is None:
+                window = {"site_id": site_id, "start": timestamp, "end": timestamp, "samples": 0,
+                          "peak_score": 0.0, "peak_at": timestamp, "channel": None, "severity": 0.0,
+                          "_first_count": state["count"]}
+                state["open_window"] = window
+            window["end"] = timestamp
+            window["samples"] = state["count"] - window["_first_count"] + 1
+            window["severity"] += score - self.threshold
+            if score > window["peak_score"]:
+                window["peak_score"], window["peak_at"] = score, timestamp
+                window["channel"] = CHANNEL_NAMES[channel]
+        elif window is not None:
+            state["since_flag"] += 1
+            if state["since_flag"] > self.max_gap:
+                self.closed_windows.append(window)
+                state["open_window"] = None
+
+    def ranked_windows(self, include_open=True):
+        windows = list(self.closed_windows)
+        if include_open:
+            windows += [s["open_window"] for s in self.sites.values() if s["open_window"] is not None]
+        return sorted(windows, key=lambda w: -w["severity"])
+
+
+# Process-wide online detector fed by every SimulationService step.
+anomaly_detector = ResidualAnomalyDetector()
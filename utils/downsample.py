@@ -0,0 +1,118 @@
+# utils/downsample.py
+
+import numpy as np
+
+
+def _finite(x, y):
+    mask = np.isfinite(x) & np.isfinite(y)
+    if mask.all():
+        return x, y
+    return x[mask], y[mask]
+
+
+def _bucket_edges(n_points, n_buckets):
+    """Start index of each of `n_buckets` near-equal buckets over range(n_points)."""
+    return np.linspace(0, n_points, n_buckets + 1).astype(np.int64)
+
+
+def _lttb_indices(x, ys, n_out):
+    """
+    LTTB selection for every row of `ys` (signals sharing x, all finite).
+
+    Returns:
+        array: (signals, n_out) indices into x.
+    """
+    n = len(x)
+    x = x - x[0]  # Areas are translation-invariant; keeps epoch-second products exact enough
+
+    # 1. Interior buckets (first and last point are always kept)
+    n_buckets = n_out - 2
+    edges = _bucket_edges(n - 2, n_buckets) + 1
+    starts, stops = edges[:-1], edges[1:]
+    sizes = stops - starts
+
+    # 2. Mean of every bucket at once; the "next" point of the last bucket is the final sample
+    avg_x = np.add.reduceat(x[1:n - 1], starts - 1) / sizes
+    avg_y = np.add.reduceat(ys[:, 1:n - 1], starts - 1, axis=1) / sizes
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.concatenate((avg_y[:, 1:], ys[:, -1:]), axis=1)
+
+    # 3. Candidate matrix [bucket, slot], padded with the bucket's first index
+    width = int(sizes.max())
+    slots = starts[:, None] + np.arange(width)[None, :]
+    slots = np.where(slots < stops[:, None], slots, starts[:, None])
+    cand_x, cand_y = x[slots], ys[:, slots]
+
+    # Triangle area with fixed apex c = next bucket mean, candidate b, previous pick a:
+    # 2*A = |a_x (b_y - c_y) + a_y (c_x - b_x) + (b_x c_y - c_x b_y)|
+    # The terms without `a` are precomputed for every bucket at once.
+    # Laid out [bucket, signal, slot] so each step reads one contiguous block.
+    p = (cand_y - next_y[:, :, None]).transpose(1, 0, 2).copy()
+    q = next_x[:, None] - cand_x
+    r = (cand_x * next_y[:, :, None] - next_x[:, None] * cand_y).transpose(1, 0, 2).copy()
+
+    flat_ys = ys.ravel()
+    row_offsets = np.arange(len(ys)) * n
+    selected = np.empty((n_out, len(ys)), dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = selected[0]
+    for i in range(n_buckets):
+        area = np.abs(x[a][:, None] * p[i] + flat_ys[row_offsets + a][:, None] * q[i] + r[i])
+        a = slots[i, area.argmax(axis=1)]
+        selected[i + 1] = a
+    return selected.T
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last point and, from every bucket in between, the point
+    forming the largest triangle with the previously kept point and the mean of
+    the next bucket. Bucket means and the padded candidate matrix are computed
+    in one vectorized pass; only the argmax walk (one step per output point)
+    stays sequential, because each choice depends on the previous one.
+
+    Args:
+        x (array-like): Monotonic x values (e.g. epoch seconds).
+        y (array-like): Signal values. NaNs are dropped.
+        n_out (int): Point budget (typically the chart width in pixels).
+
+    Returns:
+        tuple: (x_out, y_out) NumPy arrays with at most n_out points.
+    """
+    x, y = _finite(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+    if n_out >= len(x) or n_out < 3:
+        return x.copy(), y.copy()
+    selected = _lttb_indices(x, y[None, :], n_out)[0]
+    return x[selected], y[selected]
+
+
+def lttb_many(x, ys, n_out):
+    """
+    lttb() for several signals on the same x (e.g. every column of a history
+    window). Gap-free signals share one argmax walk, so the sequential part
+    runs once per output point instead of once per point and signal; signals
+    with NaNs are downsampled one at a time.
+
+    Args:
+        x (array-like): Monotonic x values shared by every signal.
+        ys (sequence): Signal arrays, each as long as x.
+        n_out (int): Point budget per signal.
+
+    Returns:
+        list: One (x_out, y_out) tuple per signal, as lttb() returns them.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    ys = [np.asarray(y, dtype=np.float64) for y in ys]
+    batch = [i for i, y in enumerate(ys) if np.isfinite(y).all()] if np.isfinite(x).all() else []
+    out = [None if i in batch else lttb(x, y, n_out) for i, y in enumerate(ys)]
+    if batch and (n_out >= len(x) or n_out < 3):
+        for i in batch:
+            out[i] = (x.copy(), ys[i].copy())
+    elif batch:
+        matrix = np.array([ys[i] for i in batch])
+        selected = _lttb_indices(x, matrix, n_out)
+        for row, i in enumerate(batch):
+            out[i] = (x[selected[row]], matrix[row, selected[row]])
+    return out
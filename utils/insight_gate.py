@@ -0,0 +1,194 @@
+# utils/insight_gate.py
+import math
+import threading
+from collections import OrderedDict
+
+from utils.InsightEngine import INSIGHT_CODES, INSIGHT_INPUTS, INSIGHT_MESSAGES, INSIGHT_RULES
+
+# Grid each input is quantized to before it becomes a cache key. Every
+# threshold INSIGHT_RULES compares the input against is a multiple of its
+# quantum, so all values strictly between two grid points get the same
+# answer; values exactly on the grid keep a key of their own. The memoized
+# result therefore equals generate_insights for any input. The temperatures
+# are only compared with each other (sim_temp vs ambient_temp + 3 / + 5), so
+# they are keyed exactly (None); twin output is rounded to 0.1 °C anyway.
+DEFAULT_QUANTA = {
+    "sim_net_kw": 0.5,
+    "sim_soc": 5.0,
+    "sim_temp": None,
+    "ambient_temp": None,
+    "irradiance": 10.0,
+}
+DEFAULT_MAX_ENTRIES = 4096
+
+INSIGHT_CHANGED_EVENT = "insight_changed"
+
+
+class InsightGate:
+    """
+    Sits between the simulation loop and anyone who reacts to insight changes.
+
+    1. Evaluation: the caller always gets the insight currently in effect
+       (what the dashboard shows). Results are memoized on quantized inputs
+       (see DEFAULT_QUANTA) in a bounded LRU, so the slowly moving states of
+       a site mostly cost one dict lookup.
+    2. Hysteresis: a new insight must be seen `confirm_samples` times in a row
+       before the site's stable insight changes.
+    3. Cool-down: once an insight code has been left, raising it again within
+       `cooldown_seconds` is suppressed (prevents flapping).
+    4. Only stable transitions are published on the EventBus, as
+       INSIGHT_CHANGED_EVENT with {site_id, previous, current, message, timestamp}.
+       Hysteresis and cool-down only throttle these events, never the display.
+    """
+    def __init__(self, event_bus=None, max_entries=DEFAULT_MAX_ENTRIES, quanta=None,
+                 confirm_samples=3, cooldown_seconds=300.0):
+        self.event_bus = event_bus
+        self.max_entries = max_entries
+        self.quanta = dict(DEFAULT_QUANTA if quanta is None else quanta)
+        self._quanta = tuple(self.quanta.get(name) for name in INSIGHT_INPUTS)
+        self.confirm_samples = confirm_samples
+        self.cooldown_seconds = cooldown_seconds
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()  # Cache and counters; every service thread comes through here
+        self._sites = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.evaluated = 0
+        self.suppressed_hysteresis = 0
+        self.suppressed_cooldown = 0
+        self.published = 0
+
+    # --- 1. Evaluation (memoized) ---
+    def _key(self, values):
+        """
+        Cache key of one input tuple (INSIGHT_INPUTS order): per quantized
+        input, twice its grid index, plus one when the value lies between grid
+        points. None when an input is not finite (evaluated without the cache).
+        """
+        key = []
+        for value, quantum in zip(values, self._quanta):
+            if not math.isfinite(value):
+                return None
+            if quantum is None:
+                key.append(value)
+            else:
+                index = math.floor(value / quantum)
+                key.append(2 * index + (value != index * quantum))
+        return tuple(key)
+
+    def evaluate(self, sim_state, context):
+        """Same answer as generate_insights, as a rule index into INSIGHT_RULES."""
+        values = (
+            sim_state.get("sim_net_kw", INSIGHT_INPUTS["sim_net_kw"]),
+            sim_state.get("sim_soc", INSIGHT_INPUTS["sim_soc"]),
+            sim_state.get("sim_temp", INSIGHT_INPUTS["sim_temp"]),
+            context.get("ambient_temp", INSIGHT_INPUTS["ambient_temp"]),
+            context.get("irradiance", INSIGHT_INPUTS["irradiance"]),
+        )
+        key = self._key(values)
+        with self._lock:
+            self.evaluated += 1
+            code = None if key is None else self._cache.get(key)
+            if code is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return code
+            self.misses += 1
+
+        if key is not None:
+            # Evaluate on the key's representative (a grid point or an interval
+            # midpoint) so every input sharing the key gets the same answer
+            values = [part if quantum is None else part * quantum / 2 for part, quantum in zip(key, self._quanta)]
+        code = next(i for i, rule in enumerate(INSIGHT_RULES) if rule.condition(dict(zip(INSIGHT_INPUTS, values))))
+
+        if key is not None:
+            with self._lock:
+                self._cache[key] = code
+                if len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+                    self.evictions += 1
+        return code
+
+    # --- 2-4. Per-site stability + publication ---
+    def update(self, site_id, timestamp, sim_state, context):
+        """
+        Evaluates one sample for a site and returns its current insight code
+        (not the debounced one). Publishes INSIGHT_CHANGED_EVENT only when the
+        stable code changes.
+        """
+        raw = self.evaluate(sim_state, context)
+        self._advance(site_id, raw, timestamp)  # Each site is only updated by its own service thread
+        return raw
+
+    def _advance(self, site_id, raw, timestamp):
+        site = self._sites.get(site_id)
+        if site is None:
+            site = {"stable": raw, "candidate": raw, "streak": 0, "left_at": {}}
+            self._sites[site_id] = site
+            self._publish(site_id, None, raw, timestamp)
+            return
+
+        if raw == site["stable"]:
+            site["candidate"], site["streak"] = raw, 0
+            return
+
+        # Hysteresis: the challenger must persist
+        if raw == site["candidate"]:
+            site["streak"] += 1
+        else:
+            site["candidate"], site["streak"] = raw, 1
+        if site["streak"] < self.confirm_samples:
+            with self._lock:
+                self.suppressed_hysteresis += 1
+            return
+
+        # Cool-down: do not re-announce a code we only just left
+        left_at = site["left_at"].get(raw)
+        if left_at is not None and timestamp - left_at < self.cooldown_seconds:
+            with self._lock:
+                self.suppressed_cooldown += 1
+            return
+
+        previous = site["stable"]
+        site["left_at"][previous] = timestamp
+        site["stable"], site["candidate"], site["streak"] = raw, raw, 0
+        self._publish(site_id, previous, raw, timestamp)
+
+    def _publish(self, site_id, previous, current, timestamp):
+        with self._lock:
+            self.published += 1
+        if self.event_bus is not None:
+            self.event_bus.publish(INSIGHT_CHANGED_EVENT, {
+                "site_id": site_id,
+                "previous": None if previous is None else INSIGHT_CODES[previous],
+                "current": INSIGHT_CODES[current],
+                "message": INSIGHT_MESSAGES[current],
+                "active": INSIGHT_RULES[current].active,
+                "timestamp": timestamp,
+            })
+
+    def stable_insight(self, site_id):
+        site = self._sites.get(site_id)
+        return None if site is None else INSIGHT_MESSAGES[site["stable"]]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cache_entries": len(self._cache),
+                "cache_hits": self.hits,
+                "cache_misses": self.misses,
+                "cache_evictions": self.evictions,
+                "cache_hit_rate": self.hits / lookups if lookups else 0.0,
+                "evaluated": self.evaluated,
+                "suppressed_hysteresis": self.suppressed_hysteresis,
+                "suppressed_cooldown": self.suppressed_cooldown,
+                "published": self.published,
+            }
+
+
+# Process-wide gate used by the simulation services (attach an EventBus at startup).
+insight_gate = InsightGate()
@@ -0,0 +1,448 @@
+# utils/metrics.py
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# --- Log2 histogram layout ---
+# A duration (nanoseconds) is bucketed by its bit length plus the next
+# SUB_BITS bits below the leading one: every power of two is split into four
+# buckets (under 25% wide), and the index costs one int.bit_length() and a
+# few shifts on the hot path. Quantiles are interpolated by rank inside their
+# bucket.
+SUB_BITS = 2
+N_BUCKETS = 64 << SUB_BITS          # Any non-negative 64-bit ns count fits
+_SUM = N_BUCKETS                    # extra slot holding the running sum (ns)
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.99, 0.999)
+DEFAULT_SLOW_STEP_SECONDS = 0.05
+DEFAULT_SLOW_STEP_SAMPLES = 20
+DEFAULT_PHASE_SAMPLE_EVERY = 16     # Steps per site between per-phase breakdowns
+DEFAULT_SPAN_SAMPLE_EVERY = 8       # start_sampled(): calls per timed call
+_NO_STEP = (0, None)
+_clock = time.perf_counter_ns      # Bound once: one global lookup on the hot path
+
+
+def bucket_index(ns):
+    if ns <= 0:
+        return 0
+    bits = ns.bit_length()
+    return (bits << 2) | ((ns << 3 >> bits) & 3)
+
+
+def bucket_lower_ns(index):
+    bits, sub = index >> SUB_BITS, index & 3
+    return ((4 + sub) << bits) >> 3
+
+
+def bucket_upper_ns(index):
+    """Exclusive upper bound of a bucket."""
+    bits, sub = index >> SUB_BITS, index & 3
+    return max(((5 + sub) << bits) >> 3, bucket_lower_ns(index) + 1)
+
+
+def summarize(counts, quantiles=DEFAULT_QUANTILES):
+    """
+    Count, sum, mean, max and quantiles (seconds) from one histogram's counts.
+    Quantiles are interpolated linearly by rank within their bucket; max is
+    the upper bound of the highest bucket.
+    """
+    total = sum(counts[:N_BUCKETS])
+    summary = {"count": total, "sum_s": counts[_SUM] / 1e9}
+    if not total:
+        return summary
+    summary["mean_s"] = summary["sum_s"] / total
+    targets = sorted((q, q * total) for q in quantiles)
+    seen, t = 0, 0
+    last = 0
+    for index in range(N_BUCKETS):
+        c = counts[index]
+        if not c:
+            continue
+        lower, upper = bucket_lower_ns(index), bucket_upper_ns(index)
+        while t < len(targets) and seen + c >= targets[t][1]:
+            q, rank = targets[t]
+            summary[f"p{q * 100:g}_s"] = (lower + (upper - lower) * max(0.0, rank - seen) / c) / 1e9
+            t += 1
+        seen += c
+        last = index
+    summary["max_s"] = bucket_upper_ns(last) / 1e9
+    return summary
+
+
+def _merge(histograms, counters, into_histograms, into_counters):
+    """Adds one set of (histograms, counters) buffers into another."""
+    for name, value in list(counters.items()):
+        into_counters[name] = into_counters.get(name, 0) + value
+    for name, counts in list(histograms.items()):
+        target = into_histograms.get(name)
+        if target is None:
+            into_histograms[name] = list(counts)
+        else:
+            into_histograms[name] = [a + b for a, b in zip(target, counts)]
+
+
+class _Span:
+    __slots__ = ("_metrics", "_name", "_t0")
+
+    def __init__(self, metrics, name):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self._metrics.observe_ns(self._name, time.perf_counter_ns() - self._t0)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Metrics:
+    """
+    Low-overhead process metrics: timing spans, counters and latency histograms.
+
+    1. Recording: every thread writes into its own preallocated buffers (a
+       log2 bucket list per histogram), so the hot path takes no lock and
+       does one bit_length(), a few shifts and two list increments. Buffers
+       of threads that have exited (e.g. Streamlit's per-rerun script
+       threads) are folded into one shared aggregate, so their number stays
+       bounded by the live threads.
+    2. Disabled (the default unless SKYLINE_METRICS=1): start() returns 0 and
+       stop() does nothing, span() returns a shared no-op context manager.
+    3. Reading: snapshot() merges all thread buffers; render_text() formats it
+       in the Prometheus text format for start_http_server(); start_dump()
+       appends snapshots to a JSON-lines file periodically.
+    4. Slow steps: step_start() / observe_step() time every simulation step
+       with two clock reads; observe_step() keeps the latest slow steps per
+       site for post-mortems. The per-phase breakdown is only taken on
+       sampled steps (every `phase_sample_every`-th step of a site, and every
+       step after a slow one, since slow steps come in runs).
+    """
+    def __init__(self, enabled=False, slow_step_seconds=DEFAULT_SLOW_STEP_SECONDS,
+                 slow_step_samples=DEFAULT_SLOW_STEP_SAMPLES, phase_sample_every=DEFAULT_PHASE_SAMPLE_EVERY,
+                 span_sample_every=DEFAULT_SPAN_SAMPLE_EVERY):
+        self.enabled = enabled
+        self.slow_step_seconds = slow_step_seconds
+        self.slow_step_samples = slow_step_samples
+        self.phase_sample_every = phase_sample_every
+        self.span_sample_every = span_sample_every
+        self._span_calls = 0
+        self._slow_sites = set()          # Sites whose last step was slow (phases sampled until it is not)
+        self._local = threading.local()
+        self._buffers = []                # (thread, histograms, counters) per recording thread
+        self._retired = ({}, {})          # Merged buffers of threads that have exited
+        self._lock = threading.Lock()
+        self._slow_steps = {}
+        self._server = None
+        self._dump_stop = None
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    # --- 1. Recording ---
+    def _thread_buffers(self):
+        """This thread's (histograms, counters) dicts; only this thread writes them."""
+        local = self._local
+        if not hasattr(local, "histograms"):
+            local.histograms, local.counters = {}, {}
+            with self._lock:
+                self._prune()
+                self._buffers.append((threading.current_thread(), local.histograms, local.counters))
+        return local.histograms, local.counters
+
+    def _prune(self):
+        """Folds the buffers of exited threads into the retired aggregate (caller holds the lock)."""
+        live = []
+        for thread, histograms, counters in self._buffers:
+            if thread.is_alive():
+                live.append((thread, histograms, counters))
+            else:
+                _merge(histograms, counters, *self._retired)  # A dead thread no longer writes them
+        self._buffers = live
+
+    def _histogram(self, name):
+        histograms = self._thread_buffers()[0]
+        counts = histograms.get(name)
+        if counts is None:
+            counts = histograms[name] = [0] * (N_BUCKETS + 1)
+        return counts
+
+    def observe_ns(self, name, ns):
+        """Records one duration (nanoseconds) into the named histogram."""
+        if not self.enabled:
+            return
+        try:
+            counts = self._local.histograms[name]
+        except (AttributeError, KeyError):
+            counts = self._histogram(name)
+        bits = ns.bit_length()  # bucket_index(), inlined: this is the hot path
+        counts[(bits << 2) | ((ns << 3 >> bits) & 3)] += 1
+        counts[_SUM] += ns
+
+    def observe(self, name, seconds):
+        self.observe_ns(name, int(seconds * 1e9))
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        counters = self._thread_buffers()[1]
+        counters[name] = counters.get(name, 0) + n
+
+    def start(self):
+        """
+        Hot-path timing without a wrapper frame:
+            t0 = metrics.start(); ...; metrics.stop("name", t0)
+        Returns 0 when disabled, which makes stop() a no-op.
+        """
+        return _clock() if self.enabled else 0
+
+    def start_sampled(self):
+        """
+        start() for microsecond-scale paths: only every span_sample_every-th
+        call is timed, the others return 0 (stop() is then a no-op). The
+        histogram's quantiles stay representative; its count is of timed
+        calls only.
+        """
+        if not self.enabled:
+            return 0
+        self._span_calls += 1  # Unlocked: a lost increment only shifts which call is timed
+        return 0 if self._span_calls % self.span_sample_every else _clock()
+
+    def stop(self, name, t0):
+        if not t0:
+            return
+        ns = _clock() - t0
+        # observe_ns(), inlined: stop() closes every hot-path span
+        try:
+            counts = self._local.histograms[name]
+        except (AttributeError, KeyError):
+            counts = self._histogram(name)
+        bits = ns.bit_length()
+        counts[(bits << 2) | ((ns << 3 >> bits) & 3)] += 1
+        counts[_SUM] += ns
+
+    def span(self, name):
+        """`with metrics.span("name"):` times the block (no-op when disabled)."""
+        return _Span(self, name) if self.enabled else _NOOP_SPAN
+
+    def timed(self, name):
+        """
+        Decorator timing every call into the named histogram. Costs a wrapper
+        frame even when disabled; for microsecond-scale functions prefer
+        start()/stop().
+        """
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                t0 = time.perf_counter_ns()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe_ns(name, time.perf_counter_ns() - t0)
+            return wrapper
+        return decorator
+
+    # --- 4. Slow-step sampling ---
+    def step_start(self, site_id, step_index):
+        """
+        Opens the timing of one simulation step.
+
+        Returns:
+            tuple: (t0, marks). t0 is 0 when disabled. marks is None unless
+                   this step is phase-sampled; then it is [t0] and the caller
+                   appends one perf_counter_ns() per finished phase except
+                   the last (observe_step() reads the end itself).
+        """
+        if not self.enabled:
+            return _NO_STEP
+        t0 = _clock()
+        if step_index % self.phase_sample_every == 0 or site_id in self._slow_sites:
+            return t0, [t0]
+        return t0, None
+
+    def observe_step(self, site_id, t0, marks=None, phases=()):
+        """
+        Closes a step opened by step_start(). Steps slower than
+        slow_step_seconds are kept (latest slow_step_samples per site), with
+        the per-phase breakdown when the step was phase-sampled.
+
+        Args:
+            t0 (int): step_start()'s t0 (0 = not timed).
+            marks (list): step_start()'s marks with the phase ends appended, or None.
+            phases (tuple): Phase names, e.g. ("physics", "insights", ...).
+        """
+        if not t0:
+            return
+        end = _clock()
+        ns = end - t0
+        # observe_ns(), inlined: once per step of every site
+        try:
+            counts = self._local.histograms["sim.service_step"]
+        except (AttributeError, KeyError):
+            counts = self._histogram("sim.service_step")
+        bits = ns.bit_length()
+        counts[(bits << 2) | ((ns << 3 >> bits) & 3)] += 1
+        counts[_SUM] += ns
+        if ns < self.slow_step_seconds * 1e9:
+            if site_id in self._slow_sites:
+                self._slow_sites.discard(site_id)
+            return
+        self._slow_sites.add(site_id)
+        sample = {"timestamp": time.time(), "duration_s": ns / 1e9}
+        if marks:
+            marks = marks + [end]
+            for name, m0, m1 in zip(phases, marks, marks[1:]):
+                sample[f"{name}_s"] = (m1 - m0) / 1e9
+        samples = self._slow_steps.get(site_id)
+        if samples is None:
+            with self._lock:
+                samples = self._slow_steps.setdefault(site_id, deque(maxlen=self.slow_step_samples))
+        samples.append(sample)
+        self.count("sim.slow_steps")
+
+    def slow_steps(self, site_id=None):
+        if site_id is not None:
+            return list(self._slow_steps.get(site_id, ()))
+        return {site: list(samples) for site, samples in list(self._slow_steps.items())}
+
+    # --- 3. Reading ---
+    def snapshot(self, quantiles=DEFAULT_QUANTILES):
+        """Merged counters and histogram summaries across all threads."""
+        merged, counters = {}, {}
+        with self._lock:
+            self._prune()
+            buffers = list(self._buffers)
+            _merge(*self._retired, merged, counters)
+        for _, histograms, thread_counters in buffers:
+            _merge(histograms, thread_counters, merged, counters)
+        return {
+            "timestamp": time.time(),
+            "enabled": self.enabled,
+            "counters": counters,
+            "histograms": {name: summarize(counts, quantiles) for name, counts in sorted(merged.items())},
+        }
+
+    def reset(self):
+        with self._lock:
+            for _, histograms, counters in self._buffers:
+                histograms.clear()
+                counters.clear()
+            self._retired = ({}, {})
+            self._slow_steps.clear()
+            self._slow_sites.clear()
+
+    def render_text(self):
+        """Prometheus text exposition of snapshot()."""
+        snap = self.snapshot()
+        lines = []
+        for name, value in sorted(snap["counters"].items()):
+            metric = "skyline_" + name.replace(".", "_") + "_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for name, summary in snap["histograms"].items():
+            metric = "skyline_" + name.replace(".", "_") + "_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for q in DEFAULT_QUANTILES:
+                key = f"p{q * 100:g}_s"
+                if key in summary:
+                    lines.append(f'{metric}{{quantile="{q}"}} {summary[key]:.9f}')
+            lines += [f"{metric}_sum {summary['sum_s']:.9f}", f"{metric}_count {summary['count']}"]
+        return "\n".join(lines) + "\n"
+
+    def start_http_server(self, port=9108, host="127.0.0.1"):
+        """Serves render_text() at http://host:port/metrics on a daemon thread."""
+        if self._server is not None:
+            return self._server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), _Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        self._server = server
+        return server
+
+    def start_exporters_from_env(self):
+        """
+        Starts the endpoint / dump configured by environment variables, if
+        recording is enabled: SKYLINE_METRICS_PORT (default 9108, 0 = off)
+        and SKYLINE_METRICS_DUMP (JSON-lines path, every
+        SKYLINE_METRICS_DUMP_SECONDS, default 60).
+        """
+        if not self.enabled:
+            return
+        port = int(os.environ.get("SKYLINE_METRICS_PORT", "9108"))
+        if port and self._server is None:
+            try:
+                self.start_http_server(port)
+            except OSError:
+                pass  # Port taken (e.g. a second process on the node); recording continues
+        dump_path = os.environ.get("SKYLINE_METRICS_DUMP")
+        if dump_path:
+            self.start_dump(dump_path, float(os.environ.get("SKYLINE_METRICS_DUMP_SECONDS", "60")))
+
+    def start_dump(self, path, interval_seconds=60.0):
+        """Appends a snapshot (plus slow steps) to a JSON-lines file every interval."""
+        if self._dump_stop is not None:
+            return
+        stop = threading.Event()
+        self._dump_stop = stop
+
+        def _run():
+            while not stop.wait(interval_seconds):
+                self.dump(path)
+
+        threading.Thread(target=_run, name="metrics-dump", daemon=True).start()
+
+    def dump(self, path):
+        record = self.snapshot()
+        record["slow_steps"] = self.slow_steps()
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def stop_exporters(self):
+        if self._dump_stop is not None:
+            self._dump_stop.set()
+            self._dump_stop = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+
+# Process-wide metrics registry (SKYLINE_METRICS=1 enables recording at startup).
+metrics = Metrics(enabled=os.environ.get("SKYLINE_METRICS", "0") == "1")
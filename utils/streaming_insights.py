@@ -0,0 +1,268 @@
+# utils/streaming_insights.py
+import math
+from collections import deque, namedtuple
+
+from utils.InsightEngine import INSIGHT_RULES
+
+DEFAULT_STEP_SECONDS = 10
+TREND_WINDOW_SECONDS = 15 * 60   # "SOC not rising for 15 min"
+FAST_WINDOW_SECONDS = 5 * 60     # Sustained power / thermal conditions
+IRRADIANCE_HALF_LIFE_SECONDS = 120
+
+
+class Ewma:
+    """Time-aware exponentially weighted moving average (irregular sample spacing)."""
+    def __init__(self, half_life_seconds):
+        self.tau = half_life_seconds / math.log(2)
+        self.value = None
+        self._last_t = None
+
+    def push(self, t, x):
+        if self.value is None:
+            self.value = x
+        else:
+            alpha = 1.0 - math.exp(-max(0.0, t - self._last_t) / self.tau)
+            self.value += alpha * (x - self.value)
+        self._last_t = t
+        return self.value
+
+
+class RollingStats:
+    """
+    Time-window statistics in fixed memory with O(1) amortized updates:
+      - mean / variance via Welford add + remove,
+      - min / max via monotonic deques,
+      - first / last sample for the window slope (e.g. dSOC/dt).
+
+    The window holds at most `max_samples` points; older points are evicted
+    by age (window_seconds) or by count, whichever comes first.
+    """
+    def __init__(self, window_seconds, max_samples):
+        self.window_seconds = window_seconds
+        self.samples = deque(maxlen=max_samples)
+        self._min = deque()
+        self._max = deque()
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def _add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+
+    def _remove(self, x):
+        if self.count <= 1:
+            self.count, self.mean, self._m2 = 0, 0.0, 0.0
+            return
+        self.count -= 1
+        delta = x - self.mean
+        self.mean -= delta / self.count
+        self._m2 = max(0.0, self._m2 - delta * (x - self.mean))
+
+    def _evict_oldest(self):
+        t_old, x_old = self.samples.popleft()
+        self._remove(x_old)
+        if self._min and self._min[0][0] == t_old:
+            self._min.popleft()
+        if self._max and self._max[0][0] == t_old:
+            self._max.popleft()
+
+    def push(self, t, x):
+        # 1. Expire by age, then make room by count
+        while self.samples and t - self.samples[0][0] > self.window_seconds:
+            self._evict_oldest()
+        if len(self.samples) == self.samples.maxlen:
+            self._evict_oldest()
+
+        # 2. Insert
+        self.samples.append((t, x))
+        self._add(x)
+        while self._min and self._min[-1][1] >= x:
+            self._min.pop()
+        self._min.append((t, x))
+        while self._max and self._max[-1][1] <= x:
+            self._max.pop()
+        self._max.append((t, x))
+
+    @property
+    def variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    @property
+    def min(self):
+        return self._min[0][1] if self._min else math.nan
+
+    @property
+    def max(self):
+        return self._max[0][1] if self._max else math.nan
+
+    @property
+    def span_seconds(self):
+        return self.samples[-1][0] - self.samples[0][0] if len(self.samples) > 1 else 0.0
+
+    def is_full(self, coverage=0.9):
+        """True once the samples cover at least `coverage` of the window."""
+        return self.span_seconds >= coverage * self.window_seconds
+
+    def slope_per_hour(self):
+        """(last - first) / elapsed hours across the window, 0.0 until two samples exist."""
+        span = self.span_seconds
+        if span <= 0:
+            return 0.0
+        return (self.samples[-1][1] - self.samples[0][1]) / (span / 3600.0)
+
+
+class SiteTrendState:
+    """
+    Per-site incremental statistics feeding the streaming rules. The sample
+    caps come from the site's step cadence, so a full window always fits.
+    """
+    def __init__(self, step_seconds=DEFAULT_STEP_SECONDS,
+                 trend_window_seconds=TREND_WINDOW_SECONDS, fast_window_seconds=FAST_WINDOW_SECONDS):
+        self.step_seconds = step_seconds
+        trend_samples = int(trend_window_seconds / step_seconds) + 2
+        fast_samples = int(fast_window_seconds / step_seconds) + 2
+        self.soc = RollingStats(trend_window_seconds, trend_samples)
+        self.irradiance = RollingStats(trend_window_seconds, trend_samples)
+        self.irradiance_ewma = Ewma(IRRADIANCE_HALF_LIFE_SECONDS)
+        self.net_kw = RollingStats(fast_window_seconds, fast_samples)
+        self.temp_excess = RollingStats(fast_window_seconds, fast_samples)
+        self.last_soc = math.nan
+
+    def update(self, t, sample):
+        soc = sample.get("sim_soc", 0.0)
+        irradiance = sample.get("irradiance", 0.0)
+        self.last_soc = soc
+        self.soc.push(t, soc)
+        self.irradiance.push(t, irradiance)
+        self.irradiance_ewma.push(t, irradiance)
+        self.net_kw.push(t, sample.get("sim_net_kw", 0.0))
+        self.temp_excess.push(t, sample.get("sim_temp", 0.0) - sample.get("ambient_temp", 25.0))
+
+    def features(self):
+        return {
+            "sim_soc": self.last_soc,
+            "soc_slope_per_h": self.soc.slope_per_hour(),
+            "soc_window_full": self.soc.is_full(),
+            "irradiance_ewma": self.irradiance_ewma.value or 0.0,
+            "irradiance_min": self.irradiance.min,
+            "net_kw_mean": self.net_kw.mean,
+            "net_kw_std": self.net_kw.std,
+            "net_kw_min": self.net_kw.min,
+            "net_kw_max": self.net_kw.max,
+            "fast_window_full": self.net_kw.is_full(),
+            "temp_excess_mean": self.temp_excess.mean,
+            "temp_excess_min": self.temp_excess.min,
+        }
+
+
+# --- Streaming rule table (first match wins, like utils.InsightEngine) ---
+StreamingRule = namedtuple("StreamingRule", ["code", "message", "condition", "active"])
+
+_FALLBACK_EFFICIENT, _FALLBACK_NOMINAL = INSIGHT_RULES[-2], INSIGHT_RULES[-1]
+
+STREAMING_RULES = (
+    StreamingRule(
+        "SUSTAINED_THERMAL_STRESS",
+        "Battery has stayed more than 5°C above ambient under high charge power for 5 minutes; thermal stress is building.",
+        lambda f: f["fast_window_full"] and f["temp_excess_min"] > 5 and f["net_kw_min"] > 5,
+        True,
+    ),
+    StreamingRule(
+        "STALLED_CHARGING",
+        "High solar irradiance for 15 minutes but SOC is not rising, check battery charge acceptance or site load balance.",
+        lambda f: f["soc_window_full"] and f["irradiance_min"] > 700 and f["soc_slope_per_h"] <= 0 and f["sim_soc"] < 95,
+        True,
+    ),
+    StreamingRule(
+        "DEEP_DISCHARGE_TREND",
+        "Critical: Battery SOC is below 20% and trending down. Grid support or load shedding may be required.",
+        lambda f: f["sim_soc"] < 20 and f["soc_slope_per_h"] < 0,
+        True,
+    ),
+    StreamingRule(
+        "SUSTAINED_HIGH_DISCHARGE",
+        "Discharge has exceeded 5 kW for 5 minutes, closely monitor discharge rate and battery temperature.",
+        lambda f: f["fast_window_full"] and f["net_kw_max"] < -5,
+        True,
+    ),
+    StreamingRule(
+        _FALLBACK_EFFICIENT.code, _FALLBACK_EFFICIENT.message,
+        lambda f: f["irradiance_ewma"] > 10 and f["sim_soc"] > 30 and f["temp_excess_mean"] < 3,
+        False,
+    ),
+    StreamingRule(_FALLBACK_NOMINAL.code, _FALLBACK_NOMINAL.message, lambda f: True, False),
+)
+
+
+class StreamingInsightEngine:
+    """
+    Trend-aware insights: every sample updates the site's rolling statistics
+    in O(1) and the rule table is evaluated on those trends instead of on a
+    single noisy reading.
+    """
+    def __init__(self, step_seconds=DEFAULT_STEP_SECONDS,
+                 trend_window_seconds=TREND_WINDOW_SECONDS, fast_window_seconds=FAST_WINDOW_SECONDS):
+        self.step_seconds = step_seconds
+        self.trend_window_seconds = trend_window_seconds
+        self.fast_window_seconds = fast_window_seconds
+        self.sites = {}
+
+    def _new_state(self, step_seconds):
+        return SiteTrendState(step_seconds, self.trend_window_seconds, self.fast_window_seconds)
+
+    def register(self, site_id, step_seconds):
+        """
+        Sizes a site's windows for its own step cadence. Sites that are never
+        registered use the engine default (DEFAULT_STEP_SECONDS), which is too
+        small a sample cap for faster cadences to ever cover the trend window.
+
+        Args:
+            site_id (str): Site to (re)size.
+            step_seconds (float): Seconds between the site's samples.
+        """
+        state = self.sites.get(site_id)
+        if state is None or state.step_seconds != step_seconds:
+            self.sites[site_id] = self._new_state(step_seconds)
+
+    def _site(self, site_id):
+        state = self.sites.get(site_id)
+        if state is None:
+            state = self.sites.setdefault(site_id, self._new_state(self.step_seconds))
+        return state
+
+    def update(self, site_id, t, sample):
+        """
+        Feeds one sample (SimulationCore.run_step output + ambient/irradiance).
+
+        Args:
+            site_id (str): Site the sample belongs to.
+            t (float): Sample time in epoch seconds.
+            sample (dict): Needs sim_soc, sim_temp, sim_net_kw, ambient_temp, irradiance.
+
+        Returns:
+            StreamingRule: The highest-priority rule that currently holds.
+        """
+        state = self._site(site_id)
+        state.update(t, sample)
+        features = state.features()
+        for rule in STREAMING_RULES:
+            if rule.condition(features):
+                return rule
+
+    def features(self, site_id):
+        state = self.sites.get(site_id)
+        return None if state is None else state.features()
+
+    def forget(self, site_id):
+        self.sites.pop(site_id, None)
+
+
+# Process-wide engine shared by the per-site simulation services.
+streaming_insights = StreamingInsightEngine()